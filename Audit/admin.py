@@ -0,0 +1,27 @@
+from django.contrib import admin
+
+from Audit.models import AuditCheckpoint, AuditRecord
+
+
+class ReadOnlyAdmin(admin.ModelAdmin):
+    """Audit rows are append-only: inspectable in the admin, never editable."""
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(AuditRecord)
+class AuditRecordAdmin(ReadOnlyAdmin):
+    list_display = ('sequence', 'recorded_at', 'actor', 'operation', 'object_type', 'count', 'reason')
+    list_filter = ('operation', 'object_type')
+
+
+@admin.register(AuditCheckpoint)
+class AuditCheckpointAdmin(ReadOnlyAdmin):
+    list_display = ('chain', 'first_sequence', 'last_sequence', 'merkle_root', 'verified_at')
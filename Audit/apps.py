@@ -0,0 +1,22 @@
+from django.apps import AppConfig
+from django.db.models.signals import post_save
+
+
+def _chain_log_entry(sender, instance, created, **kwargs):
+    if created:
+        from Audit.recorder import record_log_entry
+        record_log_entry(instance)
+
+
+class AuditConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'Audit'
+
+    def ready(self):
+        from auditlog.models import LogEntry
+        from Audit.logentries import defer_log_entries
+        from Audit.recorder import AUDIT_SINK
+        post_save.connect(_chain_log_entry, sender=LogEntry, dispatch_uid='audit_chain_log_entry')
+        if AUDIT_SINK == 'spool':
+            # LogEntry of these models written by the spool flusher, off the request path
+            defer_log_entries()
@@ -0,0 +1,123 @@
+# Audit/logentries.py
+"""
+Deferred django-auditlog LogEntry writes.
+
+auditlog writes each LogEntry synchronously while the model is saved. For
+the models in AUDIT_DEFERRED_LOG_MODELS, its receivers are replaced (in
+AuditConfig.ready) by ones that only compute what must be read while the
+request runs: the diff against the stored row, the object repr and the actor.
+These values are queued in the audit spool (Audit.spool), in the save's
+transaction boundary, instead of inserting the LogEntry. The flusher then
+creates the LogEntry rows in batches and chains them, in one transaction.
+
+auditlog's post_log signal is not sent for deferred entries (there is no
+LogEntry yet when the model is saved); pre_log is honoured.
+"""
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.utils import timezone
+from django.utils.encoding import smart_str
+
+from auditlog.cid import get_cid
+from auditlog.context import auditlog_value
+from auditlog.diff import model_instance_diff
+from auditlog.models import LogEntry
+from auditlog.receivers import check_disable, log_create, log_delete, log_update
+from auditlog.registry import auditlog
+from auditlog.signals import pre_log
+
+DEFERRED_LOG_MODELS = getattr(settings, 'AUDIT_DEFERRED_LOG_MODELS', ['Batch.Batch', 'Product.Product', 'Equipment.Equipment'])
+
+# Values of an update diffed in pre_save, queued in post_save once the row is written
+_PENDING_ATTR = '_audit_pending_log_entry'
+
+
+def _log_entry_values(action, instance, old, new, fields_to_check=None):
+    """
+    The LogEntry fields (JSON-serializable) of one change, or None when
+    auditlog would not log it (no change, or vetoed by a pre_log receiver).
+    """
+    if any(result is False for _, result in pre_log.send(type(instance), instance=instance, action=action)):
+        return None
+    changes = model_instance_diff(
+        old, new, fields_to_check=fields_to_check, use_json_for_changes=settings.AUDITLOG_STORE_JSON_CHANGES,
+    )
+    if not changes:
+        return None
+
+    pk = LogEntry.objects._get_pk_value(instance)
+    values = {
+        'content_type_id': ContentType.objects.get_for_model(instance).pk,
+        'object_pk': smart_str(pk),
+        'object_id': pk if isinstance(pk, int) else None,
+        'object_repr': smart_str(instance),
+        'serialized_data': LogEntry.objects._get_serialized_data_or_none(instance),
+        'action': action,
+        'changes': changes,
+        'cid': get_cid(),
+        'timestamp': timezone.now(),
+    }
+    get_additional_data = getattr(instance, 'get_additional_data', None)
+    if callable(get_additional_data):
+        values['additional_data'] = get_additional_data()
+
+    # What auditlog's set_actor context would have set on the LogEntry in pre_save
+    context = auditlog_value.get(None) or {}
+    actor = context.get('actor')
+    if actor is not None and getattr(actor, 'is_authenticated', False):
+        values['actor_id'] = actor.pk
+        values['actor_email'] = getattr(actor, 'email', None)
+    for key, value in context.items():
+        if key not in ('actor', 'signal_duid') and hasattr(LogEntry, key):
+            values[key] = value() if callable(value) else value
+    return values
+
+
+def _enqueue(values):
+    if values is not None:
+        from Audit.spool import enqueue_log_entry
+        enqueue_log_entry(values)
+
+
+@check_disable
+def _defer_update(sender, instance, **kwargs):
+    if not instance._state.adding and instance.pk is not None:
+        old = sender._default_manager.filter(pk=instance.pk).first()
+        setattr(instance, _PENDING_ATTR, _log_entry_values(
+            LogEntry.Action.UPDATE, instance, old, instance, kwargs.get('update_fields'),
+        ))
+
+
+@check_disable
+def _defer_create_or_update(sender, instance, created, **kwargs):
+    if created:
+        _enqueue(_log_entry_values(LogEntry.Action.CREATE, instance, None, instance))
+    else:
+        # Queued only now that the row is written: a failed save leaves no entry
+        _enqueue(instance.__dict__.pop(_PENDING_ATTR, None))
+
+
+@check_disable
+def _defer_delete(sender, instance, **kwargs):
+    if instance.pk is not None:
+        _enqueue(_log_entry_values(LogEntry.Action.DELETE, instance, instance, None))
+
+
+def defer_log_entries(models=DEFERRED_LOG_MODELS):
+    """Swaps auditlog's synchronous receivers for the deferred ones on `models` (labels)."""
+    from django.apps import apps
+
+    receivers = [
+        ('post_save', post_save, log_create, _defer_create_or_update),
+        ('pre_save', pre_save, log_update, _defer_update),
+        ('post_delete', post_delete, log_delete, _defer_delete),
+    ]
+    for label in models:
+        model = apps.get_model(label)
+        if not auditlog.contains(model):
+            continue
+        for name, signal, synchronous, deferred in receivers:
+            # The dispatch_uid auditlog's registry connected its receiver with (django-auditlog 3.x)
+            signal.disconnect(synchronous, sender=model, dispatch_uid=auditlog._dispatch_uid(signal, synchronous))
+            signal.connect(deferred, sender=model, dispatch_uid=f'audit_deferred_{name}_{label}')
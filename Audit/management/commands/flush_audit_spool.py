@@ -0,0 +1,28 @@
+# Audit/management/commands/flush_audit_spool.py
+import time
+
+from django.core.management.base import BaseCommand
+
+from Audit.spool import FLUSH_INTERVAL, drain_spool
+
+
+class Command(BaseCommand):
+    help = (
+        'Chains the audit entries waiting in the local spool (one pass, or --loop as the dedicated '
+        'flusher when AUDIT_SPOOL_AUTO_FLUSH is off). Run it after a crash to chain what was left behind.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help='Keep flushing until interrupted.')
+
+    def handle(self, *args, **options):
+        while True:
+            result = drain_spool()
+            if result.chained or result.discarded or not options['loop']:
+                self.stdout.write(self.style.SUCCESS(
+                    f"Chained {result.chained:,} audit record(s); dropped {result.discarded:,} (rolled back or "
+                    f"already chained), {result.waiting:,} waiting on open transactions."
+                ))
+            if not options['loop']:
+                return
+            time.sleep(FLUSH_INTERVAL)
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.18 on 2026-10-18 22:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuditChain',
+            fields=[
+                ('name', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('sequence', models.PositiveBigIntegerField(default=0)),
+                ('head_hash', models.CharField(default='0000000000000000000000000000000000000000000000000000000000000000', max_length=64)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='AuditRecord',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('chain', models.CharField(default='default', max_length=50)),
+                ('sequence', models.PositiveBigIntegerField()),
+                ('recorded_at', models.DateTimeField()),
+                ('actor', models.CharField(help_text="Username of the operator, or 'system'", max_length=150)),
+                ('remote_addr', models.GenericIPAddressField(blank=True, null=True)),
+                ('operation', models.CharField(help_text='e.g. serials.reserve', max_length=50)),
+                ('object_type', models.CharField(help_text='Model label of the affected rows', max_length=100)),
+                ('reason', models.TextField(blank=True)),
+                ('count', models.PositiveBigIntegerField(default=0)),
+                ('first_id', models.BigIntegerField(blank=True, null=True)),
+                ('last_id', models.BigIntegerField(blank=True, null=True)),
+                ('ids_digest', models.CharField(blank=True, help_text='SHA-256 of the sorted affected ids', max_length=64)),
+                ('details', models.JSONField(blank=True, default=dict)),
+                ('prev_hash', models.CharField(max_length=64)),
+                ('hash', models.CharField(max_length=64, unique=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['object_type', 'recorded_at'], name='auditrecord_type_time_idx')],
+                'constraints': [models.UniqueConstraint(fields=('chain', 'sequence'), name='auditrecord_chain_seq_uniq')],
+            },
+        ),
+    ]
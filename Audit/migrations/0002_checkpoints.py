@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-18 23:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Audit', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuditCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('chain', models.CharField(default='default', max_length=50)),
+                ('first_sequence', models.PositiveBigIntegerField()),
+                ('last_sequence', models.PositiveBigIntegerField()),
+                ('merkle_root', models.CharField(max_length=64)),
+                ('head_hash', models.CharField(help_text="Hash of the block's last record", max_length=64)),
+                ('prev_hash', models.CharField(help_text='Hash of the previous checkpoint', max_length=64)),
+                ('hash', models.CharField(max_length=64, unique=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('verified_at', models.DateTimeField()),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('chain', 'last_sequence'), name='auditcheckpoint_chain_seq_uniq')],
+            },
+        ),
+    ]
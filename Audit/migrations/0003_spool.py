@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-18 23:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Audit', '0002_checkpoints'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuditSpoolToken',
+            fields=[
+                ('token', models.UUIDField(primary_key=True, serialize=False)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='auditrecord',
+            name='spool_id',
+            field=models.UUIDField(blank=True, editable=False, null=True, unique=True),
+        ),
+    ]
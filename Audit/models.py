@@ -0,0 +1,165 @@
+import hashlib
+import json
+
+from django.db import models
+
+# prev_hash of the first record of a chain
+GENESIS_HASH = '0' * 64
+# AuditRecord fields covered by its hash
+HASHED_FIELDS = (
+    'chain', 'sequence', 'recorded_at', 'actor', 'remote_addr', 'operation', 'object_type',
+    'reason', 'count', 'first_id', 'last_id', 'ids_digest', 'details',
+)
+
+
+class AppendOnlyError(Exception):
+    """An audit record or checkpoint was about to be changed or deleted."""
+
+
+class AppendOnlyQuerySet(models.QuerySet):
+    # Bookkeeping fields outside the hash, which may still be updated
+    mutable_fields = ()
+
+    def update(self, **kwargs):
+        if not kwargs or not set(kwargs) <= set(self.mutable_fields):
+            raise AppendOnlyError(f"{self.model.__name__} rows cannot be updated.")
+        return super().update(**kwargs)
+
+    def delete(self):
+        raise AppendOnlyError(f"{self.model.__name__} rows cannot be deleted.")
+
+
+def canonical_record(values):
+    """
+    Canonical JSON (sorted keys, no whitespace) of an audit record's fields,
+    from a model instance's or a values() row's `values`; the hashed content.
+    """
+    return json.dumps(
+        {name: values[name].isoformat() if name == 'recorded_at' else values[name] for name in HASHED_FIELDS},
+        sort_keys=True, separators=(',', ':'), ensure_ascii=False,
+    )
+
+
+def record_hash(prev_hash, values):
+    return hashlib.sha256(f"{prev_hash}{canonical_record(values)}".encode('utf-8')).hexdigest()
+
+
+class AuditChain(models.Model):
+    """
+    Head of a hash chain of AuditRecords. Appending updates this row first, so
+    concurrent writers queue on it and every record links to the one before.
+    """
+    name = models.CharField(max_length=50, primary_key=True)
+    sequence = models.PositiveBigIntegerField(default=0)
+    head_hash = models.CharField(max_length=64, default=GENESIS_HASH)
+
+    def __str__(self):
+        return f"{self.name} @ {self.sequence}"
+
+
+class AuditRecord(models.Model):
+    """
+    One audited operation: a bulk change is a single record carrying the
+    affected row count, id range and a digest of the ids, instead of one
+    LogEntry per row. `hash` covers every field and the previous record's hash.
+
+    Append-only: save() only inserts, and updates and deletes raise
+    AppendOnlyError. Changes made behind the ORM's back break the hash chain
+    (see Audit.verification).
+    """
+    chain = models.CharField(max_length=50, default='default')
+    sequence = models.PositiveBigIntegerField()
+    recorded_at = models.DateTimeField()
+    actor = models.CharField(max_length=150, help_text="Username of the operator, or 'system'")
+    remote_addr = models.GenericIPAddressField(null=True, blank=True)
+    operation = models.CharField(max_length=50, help_text="e.g. serials.reserve")
+    object_type = models.CharField(max_length=100, help_text="Model label of the affected rows")
+    reason = models.TextField(blank=True)
+    count = models.PositiveBigIntegerField(default=0)
+    first_id = models.BigIntegerField(null=True, blank=True)
+    last_id = models.BigIntegerField(null=True, blank=True)
+    ids_digest = models.CharField(max_length=64, blank=True, help_text="SHA-256 of the sorted affected ids")
+    details = models.JSONField(default=dict, blank=True)
+    prev_hash = models.CharField(max_length=64)
+    hash = models.CharField(max_length=64, unique=True)
+    # Spool entry the record was chained from (not hashed): makes replaying a spool batch idempotent
+    spool_id = models.UUIDField(null=True, blank=True, unique=True, editable=False)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['chain', 'sequence'], name='auditrecord_chain_seq_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['object_type', 'recorded_at'], name='auditrecord_type_time_idx'),
+        ]
+
+    objects = AppendOnlyQuerySet.as_manager()
+
+    def canonical(self):
+        return canonical_record(vars(self))
+
+    def compute_hash(self):
+        return record_hash(self.prev_hash, vars(self))
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise AppendOnlyError("Audit records cannot be changed.")
+        super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        raise AppendOnlyError("Audit records cannot be deleted.")
+
+    def __str__(self):
+        return f"#{self.sequence} {self.operation} ({self.count:,} {self.object_type})"
+
+
+class AuditSpoolToken(models.Model):
+    """
+    Commit marker of a spooled audit entry queued inside a transaction: it is
+    written in that transaction, so it exists if and only if the transaction
+    committed. The flusher deletes it when the entry is chained.
+    """
+    token = models.UUIDField(primary_key=True)
+
+
+class AuditCheckpointQuerySet(AppendOnlyQuerySet):
+    mutable_fields = ('verified_at',)
+
+
+class AuditCheckpoint(models.Model):
+    """
+    Merkle root over a closed block of a chain's records (sequences first..last),
+    written by verify_audit once the block has verified. Checkpoints are hash-
+    chained too, so a later run only re-checks the records after the last one.
+    """
+    chain = models.CharField(max_length=50, default='default')
+    first_sequence = models.PositiveBigIntegerField()
+    last_sequence = models.PositiveBigIntegerField()
+    merkle_root = models.CharField(max_length=64)
+    head_hash = models.CharField(max_length=64, help_text="Hash of the block's last record")
+    prev_hash = models.CharField(max_length=64, help_text="Hash of the previous checkpoint")
+    hash = models.CharField(max_length=64, unique=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    verified_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['chain', 'last_sequence'], name='auditcheckpoint_chain_seq_uniq'),
+        ]
+
+    objects = AuditCheckpointQuerySet.as_manager()
+
+    def compute_hash(self):
+        content = f"{self.chain}:{self.first_sequence}:{self.last_sequence}:{self.merkle_root}:{self.head_hash}"
+        return hashlib.sha256(f"{self.prev_hash}{content}".encode('utf-8')).hexdigest()
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise AppendOnlyError("Audit checkpoints cannot be changed.")
+        super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        raise AppendOnlyError("Audit checkpoints cannot be deleted.")
+
+    def __str__(self):
+        return f"{self.chain} #{self.first_sequence}-{self.last_sequence}"
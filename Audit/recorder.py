@@ -0,0 +1,193 @@
+# Audit/recorder.py
+"""
+Bulk-aware audit trail.
+
+django-auditlog writes one LogEntry (with a JSON diff) per saved object, which
+is right for edits of a Product or Batch but not for the serial paths that
+touch thousands of rows per statement. Those call record_bulk() once per bulk
+operation instead: who, why, what operation, how many rows, their id range and
+a SHA-256 digest of the ids. Audit cost is then O(batches), not O(rows).
+
+Records are hash-chained (AuditRecord.hash covers the previous hash). They are
+queued in the caller's transaction, so a record is chained if and only if the
+change it describes commits (see Audit.spool).
+
+The operator comes from AuditlogMiddleware (the request user) unless given;
+the reason from the `audit_reason` context manager unless given.
+
+The per-object LogEntry rows of django-auditlog are chained as well
+(record_log_entry, connected in AuditConfig.ready), so editing a LogEntry in
+the database no longer goes unnoticed: its chained copy no longer matches.
+For the models in AUDIT_DEFERRED_LOG_MODELS the LogEntry itself is written by
+the spool flusher, off the request path (Audit.logentries).
+"""
+import contextlib
+import hashlib
+import json
+from contextvars import ContextVar
+
+from auditlog.context import auditlog_value
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from Audit.models import AuditChain, AuditRecord
+from utils import json_codec
+
+DEFAULT_CHAIN = 'default'
+# 'spool': records are queued locally and chained in the background (Audit.spool); 'sync': chained inline
+AUDIT_SINK = getattr(settings, 'AUDIT_SINK', 'spool')
+SYSTEM_ACTOR = 'system'
+
+_reason = ContextVar('audit_reason', default='')
+
+
+@contextlib.contextmanager
+def audit_reason(reason):
+    """Attaches `reason` to the audit records written in the block."""
+    token = _reason.set(reason or '')
+    try:
+        yield
+    finally:
+        _reason.reset(token)
+
+
+def current_reason():
+    """The reason set by the enclosing audit_reason block ('' outside one)."""
+    return _reason.get()
+
+
+def ids_digest(ids):
+    """SHA-256 (hex) of the sorted ids; the same set always gives the same digest."""
+    digest = hashlib.sha256()
+    for pk in sorted(ids):
+        digest.update(f"{pk},".encode())
+    return digest.hexdigest()
+
+
+def _current_actor():
+    """(username, remote address) of the request being audited by AuditlogMiddleware, if any."""
+    context = auditlog_value.get(None) or {}
+    actor = context.get('actor')
+    username = getattr(actor, 'username', None) if actor is not None and actor.is_authenticated else None
+    return username or SYSTEM_ACTOR, context.get('remote_addr')
+
+
+def _lock_chain(name):
+    """Locks the head row of a chain until commit (creating it on first use); returns it."""
+    if not AuditChain.objects.filter(name=name).update(sequence=F('sequence')):
+        AuditChain.objects.get_or_create(name=name)
+        AuditChain.objects.filter(name=name).update(sequence=F('sequence'))
+    return AuditChain.objects.get(name=name)
+
+
+def append_records(chain, entries):
+    """
+    Appends audit entries (dicts of the AuditRecord fields up to `details`, and
+    optionally `spool_id`) to a chain in one transaction; returns the new records.
+    Entries whose spool_id is already in the chain are skipped, so replaying a
+    spool batch after a crash never duplicates a record.
+    """
+    with transaction.atomic():
+        head = _lock_chain(chain)
+        spool_ids = [entry['spool_id'] for entry in entries if entry.get('spool_id')]
+        if spool_ids:
+            done = set(AuditRecord.objects.filter(spool_id__in=spool_ids).values_list('spool_id', flat=True))
+            entries = [entry for entry in entries if entry.get('spool_id') not in done]
+        if not entries:
+            return []
+
+        records = []
+        sequence, prev_hash = head.sequence, head.head_hash
+        for entry in entries:
+            sequence += 1
+            record = AuditRecord(chain=chain, sequence=sequence, prev_hash=prev_hash, **entry)
+            record.hash = prev_hash = record.compute_hash()
+            records.append(record)
+        AuditRecord.objects.bulk_create(records)
+        AuditChain.objects.filter(name=chain).update(sequence=sequence, head_hash=prev_hash)
+    return records
+
+
+def bulk_entry(operation, ids=None, *, object_type='SerialNumber.SerialNumber', count=None,
+               id_range=None, reason=None, actor=None, remote_addr=None, details=None):
+    """
+    The audit entry (AuditRecord fields up to `details`) of a bulk operation;
+    see record_bulk for the parameters.
+    """
+    if ids is not None:
+        ids = list(ids)
+        count = len(ids) if count is None else count
+        id_range = (min(ids), max(ids)) if ids else None
+    first_id, last_id = id_range or (None, None)
+    if actor is None:
+        actor, remote_addr = _current_actor()
+    return {
+        'recorded_at': timezone.now(),
+        'actor': actor,
+        'remote_addr': remote_addr,
+        'operation': operation,
+        'object_type': object_type,
+        'reason': current_reason() if reason is None else reason,
+        'count': count or 0,
+        'first_id': first_id,
+        'last_id': last_id,
+        'ids_digest': ids_digest(ids) if ids else '',
+        # Normalized through JSON so the hashed content survives the database round trip
+        'details': json.loads(json_codec.dumps(details or {})),
+    }
+
+
+def _dispatch(chain, entry):
+    if AUDIT_SINK == 'sync':
+        append_records(chain, [entry])
+    else:
+        from Audit.spool import enqueue
+        enqueue(chain, entry)
+
+
+def record_bulk(operation, ids=None, *, chain=DEFAULT_CHAIN, **fields):
+    """
+    Records one audit entry for a bulk operation: appended to the chain right
+    away with AUDIT_SINK = 'sync', otherwise queued in the local spool
+    (Audit.spool) in the caller's transaction and chained by the flusher.
+
+    :param ids: The affected primary keys; gives count, id range and digest.
+    :param count: / id_range: For operations whose ids are not at hand (e.g. a
+        native load): the row count and the (first, last) id they fall in.
+    :param actor: Username (and remote_addr its address); defaults to the request user, else 'system'.
+    :param reason: Defaults to the enclosing audit_reason block's.
+    :param details: JSON-serializable parameters of the operation (pool, lot, ...).
+    """
+    _dispatch(chain, bulk_entry(operation, ids, **fields))
+
+
+def _content_type_label(content_type):
+    model = content_type.model_class()
+    return model._meta.label if model is not None else f"{content_type.app_label}.{content_type.model}"
+
+
+def log_entry_record(entry):
+    """The audit entry chaining a django-auditlog LogEntry (one per-object create/update/delete/access)."""
+    details = {
+        'log_entry_id': entry.pk,
+        'object_pk': entry.object_pk,
+        'object_repr': entry.object_repr,
+        'changes': entry.changes,
+        'timestamp': entry.timestamp,
+    }
+    return bulk_entry(
+        f"auditlog.{entry.get_action_display()}",
+        [entry.object_id] if entry.object_id is not None else None,
+        object_type=_content_type_label(entry.content_type),
+        count=1,
+        actor=entry.actor.get_username() if entry.actor_id else SYSTEM_ACTOR,
+        remote_addr=entry.remote_addr,
+        details=details,
+    )
+
+
+def record_log_entry(entry):
+    """Chains a LogEntry written synchronously by django-auditlog (see Audit.logentries for deferred ones)."""
+    _dispatch(DEFAULT_CHAIN, log_entry_record(entry))
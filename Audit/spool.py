@@ -0,0 +1,288 @@
+# Audit/spool.py
+"""
+Asynchronous, durable audit sink.
+
+record_bulk() does not chain its record in the request: the entry is written
+to a local spool (an SQLite side-file in WAL mode with synchronous=FULL, so it
+is on disk when enqueue() returns) and a background thread, or the
+flush_audit_spool command, appends spooled entries to the hash chain in
+batches: one chain-head lock and one bulk insert per batch instead of per record.
+
+No record is lost or invented on a crash:
+  - Inside a transaction, the entry is spooled as 'prepared' and an
+    AuditSpoolToken is inserted in the same transaction. The flusher chains a
+    prepared entry once its token is visible (the transaction committed), and
+    drops it once it is older than AUDIT_SPOOL_TXN_TIMEOUT without a token
+    (the transaction rolled back or died).
+  - Outside a transaction the change has already committed, so the entry is
+    spooled as committed.
+  - Entries leave the spool only after the chain transaction committed, and
+    chaining skips entries already chained (AuditRecord.spool_id), so a flush
+    interrupted at any point is simply replayed.
+
+Deferred django-auditlog entries (Audit.logentries) are spooled the same way;
+the flusher creates their LogEntry rows in the chain transaction.
+
+AUDIT_SPOOL_SYNCHRONOUS = 'NORMAL' drops the fsync of every append: entries
+then survive a crash of the process, but not of the machine.
+"""
+import atexit
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import namedtuple
+
+from auditlog.models import LogEntry
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
+from django.db import DatabaseError, connection, transaction
+from django.utils.dateparse import parse_datetime
+
+from Audit.models import AuditRecord, AuditSpoolToken
+from Audit.recorder import DEFAULT_CHAIN, append_records, log_entry_record
+from utils import json_codec
+
+SPOOL_PATH = getattr(settings, 'AUDIT_SPOOL_PATH', settings.BASE_DIR / 'audit_spool.sqlite3')
+# 'FULL': fsync on every append; 'NORMAL': no fsync (WAL), durable across process but not OS crashes
+SYNCHRONOUS = getattr(settings, 'AUDIT_SPOOL_SYNCHRONOUS', 'FULL')
+FLUSH_BATCH_SIZE = getattr(settings, 'AUDIT_SPOOL_BATCH_SIZE', 1000)
+FLUSH_INTERVAL = getattr(settings, 'AUDIT_SPOOL_FLUSH_INTERVAL', 1.0)
+# Seconds after which a prepared entry without a commit token is considered rolled back
+TXN_TIMEOUT = getattr(settings, 'AUDIT_SPOOL_TXN_TIMEOUT', 3600)
+# Start the in-process flusher on first use; turn off when a dedicated flush_audit_spool worker runs
+AUTO_FLUSH = getattr(settings, 'AUDIT_SPOOL_AUTO_FLUSH', True)
+
+SpoolEntry = namedtuple('SpoolEntry', ['id', 'spool_id', 'chain', 'entry', 'prepared', 'queued_at'])
+FlushResult = namedtuple('FlushResult', ['chained', 'discarded', 'waiting', 'last_id'])
+
+
+class AuditSpool:
+    """Append-only queue of audit entries in an SQLite side-file; safe across threads and processes."""
+
+    def __init__(self, path=None):
+        self.path = str(path or SPOOL_PATH)
+        self._local = threading.local()
+
+    def _connection(self):
+        conn = getattr(self._local, 'connection', None)
+        if conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode = WAL')
+            # FULL: fsync on every commit, an entry is durable once append() returns
+            conn.execute(f"PRAGMA synchronous = {'NORMAL' if SYNCHRONOUS == 'NORMAL' else 'FULL'}")
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS audit_spool ('
+                'id INTEGER PRIMARY KEY AUTOINCREMENT, spool_id TEXT NOT NULL, chain TEXT NOT NULL, '
+                'entry TEXT NOT NULL, prepared INTEGER NOT NULL, queued_at REAL NOT NULL)'
+            )
+            self._local.connection = conn
+        return conn
+
+    def append(self, spool_id, chain, entry, prepared):
+        self._connection().execute(
+            'INSERT INTO audit_spool (spool_id, chain, entry, prepared, queued_at) VALUES (?, ?, ?, ?, ?)',
+            (spool_id.hex, chain, json_codec.dumps(entry).decode('utf-8'), int(prepared), time.time()),
+        )
+
+    def read(self, limit, after=0):
+        rows = self._connection().execute(
+            'SELECT id, spool_id, chain, entry, prepared, queued_at FROM audit_spool WHERE id > ? ORDER BY id LIMIT ?',
+            (after, limit),
+        )
+        return [
+            SpoolEntry(pk, uuid.UUID(spool_id), chain, json.loads(entry), bool(prepared), queued_at)
+            for pk, spool_id, chain, entry, prepared, queued_at in rows
+        ]
+
+    def remove(self, ids):
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        conn.executemany('DELETE FROM audit_spool WHERE id = ?', [(pk,) for pk in ids])
+        conn.execute('COMMIT')
+
+    def __len__(self):
+        return self._connection().execute('SELECT COUNT(*) FROM audit_spool').fetchone()[0]
+
+    def close(self):
+        conn = getattr(self._local, 'connection', None)
+        if conn is not None:
+            conn.close()
+            self._local.connection = None
+
+
+_spool = None
+_spool_lock = threading.Lock()
+
+
+def get_spool():
+    global _spool
+    with _spool_lock:
+        if _spool is None:
+            _spool = AuditSpool()
+        return _spool
+
+
+def enqueue(chain, entry, spool=None):
+    """Spools one audit entry (see record_bulk); durable when it returns."""
+    spool = spool or get_spool()
+    spool_id = uuid.uuid4()
+    prepared = connection.in_atomic_block
+    spool.append(spool_id, chain, entry, prepared)
+    if prepared:
+        # Commits or rolls back with the caller's transaction: tells the flusher which happened
+        AuditSpoolToken.objects.create(token=spool_id)
+        transaction.on_commit(_flusher.wake)
+    else:
+        _flusher.wake()
+
+
+def enqueue_log_entry(values, spool=None):
+    """Spools the fields of a deferred LogEntry (see Audit.logentries); the flusher creates it."""
+    enqueue(DEFAULT_CHAIN, {'log_entry': values}, spool)
+
+
+def _chain_entry(spooled):
+    entry = dict(spooled.entry, spool_id=spooled.spool_id)
+    entry['recorded_at'] = parse_datetime(entry['recorded_at'])
+    return entry
+
+
+def _create_log_entries(spooled_entries):
+    """Creates the LogEntry rows of spooled deferred entries; returns {spool_id: chain entry}."""
+    log_entries = []
+    for spooled in spooled_entries:
+        values = dict(spooled.entry['log_entry'])
+        values['timestamp'] = parse_datetime(values['timestamp'])
+        log_entries.append(LogEntry(**values))
+    actors = get_user_model().objects.in_bulk({entry.actor_id for entry in log_entries if entry.actor_id})
+    for entry in log_entries:
+        if entry.actor_id not in actors:
+            # The user was deleted since: LogEntry.actor is SET_NULL too
+            entry.actor_id = None
+    LogEntry.objects.bulk_create(log_entries)
+
+    chain_entries = {}
+    for spooled, entry in zip(spooled_entries, log_entries):
+        entry.content_type = ContentType.objects.get_for_id(entry.content_type_id)
+        if entry.actor_id:
+            entry.actor = actors[entry.actor_id]
+        chain_entries[spooled.spool_id] = dict(log_entry_record(entry), spool_id=spooled.spool_id)
+    return chain_entries
+
+
+def flush_spool(spool=None, batch_size=FLUSH_BATCH_SIZE, txn_timeout=TXN_TIMEOUT, after=0):
+    """
+    Chains one batch of spooled entries (in spool order, from spool id `after` on);
+    returns FlushResult(chained, discarded, waiting, last spool id read).
+    `discarded` entries are dropped unchained (rolled back, or chained already);
+    `waiting` ones belong to transactions that may still be open and stay spooled.
+    """
+    spool = spool or get_spool()
+    batch = spool.read(batch_size, after)
+    if not batch:
+        return FlushResult(0, 0, 0, None)
+
+    prepared = [spooled.spool_id for spooled in batch if spooled.prepared]
+    committed = set(AuditSpoolToken.objects.filter(token__in=prepared).values_list('token', flat=True))
+    unresolved = [spool_id for spool_id in prepared if spool_id not in committed]
+    # Chained by a flush that crashed before removing them from the spool (their token is gone)
+    done = set()
+    if unresolved:
+        done.update(AuditRecord.objects.filter(spool_id__in=unresolved).values_list('spool_id', flat=True))
+    cutoff = time.time() - txn_timeout
+    ready, discarded, waiting = [], [], 0
+    for spooled in batch:
+        if not spooled.prepared or spooled.spool_id in committed:
+            ready.append(spooled)
+        elif spooled.spool_id in done or spooled.queued_at < cutoff:
+            discarded.append(spooled)
+        else:
+            waiting += 1
+
+    pending = []
+    if ready:
+        with transaction.atomic():
+            # Chained by a flush that crashed after its commit: their LogEntry exists already too
+            chained = set(
+                AuditRecord.objects.filter(spool_id__in=[spooled.spool_id for spooled in ready])
+                .values_list('spool_id', flat=True)
+            )
+            pending = [spooled for spooled in ready if spooled.spool_id not in chained]
+            log_entries = _create_log_entries([spooled for spooled in pending if 'log_entry' in spooled.entry])
+            chains = {}
+            for spooled in pending:
+                entry = log_entries.get(spooled.spool_id) or _chain_entry(spooled)
+                chains.setdefault(spooled.chain, []).append(entry)
+            for chain, entries in chains.items():
+                append_records(chain, entries)
+            AuditSpoolToken.objects.filter(token__in=[spooled.spool_id for spooled in ready]).delete()
+    # Only once chained: a crash before this line replays the batch, and append_records skips it
+    spool.remove([spooled.id for spooled in ready + discarded])
+    return FlushResult(len(pending), len(discarded) + len(ready) - len(pending), waiting, batch[-1].id)
+
+
+def drain_spool(spool=None, **options):
+    """
+    Flushes the whole spool; entries of still-open transactions are stepped over
+    (and counted as waiting). Returns the totals as a FlushResult.
+    """
+    chained = discarded = waiting = 0
+    after = last_id = 0
+    while True:
+        result = flush_spool(spool, after=after, **options)
+        if result.last_id is None:
+            return FlushResult(chained, discarded, waiting, last_id)
+        chained += result.chained
+        discarded += result.discarded
+        waiting += result.waiting
+        after = last_id = result.last_id
+
+
+class _Flusher:
+    """Per-process background thread draining the spool every FLUSH_INTERVAL, or sooner when woken."""
+
+    def __init__(self):
+        self._thread = None
+        self._wakeup = threading.Event()
+        self._lock = threading.Lock()
+
+    def wake(self):
+        if AUTO_FLUSH:
+            self._ensure_started()
+            self._wakeup.set()
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='audit-spool-flusher', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(FLUSH_INTERVAL)
+            self._wakeup.clear()
+            try:
+                drain_spool()
+            except (DatabaseError, sqlite3.Error):
+                # The entries stay spooled; the next cycle retries on a fresh connection
+                pass
+            finally:
+                connection.close()
+
+
+_flusher = _Flusher()
+
+
+@atexit.register
+def _flush_at_exit():
+    """Best effort on a clean shutdown; whatever is left is flushed by the next process."""
+    if _spool is not None and AUTO_FLUSH:
+        try:
+            drain_spool()
+        except (DatabaseError, sqlite3.Error):
+            pass
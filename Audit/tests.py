@@ -0,0 +1,313 @@
+import os
+import subprocess
+import sys
+import tempfile
+import textwrap
+from unittest import mock
+
+import datetime
+
+from auditlog.context import set_actor
+from auditlog.models import LogEntry
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import DatabaseError, connection, transaction
+from django.test import TestCase
+
+from Audit import spool as audit_spool
+from Audit.models import AppendOnlyError, AuditChain, AuditCheckpoint, AuditRecord, AuditSpoolToken
+from Audit.recorder import append_records, audit_reason, bulk_entry, ids_digest, record_bulk
+from Audit.verification import merkle_root, verify_block, verify_chain
+from Product.models import Product
+from SerialNumber.models import SerialNumber
+from SerialNumber.service import release_serials, reserve_serials
+from SerialNumberPool.models import SerialNumberPool
+
+
+class AuditSpoolTests(TestCase):
+    """The spool sink never loses the record of a committed change, and never chains a rolled-back one."""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'audit_spool.sqlite3')
+        self.spool = audit_spool.AuditSpool(self.path)
+        self.addCleanup(self.spool.close)
+        patcher = mock.patch.object(audit_spool, '_spool', self.spool)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def assertChainIntact(self):
+        head = AuditChain.objects.get(name='default')
+        self.assertIsNone(verify_block(('default', 1, head.sequence)).error)
+
+    def test_committed_entry_is_chained_by_the_flusher(self):
+        with transaction.atomic():
+            record_bulk('test.reserve', [3, 1, 2], reason="line 4")
+        self.assertFalse(AuditRecord.objects.exists())
+        self.assertEqual(len(self.spool), 1)
+
+        result = audit_spool.drain_spool()
+
+        self.assertEqual((result.chained, result.discarded, result.waiting), (1, 0, 0))
+        record = AuditRecord.objects.get()
+        self.assertEqual((record.operation, record.count, record.first_id, record.last_id), ('test.reserve', 3, 1, 3))
+        self.assertEqual(record.reason, "line 4")
+        self.assertEqual(len(self.spool), 0)
+        self.assertFalse(AuditSpoolToken.objects.exists())
+        self.assertChainIntact()
+
+    def test_rolled_back_entry_is_never_chained(self):
+        with self.assertRaises(ValueError):
+            with transaction.atomic():
+                record_bulk('test.release', [1])
+                raise ValueError("rolled back")
+
+        # The transaction may still be open as far as the flusher knows: the entry waits
+        self.assertEqual(audit_spool.drain_spool().waiting, 1)
+        result = audit_spool.drain_spool(txn_timeout=0)
+
+        self.assertEqual((result.chained, result.discarded), (0, 1))
+        self.assertFalse(AuditRecord.objects.exists())
+        self.assertEqual(len(self.spool), 0)
+
+    def test_entry_survives_process_crash_before_flush(self):
+        script = textwrap.dedent(f"""
+            import os
+            import django
+            django.setup()
+            from Audit import spool
+            spool._spool = spool.AuditSpool({self.path!r})
+            spool.AUTO_FLUSH = False
+            from Audit.recorder import record_bulk
+            record_bulk('test.generate', count=500, id_range=(1, 500), reason="before crash")
+            os._exit(9)  # no atexit flush, no cleanup
+        """)
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE='XTrace.settings')
+        crashed = subprocess.run([sys.executable, '-c', script], cwd=settings.BASE_DIR, env=env)
+        self.assertEqual(crashed.returncode, 9)
+        self.assertEqual(len(self.spool), 1)
+
+        self.assertEqual(audit_spool.drain_spool().chained, 1)
+        record = AuditRecord.objects.get()
+        self.assertEqual((record.operation, record.count, record.reason), ('test.generate', 500, "before crash"))
+        self.assertChainIntact()
+
+    def test_flush_failing_before_commit_loses_nothing(self):
+        for i in range(3):
+            record_bulk('test.confirm', [i])
+
+        with mock.patch.object(AuditRecord.objects, 'bulk_create', side_effect=DatabaseError("connection lost")):
+            with self.assertRaises(DatabaseError):
+                audit_spool.drain_spool()
+        self.assertFalse(AuditRecord.objects.exists())
+        self.assertEqual(len(self.spool), 3)
+
+        self.assertEqual(audit_spool.drain_spool().chained, 3)
+        self.assertEqual(AuditRecord.objects.count(), 3)
+        self.assertChainIntact()
+
+    def test_flush_failing_after_commit_does_not_duplicate(self):
+        for i in range(3):
+            record_bulk('test.confirm', [i])
+
+        with mock.patch.object(audit_spool.AuditSpool, 'remove', side_effect=OSError("disk full")):
+            with self.assertRaises(OSError):
+                audit_spool.drain_spool()
+        self.assertEqual(AuditRecord.objects.count(), 3)
+        self.assertEqual(len(self.spool), 3)
+
+        result = audit_spool.drain_spool()
+        self.assertEqual((result.chained, result.discarded), (0, 3))
+        self.assertEqual(AuditRecord.objects.count(), 3)
+        self.assertEqual(len(self.spool), 0)
+        self.assertChainIntact()
+
+
+class DeferredLogEntryTests(TestCase):
+    """auditlog LogEntries of the deferred models are written by the spool flusher, not by the save."""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.spool = audit_spool.AuditSpool(os.path.join(directory.name, 'audit_spool.sqlite3'))
+        self.addCleanup(self.spool.close)
+        patcher = mock.patch.object(audit_spool, '_spool', self.spool)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _product(self, **fields):
+        return Product.objects.create(**{
+            'name': "Aspirin", 'description': "100 mg", 'code': 'ASP-100', 'primary_gtin': '04012345000009',
+            'manufactured_at': datetime.date(2026, 1, 1), 'shelf_life_days': 730, 'unit': 'd', **fields,
+        })
+
+    def test_save_spools_the_log_entry_and_the_flusher_writes_it(self):
+        with transaction.atomic():
+            product = self._product()
+        self.assertFalse(LogEntry.objects.exists())
+        self.assertEqual(len(self.spool), 1)
+
+        self.assertEqual(audit_spool.drain_spool().chained, 1)
+
+        entry = LogEntry.objects.get()
+        self.assertEqual((entry.action, entry.object_pk, entry.object_repr), (LogEntry.Action.CREATE, str(product.pk), str(product)))
+        self.assertEqual(entry.changes_dict['code'], ['None', 'ASP-100'])
+        record = AuditRecord.objects.get()
+        self.assertEqual((record.operation, record.object_type, record.first_id), ('auditlog.create', 'Product.Product', product.pk))
+        self.assertEqual(record.details['log_entry_id'], entry.pk)
+        head = AuditChain.objects.get(name='default')
+        self.assertIsNone(verify_block(('default', 1, head.sequence)).error)
+
+    def test_update_diff_and_actor_are_taken_at_save_time(self):
+        from auditlog.context import set_actor
+
+        user = get_user_model().objects.create_user('operator', 'operator@example.com')
+        product = self._product()
+        with set_actor(user):
+            product.name = "Aspirin Forte"
+            product.save()
+        product.name = "changed after the save"  # must not leak into the queued diff
+        audit_spool.drain_spool()
+
+        entry = LogEntry.objects.get(action=LogEntry.Action.UPDATE)
+        self.assertEqual(entry.changes_dict['name'], ["Aspirin", "Aspirin Forte"])
+        self.assertEqual((entry.actor, entry.actor_email), (user, 'operator@example.com'))
+        self.assertEqual(AuditRecord.objects.get(operation='auditlog.update').actor, 'operator')
+
+    def test_rolled_back_save_is_never_logged(self):
+        with self.assertRaises(ValueError):
+            with transaction.atomic():
+                self._product()
+                raise ValueError("rolled back")
+
+        result = audit_spool.drain_spool(txn_timeout=0)
+        self.assertEqual((result.chained, result.discarded), (0, 1))
+        self.assertFalse(LogEntry.objects.exists())
+
+    def test_replayed_flush_does_not_duplicate_log_entries(self):
+        self._product()
+        with mock.patch.object(audit_spool.AuditSpool, 'remove', side_effect=OSError("disk full")):
+            with self.assertRaises(OSError):
+                audit_spool.drain_spool()
+
+        self.assertEqual(audit_spool.drain_spool().chained, 0)
+        self.assertEqual(LogEntry.objects.count(), 1)
+        self.assertEqual(AuditRecord.objects.count(), 1)
+
+
+class TestSpoolIsolationTests(TestCase):
+
+    def test_spool_is_outside_the_project(self):
+        self.assertFalse(str(audit_spool.get_spool().path).startswith(str(settings.BASE_DIR)))
+
+
+class AuditVerificationTests(TestCase):
+    """verify_chain detects any change to the records, the tail or the checkpoints."""
+
+    def setUp(self):
+        append_records('default', [bulk_entry('test.generate', [i], actor='system') for i in range(1, 8)])
+
+    def _execute(self, sql, params):
+        with connection.cursor() as cursor:
+            cursor.execute(sql.format(records=AuditRecord._meta.db_table, heads=AuditChain._meta.db_table,
+                                      checkpoints=AuditCheckpoint._meta.db_table), params)
+
+    def test_intact_chain_verifies_and_seals_closed_blocks(self):
+        result = verify_chain('default', interval=3)
+
+        self.assertEqual((result.verified, result.checkpoints, result.errors), (7, 2, []))
+        first, second = AuditCheckpoint.objects.order_by('last_sequence')
+        hashes = list(AuditRecord.objects.filter(sequence__lte=3).order_by('sequence').values_list('hash', flat=True))
+        self.assertEqual(first.merkle_root, merkle_root(hashes))
+        self.assertEqual(second.prev_hash, first.hash)
+        # Only the open block is read again
+        self.assertEqual(verify_chain('default', interval=3)[1:], (1, 0, []))
+
+    def test_changed_record_is_detected(self):
+        self._execute("UPDATE {records} SET reason = %s WHERE sequence = 5", ["edited"])
+
+        self.assertEqual(verify_chain('default').errors, [(5, "content does not match its hash")])
+
+    def test_truncated_tail_is_detected(self):
+        self._execute("DELETE FROM {records} WHERE sequence = 7", [])
+        self._execute("UPDATE {heads} SET sequence = 6 WHERE name = 'default'", [])
+
+        self.assertEqual(verify_chain('default').errors, [(6, "last record does not match the chain head")])
+
+    def test_truncation_behind_the_last_checkpoint_is_detected(self):
+        verify_chain('default', interval=3)
+        self._execute("DELETE FROM {records} WHERE sequence > 6", [])
+        self._execute("UPDATE {heads} SET sequence = 6 WHERE name = 'default'", [])
+
+        self.assertEqual(verify_chain('default', interval=3).errors, [(6, "last record does not match the chain head")])
+
+        self._execute("UPDATE {heads} SET sequence = 2 WHERE name = 'default'", [])
+        self.assertEqual(verify_chain('default', interval=3).errors, [(2, "chain head is behind its last checkpoint")])
+
+    def test_checkpointed_block_is_checked_against_its_root(self):
+        verify_chain('default', interval=3)
+        self._execute("UPDATE {checkpoints} SET merkle_root = %s WHERE last_sequence = 3", ['0' * 64])
+
+        self.assertEqual(verify_chain('default', interval=3).errors, [(3, "checkpoint does not match its hash")])
+
+    def test_checkpoints_are_append_only(self):
+        verify_chain('default', interval=3)
+        with self.assertRaises(AppendOnlyError):
+            AuditCheckpoint.objects.update(merkle_root='0' * 64)
+        with self.assertRaises(AppendOnlyError):
+            AuditCheckpoint.objects.all().delete()
+
+
+class BulkAuditRecordTests(TestCase):
+    """One bulk operation is one chained record naming who, why and exactly which rows."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user('operator', password='secret')
+        cls.pool = SerialNumberPool.manager.create(total_to_generate=500)
+        SerialNumber.objects.bulk_create(
+            [SerialNumber(full_serial_number=f"AR{i:08d}", pool=cls.pool) for i in range(500)]
+        )
+
+    def _records(self):
+        audit_spool.drain_spool()
+        return list(AuditRecord.objects.order_by('sequence'))
+
+    def test_reserve_records_actor_reason_and_id_set(self):
+        with set_actor(self.user, remote_addr='10.0.0.7'), audit_reason("Line 4 restart"):
+            claimed = reserve_serials(self.pool.pool_id, 400, "LOT-1", datetime.date(2028, 1, 1))
+
+        [record] = self._records()
+        ids = [pk for pk, _ in claimed]
+        self.assertEqual(
+            (record.operation, record.object_type, record.actor, record.remote_addr, record.reason),
+            ('serials.reserve', 'SerialNumber.SerialNumber', 'operator', '10.0.0.7', "Line 4 restart"),
+        )
+        self.assertEqual((record.count, record.first_id, record.last_id), (400, min(ids), max(ids)))
+        self.assertEqual(record.ids_digest, ids_digest(ids))
+        self.assertEqual(record.details, {
+            'pool_id': str(self.pool.pool_id), 'requested': 400, 'batch_lot': "LOT-1", 'expiry': "2028-01-01",
+            'equipment_id': None, 'lease_seconds': None,
+        })
+        self.assertEqual(record.hash, record.compute_hash())
+
+    def test_each_transition_is_one_chained_record(self):
+        leased = reserve_serials(self.pool.pool_id, 100, "LOT-1", lease_seconds=60)
+        released = release_serials([pk for pk, _ in leased[::2]])
+
+        reserve_record, release_record = self._records()
+        self.assertEqual(release_record.operation, 'serials.release')
+        self.assertEqual(release_record.actor, 'system')
+        self.assertEqual(release_record.count, released)
+        self.assertEqual(release_record.ids_digest, ids_digest([pk for pk, _ in leased[::2]]))
+        self.assertEqual(release_record.prev_hash, reserve_record.hash)
+        self.assertIsNone(verify_block(('default', 1, release_record.sequence)).error)
+
+    def test_digest_identifies_the_id_set(self):
+        self.assertEqual(ids_digest([3, 1, 2]), ids_digest([1, 2, 3]))
+        self.assertNotEqual(ids_digest([1, 2, 3]), ids_digest([1, 2, 4]))
+
+        # Only the count and range are known for a native load
+        entry = bulk_entry('serials.generate', count=10, id_range=(5, 14), actor='system')
+        self.assertEqual((entry['count'], entry['first_id'], entry['last_id'], entry['ids_digest']), (10, 5, 14, ''))
@@ -0,0 +1,156 @@
+# Audit/verification.py
+"""
+Verification of the audit hash chains.
+
+A chain is cut into blocks of CHECKPOINT_INTERVAL sequences. Every block is
+verified on its own (each record's hash recomputed from its content, each
+prev_hash linked to the record before, no sequence missing), so blocks can be
+spread over a process pool; the parent then checks the links between blocks.
+Once a closed block has verified, its Merkle root is sealed in an
+AuditCheckpoint, and later runs start after the last checkpoint: a routine
+verification only reads the records written since. The last record must
+end in the chain head's hash, so a truncated tail does not pass either.
+
+Merkle trees follow RFC 6962 (leaf = H(0x00 || record hash), node =
+H(0x01 || left || right), an odd node is promoted), so a single record can be
+proven against a checkpoint root without reading its block.
+"""
+import hashlib
+from collections import namedtuple
+
+from django.conf import settings
+from django.utils import timezone
+
+from Audit.models import GENESIS_HASH, HASHED_FIELDS, AuditChain, AuditCheckpoint, AuditRecord, record_hash
+
+CHECKPOINT_INTERVAL = getattr(settings, 'AUDIT_CHECKPOINT_INTERVAL', 100_000)
+
+BlockResult = namedtuple('BlockResult', [
+    'chain', 'first_sequence', 'last_sequence', 'count', 'first_prev_hash', 'last_hash', 'merkle_root', 'error',
+])
+VerificationResult = namedtuple('VerificationResult', ['chain', 'verified', 'checkpoints', 'errors'])
+
+
+def merkle_root(hashes):
+    """RFC 6962 Merkle tree hash of a list of hex record hashes."""
+    level = [hashlib.sha256(b'\x00' + bytes.fromhex(h)).digest() for h in hashes]
+    if not level:
+        return hashlib.sha256(b'').hexdigest()
+    while len(level) > 1:
+        paired = [hashlib.sha256(b'\x01' + level[i] + level[i + 1]).digest() for i in range(0, len(level) - 1, 2)]
+        if len(level) % 2:
+            paired.append(level[-1])
+        level = paired
+    return level[0].hex()
+
+
+def verify_block(block):
+    """
+    Verifies the records of one (chain, first_sequence, last_sequence) block;
+    the BlockResult's error is None when every record's hash and link are intact.
+    """
+    chain, first, last = block
+    rows = (
+        AuditRecord.objects.filter(chain=chain, sequence__gte=first, sequence__lte=last)
+        .order_by('sequence')
+        .values(*HASHED_FIELDS, 'prev_hash', 'hash')
+        .iterator(chunk_size=5000)
+    )
+    hashes = []
+    first_prev_hash = prev_hash = None
+    error = None
+    expected = first
+    for row in rows:
+        sequence = row['sequence']
+        if sequence != expected:
+            error = (expected, "record missing")
+            break
+        if prev_hash is None:
+            first_prev_hash = row['prev_hash']
+        elif row['prev_hash'] != prev_hash:
+            error = (sequence, "prev_hash does not link to the previous record")
+            break
+        if record_hash(row['prev_hash'], row) != row['hash']:
+            error = (sequence, "content does not match its hash")
+            break
+        prev_hash = row['hash']
+        hashes.append(prev_hash)
+        expected += 1
+    if error is None and expected <= last:
+        error = (expected, "record missing")
+    return BlockResult(chain, first, last, len(hashes), first_prev_hash, prev_hash,
+                       merkle_root(hashes) if error is None else None, error)
+
+
+def _verify_checkpoints(checkpoints):
+    """Checks the checkpoint chain itself; returns a list of (sequence, message)."""
+    errors = []
+    prev_hash, expected_first = GENESIS_HASH, 1
+    for checkpoint in checkpoints:
+        if checkpoint.first_sequence != expected_first:
+            errors.append((expected_first, "checkpoints are not contiguous"))
+        if checkpoint.prev_hash != prev_hash or checkpoint.compute_hash() != checkpoint.hash:
+            errors.append((checkpoint.last_sequence, "checkpoint does not match its hash"))
+        prev_hash, expected_first = checkpoint.hash, checkpoint.last_sequence + 1
+    return errors
+
+
+def verify_chain(chain, full=False, map_blocks=map, interval=CHECKPOINT_INTERVAL):
+    """
+    Verifies a chain and seals the closed blocks that verified as checkpoints.
+
+    :param full: Re-verify the checkpointed blocks too (their roots must match).
+    :param map_blocks: map() used over the blocks, e.g. a process pool's imap.
+    :return: VerificationResult(chain, records verified, checkpoints written, errors).
+    """
+    head = AuditChain.objects.get(name=chain)
+    checkpoints = list(AuditCheckpoint.objects.filter(chain=chain).order_by('last_sequence'))
+    errors = _verify_checkpoints(checkpoints)
+    if errors:
+        return VerificationResult(chain, 0, 0, errors)
+
+    if checkpoints and checkpoints[-1].last_sequence > head.sequence:
+        return VerificationResult(chain, 0, 0, [(head.sequence, "chain head is behind its last checkpoint")])
+
+    sealed = {checkpoint.first_sequence: checkpoint for checkpoint in checkpoints}
+    start = 1 if full or not checkpoints else checkpoints[-1].last_sequence + 1
+    prev_hash = GENESIS_HASH if start == 1 else checkpoints[-1].head_hash
+    blocks = []
+    while start <= head.sequence:
+        checkpoint = sealed.get(start)
+        last = checkpoint.last_sequence if checkpoint else min(start + interval - 1, head.sequence)
+        blocks.append((chain, start, last))
+        start = last + 1
+
+    verified = written = 0
+    now = timezone.now()
+    for result in map_blocks(verify_block, blocks):
+        if result.error is not None:
+            errors.append(result.error)
+            break
+        if result.first_prev_hash != prev_hash:
+            errors.append((result.first_sequence, "prev_hash does not link to the previous block"))
+            break
+        checkpoint = sealed.get(result.first_sequence)
+        if checkpoint is not None:
+            if (checkpoint.merkle_root, checkpoint.head_hash) != (result.merkle_root, result.last_hash):
+                errors.append((result.first_sequence, "block does not match its checkpoint"))
+                break
+            AuditCheckpoint.objects.filter(pk=checkpoint.pk).update(verified_at=now)
+        elif result.count == interval:
+            # A closed block: seal it so later runs start after it
+            checkpoint = AuditCheckpoint(
+                chain=chain, first_sequence=result.first_sequence, last_sequence=result.last_sequence,
+                merkle_root=result.merkle_root, head_hash=result.last_hash,
+                prev_hash=checkpoints[-1].hash if checkpoints else GENESIS_HASH, verified_at=now,
+            )
+            checkpoint.hash = checkpoint.compute_hash()
+            checkpoint.save()
+            checkpoints.append(checkpoint)
+            written += 1
+        prev_hash = result.last_hash
+        verified += result.count
+    if not errors and prev_hash != head.head_hash:
+        # The records end before the head: the tail was cut off (or the head rewritten)
+        errors.append((head.sequence, "last record does not match the chain head"))
+    return VerificationResult(chain, verified, written, errors)
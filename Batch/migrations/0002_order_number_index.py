@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 23:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Batch', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='batch',
+            name='order_number',
+            field=models.CharField(db_index=True, max_length=100, verbose_name='Order Number'),
+        ),
+    ]
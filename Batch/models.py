@@ -9,7 +9,7 @@ class Batch(models.Model):
     expiry_date = models.DateField(verbose_name="Expiry Date")
     quantity = models.PositiveIntegerField(verbose_name="Quantity")
     sampled_quantity = models.PositiveIntegerField(verbose_name="Sampled Quantity")
-    order_number = models.CharField(max_length=100, verbose_name="Order Number")
+    order_number = models.CharField(max_length=100, db_index=True, verbose_name="Order Number")
     batch_description = models.TextField(blank=True, null=True, verbose_name="Batch Description")
     
     serial_pool = models.ForeignKey(
@@ -1,3 +1,71 @@
+import datetime
+from unittest import mock
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from Batch.models import Batch
+from Batch.views import BatchIndex
+from Product.models import Product
+from SerialNumberPool.models import SerialNumberPool
 
 # Create your tests here.
+
+class BatchIndexTests(TestCase):
+    """The batch list pages newest first on the primary key, in both directions."""
+
+    @classmethod
+    def setUpTestData(cls):
+        product = Product.objects.create(
+            name="Tablets", description="", code="TAB-1", primary_gtin="00312345678906",
+            manufactured_at=datetime.date(2026, 1, 1), shelf_life_days=730, unit="d",
+        )
+        cls.batches = [
+            Batch.objects.create(
+                batch_number=f"LOT-{i}", product=product, manufactured_at=datetime.date(2026, 1, 1),
+                expiry_date=datetime.date(2028, 1, 1), quantity=10, sampled_quantity=0, order_number=f"PO-{i % 2}",
+                serial_pool=SerialNumberPool.manager.create(total_to_generate=10),
+            )
+            for i in range(5)
+        ]
+
+    def setUp(self):
+        patcher = mock.patch.object(BatchIndex, 'per_page', 2)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _page(self, **params):
+        response = self.client.get(reverse('batch:batch_list'), params)
+        self.assertEqual(response.status_code, 200)
+        context = response.context
+        return [batch.batch_number for batch in context['batches']], context['previous_cursor'], context['next_cursor']
+
+    def test_after_and_before_walk_the_pages(self):
+        pks = [batch.pk for batch in self.batches]
+
+        self.assertEqual(self._page(), (["LOT-4", "LOT-3"], None, pks[3]))
+        self.assertEqual(self._page(after=pks[3]), (["LOT-2", "LOT-1"], pks[2], pks[1]))
+        self.assertEqual(self._page(after=pks[1]), (["LOT-0"], pks[0], None))
+        self.assertEqual(self._page(before=pks[2]), (["LOT-4", "LOT-3"], None, pks[3]))
+        self.assertEqual(self._page(before=pks[0]), (["LOT-2", "LOT-1"], pks[2], pks[1]))
+
+    def test_empty_and_invalid_pages(self):
+        self.assertEqual(self._page(after=self.batches[0].pk), ([], None, None))
+        self.assertEqual(self._page(q="NONE"), ([], None, None))
+        self.assertEqual(self.client.get(reverse('batch:batch_list'), {'after': 'x'}).status_code, 404)
+
+    def test_search_is_paged_too(self):
+        batches, previous_cursor, next_cursor = self._page(q="PO-0")
+
+        self.assertEqual((batches, previous_cursor), (["LOT-4", "LOT-2"], None))
+        self.assertEqual(self._page(q="PO-0", after=next_cursor), (["LOT-0"], self.batches[0].pk, None))
+
+    def test_query_count_does_not_grow_with_the_page(self):
+        url = reverse('batch:batch_list')
+        with CaptureQueriesContext(connection) as small:
+            self.client.get(url)
+        with mock.patch.object(BatchIndex, 'per_page', 5), CaptureQueriesContext(connection) as large:
+            self.client.get(url)
+
+        self.assertEqual(len(small), len(large))
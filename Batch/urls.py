@@ -6,5 +6,6 @@ app_name = "batch"
 
 urlpatterns = [
     path('', BatchIndex.as_view(), name='batch_list'),
+    path('<int:pk>/', BatchDetails.as_view(), name='batch_details'),
     path('create/', BatchCreate.as_view(), name='batch_create'),
 ]
@@ -1,19 +1,33 @@
 from django.shortcuts import render
 from django.views.generic import *
 from Batch.models import Batch
+from SerialNumber.rollup import batch_status_counts
 from SerialNumberPool.models import SerialNumberPool
+from utils.pagination import KeysetListMixin
 # Create your views here.
 
-class BatchIndex(ListView):
-    model = Batch
-    template_name = 'index.html'
+class BatchIndex(KeysetListMixin, ListView):
+    queryset = Batch.objects.select_related('product', 'serial_pool')
+    template_name = 'batch_list.html'
     context_object_name = 'batches'
+    list_fields = [
+        'batch_number', 'order_number', 'quantity', 'expiry_date', 'created_at',
+        'product__name', 'product__primary_gtin',
+        'serial_pool__status', 'serial_pool__generated_count', 'serial_pool__total_to_generate',
+    ]
+    search_fields = ['batch_number', 'order_number']
 
 class BatchDetails(DetailView):
-    model = Batch
-    template_name = 'details.html'
+    queryset = Batch.objects.select_related('product', 'serial_pool')
+    template_name = 'batch_details.html'
     context_object_name = 'batch'
 
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        # Precomputed counters (SerialNumber.rollup): no COUNT over the pool's serials
+        context['serial_counts'] = batch_status_counts(self.object)
+        return context
+
 class BatchUpdate(UpdateView):
     model = Batch
     template_name = 'update.html'
@@ -31,4 +45,5 @@ class BatchCreate(CreateView):
             total_count=form.instance.quantity,
             user=self.request.user
         )
+        form.instance.serial_pool = serial_pool
         return super().form_valid(form)
\ No newline at end of file
@@ -1,5 +1,7 @@
 from django.contrib import admin
-from .models import EPCISEvent
+from .models import EPCISEvent, OutboxEntry, TradingPartner
 # Register your models here.
 
-admin.site.register(EPCISEvent)
\ No newline at end of file
+admin.site.register(EPCISEvent)
+admin.site.register(TradingPartner)
+admin.site.register(OutboxEntry)
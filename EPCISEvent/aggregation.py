@@ -0,0 +1,144 @@
+# EPCISEvent/aggregation.py
+"""
+Packing hierarchy (unit -> case -> pallet) maintained from AggregationEvents.
+
+Containment is a closure table: packing a case of 1,000 units onto a pallet is
+one INSERT ... SELECT that links every ancestor of the pallet with every EPC in
+the case's subtree, and unpacking is the matching DELETE. Lookups never replay
+the event history.
+
+Events may arrive out of event_time order. Each EPC's depth-0 row keeps the
+event_time of the latest aggregation that moved it (placed_at), and an older
+event arriving late leaves that EPC where the newer one put it.
+"""
+from django.db import connection
+
+from EPCISEvent.models import Containment
+
+# Children per statement, below SQLite's bound-parameter limit
+CHUNK_SIZE = 500
+
+
+def _chunks(values, size=CHUNK_SIZE):
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def _placeholders(values):
+    return ', '.join(['%s'] * len(values))
+
+
+def _ensure_nodes(epcs):
+    Containment.objects.bulk_create(
+        [Containment(ancestor=epc, descendant=epc, depth=0) for epc in epcs],
+        batch_size=CHUNK_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def _current_placements(children, event_time):
+    """
+    The children whose latest placement is not newer than `event_time`, stamped
+    with it; the others were moved by a later event already.
+    """
+    _ensure_nodes(children)
+    current = []
+    for chunk in _chunks(children):
+        newer = set(
+            Containment.objects.filter(depth=0, descendant__in=chunk, placed_at__gt=event_time)
+            .values_list('descendant', flat=True)
+        )
+        chunk = [child for child in chunk if child not in newer]
+        Containment.objects.filter(depth=0, descendant__in=chunk).update(placed_at=event_time)
+        current.extend(chunk)
+    return current
+
+
+def _detach(cursor, children):
+    """Cuts each child's subtree loose from whatever currently contains it."""
+    table = Containment._meta.db_table
+    marks = _placeholders(children)
+    cursor.execute(
+        f"DELETE FROM {table} "
+        f"WHERE descendant IN (SELECT descendant FROM {table} WHERE ancestor IN ({marks})) "
+        f"AND ancestor IN (SELECT ancestor FROM {table} WHERE descendant IN ({marks}) AND depth > 0)",
+        children + children,
+    )
+
+
+def pack(parent, children, event_time=None):
+    """
+    Puts `children` (with everything they contain) into `parent`, moving them if already packed.
+    With `event_time`, children placed by a later event stay where they are.
+    """
+    children = [child for child in dict.fromkeys(children) if child and child != parent]
+    if event_time is not None:
+        children = _current_placements(children, event_time)
+    if not children:
+        return
+    _ensure_nodes([parent] + children)
+    table = Containment._meta.db_table
+    with connection.cursor() as cursor:
+        for chunk in _chunks(children):
+            _detach(cursor, chunk)
+            # Every ancestor of parent (itself included) x every EPC under each child (itself included)
+            cursor.execute(
+                f"INSERT INTO {table} (ancestor, descendant, depth) "
+                f"SELECT a.ancestor, d.descendant, a.depth + d.depth + 1 "
+                f"FROM {table} a, {table} d "
+                f"WHERE a.descendant = %s AND d.ancestor IN ({_placeholders(chunk)})",
+                [parent] + chunk,
+            )
+
+
+def unpack(parent, children=None, event_time=None):
+    """
+    Takes `children` out of `parent`; with no children, empties the parent (EPCIS DELETE semantics).
+    With `event_time`, children placed by a later event stay where they are.
+    """
+    if not children:
+        children = list(
+            Containment.objects.filter(ancestor=parent, depth=1).values_list('descendant', flat=True)
+        )
+    children = list(dict.fromkeys(children))
+    if event_time is not None:
+        children = _current_placements(children, event_time)
+    with connection.cursor() as cursor:
+        for chunk in _chunks(children):
+            _detach(cursor, chunk)
+
+
+def apply_aggregation_events(events):
+    """
+    Applies ADD/DELETE AggregationEvents to the hierarchy. Each child ends up
+    where its latest event (by event_time) put it, whatever the order of arrival.
+    Call it inside the transaction that stores the events (save() and capture do).
+    """
+    for event in events:
+        if event.event_type != 'AggregationEvent' or not event.parent_epc:
+            continue
+        if event.action == 'ADD':
+            pack(event.parent_epc, event.epcs(), event.event_time)
+        elif event.action == 'DELETE':
+            unpack(event.parent_epc, event.epcs(), event.event_time)
+
+
+def contents(container, direct=False):
+    """EPCs inside `container`, at any depth (or only its direct children)."""
+    queryset = Containment.objects.filter(ancestor=container)
+    queryset = queryset.filter(depth=1) if direct else queryset.filter(depth__gt=0)
+    return queryset.values_list('descendant', flat=True)
+
+
+def containers(epc):
+    """The containers holding `epc`, nearest first; the last one is the outermost (e.g. the pallet)."""
+    return (
+        Containment.objects.filter(descendant=epc, depth__gt=0)
+        .order_by('depth')
+        .values_list('ancestor', flat=True)
+    )
+
+
+def outermost_container(epc):
+    """The top-level container of `epc`, or None if it is not packed."""
+    return containers(epc).order_by('-depth').first()
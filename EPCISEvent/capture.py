@@ -0,0 +1,299 @@
+# EPCISEvent/capture.py
+"""
+EPCIS 2.0 capture: spools incoming EPCISDocuments to disk, then parses them
+with streaming parsers, validates every event against the CBV and bulk-inserts
+them into EPCISEvent from a background worker pool.
+
+A document is captured atomically, as the EPCIS capture interface requires:
+one invalid event fails the whole job and nothing is stored.
+"""
+import codecs
+import json
+import os
+import shutil
+import uuid
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timezone as dt_timezone
+
+from django.conf import settings
+from django.db import DatabaseError, connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from EPCISEvent.aggregation import apply_aggregation_events
+from EPCISEvent.cbv import normalize_biz_step, normalize_disposition, normalize_location
+from EPCISEvent.models import CaptureJob, EPCISEvent
+from EPCISEvent.outbox import enqueue_events
+from EPCISEvent.projection import apply_events
+
+CAPTURE_SPOOL_DIR = getattr(settings, 'EPCIS_CAPTURE_SPOOL_DIR', settings.BASE_DIR / 'capture_spool')
+CAPTURE_WORKERS = getattr(settings, 'EPCIS_CAPTURE_WORKERS', 4)
+CAPTURE_BATCH_SIZE = 1000
+READ_SIZE = 1 << 16
+# Longest JSON event (characters) read ahead for before the document is rejected
+MAX_EVENT_SIZE = getattr(settings, 'EPCIS_CAPTURE_MAX_EVENT_SIZE', 8 << 20)
+
+EVENT_TYPES = {event_type for event_type, _ in EPCISEvent.EVENT_TYPES}
+ACTIONS = {action for action, _ in EPCISEvent.ACTIONS}
+
+_executor = ThreadPoolExecutor(max_workers=CAPTURE_WORKERS, thread_name_prefix='epcis-capture')
+
+
+class CaptureError(ValueError):
+    """The document (or one of its events) cannot be captured."""
+
+
+# Failures caused by the document or its storage; any other error is a bug, re-raised once the job is failed
+DOCUMENT_ERRORS = (CaptureError, ValueError, ET.ParseError, OSError, DatabaseError)
+
+
+# --- Job lifecycle ---
+
+def create_capture_job(stream, content_type):
+    """Spools the request body to disk and queues a CaptureJob for it."""
+    os.makedirs(CAPTURE_SPOOL_DIR, exist_ok=True)
+    path = os.path.join(CAPTURE_SPOOL_DIR, f"{uuid.uuid4()}.payload")
+    with open(path, 'wb') as spool:
+        shutil.copyfileobj(stream, spool, READ_SIZE)
+
+    job = CaptureJob.objects.create(content_type=content_type, payload_path=path)
+    # Only hand the job to a worker once the row is visible to other connections
+    transaction.on_commit(lambda: _executor.submit(_run_job, job.pk))
+    return job
+
+
+def _run_job(pk):
+    try:
+        process_capture_job(pk)
+    finally:
+        connection.close()
+
+
+def process_capture_job(pk):
+    """
+    Captures one PENDING job. Safe to call concurrently: only one caller claims it.
+    The job always ends SUCCEEDED or FAILED; an unexpected error is re-raised after.
+    """
+    if not CaptureJob.objects.filter(pk=pk, status='PENDING').update(status='RUNNING'):
+        return
+    job = CaptureJob.objects.get(pk=pk)
+
+    unexpected = None
+    try:
+        with open(job.payload_path, 'rb') as payload, transaction.atomic():
+            job.events_captured = capture_document(payload, job.content_type)
+        job.status = 'SUCCEEDED'
+    except Exception as e:
+        job.status = 'FAILED'
+        job.events_captured = 0
+        if isinstance(e, DOCUMENT_ERRORS):
+            job.error = str(e)
+        else:
+            job.error = f"Internal error: {type(e).__name__}: {e}"
+            unexpected = e
+
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'events_captured', 'error', 'finished_at'])
+    if os.path.exists(job.payload_path):
+        os.remove(job.payload_path)
+    if unexpected is not None:
+        raise unexpected
+
+
+def capture_document(stream, content_type):
+    """Parses, validates and bulk-inserts every event of the document; returns the count."""
+    parse = iter_xml_events if 'xml' in content_type else iter_json_events
+    captured = 0
+    batch = []
+    for index, fields in enumerate(parse(stream)):
+        try:
+            batch.append(build_event(fields))
+        except (KeyError, TypeError, ValueError) as e:
+            raise CaptureError(f"Event {index}: {e}")
+        if len(batch) >= CAPTURE_BATCH_SIZE:
+            captured += _insert_batch(batch)
+            batch = []
+    if batch:
+        captured += _insert_batch(batch)
+    return captured
+
+
+def _insert_batch(events):
+    EPCISEvent.objects.bulk_create(events)
+    EPCISEvent.sync_epcs(events)
+    apply_aggregation_events(events)
+    apply_events(events)
+    enqueue_events(events)
+    return len(events)
+
+
+# --- Validation ---
+
+def build_event(fields):
+    """Validates parsed event fields and returns an unsaved EPCISEvent."""
+    event_type = fields['type']
+    if event_type not in EVENT_TYPES:
+        raise ValueError(f"Unsupported event type '{event_type}'.")
+
+    action = fields.get('action') or 'OBSERVE'
+    if action not in ACTIONS:
+        raise ValueError(f"Invalid action '{action}'.")
+
+    event_time = parse_datetime(fields['eventTime'] or '')
+    if event_time is None:
+        raise ValueError(f"Invalid eventTime '{fields['eventTime']}'.")
+    if timezone.is_naive(event_time):
+        event_time = timezone.make_aware(event_time, dt_timezone.utc)
+
+    event = EPCISEvent(
+        event_type=event_type,
+        event_time=event_time,
+        event_timezone_offset=fields.get('eventTimeZoneOffset') or '+00:00',
+        action=action,
+        biz_step=normalize_biz_step(fields['bizStep']) if fields.get('bizStep') else '',
+        disposition=normalize_disposition(fields['disposition']) if fields.get('disposition') else '',
+        read_point=normalize_location(fields.get('readPoint') or ''),
+        biz_location=normalize_location(fields.get('bizLocation') or ''),
+        epc_list=','.join(fields.get('epcs') or []),
+        parent_epc=fields.get('parentID') or '',
+    )
+    event_id = fields.get('eventID') or ''
+    if event_id.startswith('urn:uuid:'):
+        event.event_id = uuid.UUID(event_id[len('urn:uuid:'):])
+    return event
+
+
+# --- Streaming parsers ---
+
+def _json_epcs(data, key):
+    epcs = data.get(key) or []
+    if not isinstance(epcs, list) or not all(isinstance(epc, str) for epc in epcs):
+        raise CaptureError(f"{key} must be an array of EPC strings.")
+    return epcs
+
+
+def _json_location(data, key):
+    location = data.get(key) or {}
+    if not isinstance(location, dict):
+        raise CaptureError(f"{key} must be an object with an 'id'.")
+    return location.get('id')
+
+
+def _json_event_fields(data):
+    epcs = list(_json_epcs(data, 'epcList') or _json_epcs(data, 'childEPCs'))
+    epcs += _json_epcs(data, 'inputEPCList')
+    epcs += _json_epcs(data, 'outputEPCList')
+    return {
+        'type': data.get('type'),
+        'eventID': data.get('eventID'),
+        'eventTime': data.get('eventTime'),
+        'eventTimeZoneOffset': data.get('eventTimeZoneOffset'),
+        'action': data.get('action'),
+        'bizStep': data.get('bizStep'),
+        'disposition': data.get('disposition'),
+        'readPoint': _json_location(data, 'readPoint'),
+        'bizLocation': _json_location(data, 'bizLocation'),
+        'parentID': data.get('parentID'),
+        'epcs': epcs,
+    }
+
+
+def _runs_to_end(error, buffer):
+    """Whether a decode error only means the buffer ends inside the event (more input may complete it)."""
+    # An unterminated string ran to the end of the buffer; other errors point at the offending character
+    # (a \uXXXX escape cut by the buffer end is reported up to 5 characters before it)
+    return error.msg.startswith('Unterminated string') or error.pos >= len(buffer) - 5
+
+
+def iter_json_events(stream):
+    """
+    Yields the events of a JSON-LD EPCISDocument one at a time.
+
+    The envelope is skipped up to the eventList array; each event object is then
+    decoded with JSONDecoder.raw_decode from a sliding buffer, so only one event
+    (plus one read block) is in memory at a time. More input is only read when
+    the event runs to the end of the buffer: malformed JSON fails at once.
+    """
+    decoder = json.JSONDecoder()
+    utf8 = codecs.getincrementaldecoder('utf-8')()
+    buffer = ''
+    pos = 0
+    eof = False
+
+    def read_more():
+        # Drops the consumed prefix, then appends the next block
+        nonlocal buffer, pos, eof
+        data = stream.read(READ_SIZE)
+        if not data:
+            eof = True
+        buffer = buffer[pos:] + (utf8.decode(data, final=eof) if isinstance(data, bytes) else data)
+        pos = 0
+
+    # 1. Find the start of the eventList array
+    while True:
+        marker = buffer.find('"eventList"')
+        if marker != -1:
+            bracket = buffer.find('[', marker)
+            if bracket != -1:
+                pos = bracket + 1
+                break
+        if eof:
+            raise CaptureError("Document has no epcisBody.eventList.")
+        read_more()
+
+    # 2. Decode the events one by one, advancing an offset instead of re-slicing the buffer
+    while True:
+        while pos < len(buffer) and buffer[pos] in ' \t\r\n,':
+            pos += 1
+        if pos == len(buffer):
+            if eof:
+                raise CaptureError("Unterminated eventList.")
+            read_more()
+            continue
+        if buffer[pos] == ']':
+            return
+        try:
+            data, pos_end = decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError as e:
+            if eof or not _runs_to_end(e, buffer):
+                raise CaptureError(f"Malformed event in eventList: {e.msg}.")
+            if len(buffer) - pos > MAX_EVENT_SIZE:
+                raise CaptureError(f"Event in eventList longer than {MAX_EVENT_SIZE:,} characters.")
+            read_more()
+            continue
+        pos = pos_end
+        if not isinstance(data, dict):
+            raise CaptureError("eventList entries must be objects.")
+        yield _json_event_fields(data)
+
+
+def _local(tag):
+    return tag.rsplit('}', 1)[-1]
+
+
+def iter_xml_events(stream):
+    """Yields the events of an XML EPCISDocument with iterparse, clearing each one once read."""
+    event_list = None
+    for kind, element in ET.iterparse(stream, events=('start', 'end')):
+        name = _local(element.tag)
+        if kind == 'start':
+            if name == 'EventList':
+                event_list = element
+            continue
+        if name not in EVENT_TYPES or event_list is None:
+            continue
+
+        fields = {'type': name, 'epcs': []}
+        for child in element:
+            child_name = _local(child.tag)
+            if child_name in ('readPoint', 'bizLocation'):
+                id_element = next(iter(child), None)
+                fields[child_name] = (id_element.text or '').strip() if id_element is not None else ''
+            elif child_name in ('epcList', 'childEPCs', 'inputEPCList', 'outputEPCList'):
+                fields['epcs'].extend((epc.text or '').strip() for epc in child)
+            else:
+                fields[child_name] = (child.text or '').strip()
+        yield fields
+        # Drop the processed event so memory does not grow with the document
+        event_list.clear()
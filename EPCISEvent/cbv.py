@@ -0,0 +1,63 @@
+# EPCISEvent/cbv.py
+"""GS1 Core Business Vocabulary (CBV 2.0) values accepted by EPCISEvent."""
+from utils.gs1 import location_key
+
+BIZ_STEPS = frozenset([
+    'accepting', 'arriving', 'assembling', 'collecting', 'commissioning', 'consigning',
+    'creating_class_instance', 'cycle_counting', 'decommissioning', 'departing', 'destroying',
+    'disassembling', 'dispensing', 'encoding', 'entering_exiting', 'holding', 'inspecting',
+    'installing', 'killing', 'loading', 'other', 'packing', 'picking', 'receiving', 'removing',
+    'repackaging', 'repairing', 'replacing', 'reserving', 'retail_selling', 'sampling',
+    'sensor_reporting', 'shipping', 'staging_outbound', 'stock_taking', 'stocking', 'storing',
+    'transporting', 'unloading', 'unpacking', 'void_shipping',
+])
+
+DISPOSITIONS = frozenset([
+    'active', 'available', 'completeness_verified', 'completeness_inferred', 'conformant',
+    'container_closed', 'container_open', 'damaged', 'destroyed', 'dispensed', 'disposed',
+    'encoded', 'expired', 'in_progress', 'in_transit', 'inactive', 'mismatch_instance',
+    'mismatch_class', 'mismatch_quantity', 'needs_replacement', 'no_pedigree_match',
+    'non_conformant', 'non_sellable_other', 'partially_dispensed', 'recalled', 'reserved',
+    'retail_sold', 'returned', 'sellable_accessible', 'sellable_not_accessible', 'stolen',
+    'unavailable', 'unknown',
+])
+
+# The URI forms a CBV value may arrive in; EPCISEvent stores the bare value
+BIZ_STEP_PREFIXES = (
+    'urn:epcglobal:cbv:bizstep:',
+    'https://ref.gs1.org/cbv/BizStep-',
+    'https://ref.gs1.org/cbv/bizstep/',
+)
+DISPOSITION_PREFIXES = (
+    'urn:epcglobal:cbv:disp:',
+    'https://ref.gs1.org/cbv/Disp-',
+    'https://ref.gs1.org/cbv/disp/',
+)
+
+
+def _normalize(value, prefixes, vocabulary, label):
+    for prefix in prefixes:
+        if value.startswith(prefix):
+            value = value[len(prefix):]
+            break
+    if value not in vocabulary:
+        raise ValueError(f"'{value}' is not a CBV {label}.")
+    return value
+
+
+def normalize_biz_step(value):
+    """Returns the bare CBV bizStep for any of its URI forms; raises ValueError otherwise."""
+    return _normalize(value, BIZ_STEP_PREFIXES, BIZ_STEPS, 'bizStep')
+
+
+def normalize_disposition(value):
+    """Returns the bare CBV disposition for any of its URI forms; raises ValueError otherwise."""
+    return _normalize(value, DISPOSITION_PREFIXES, DISPOSITIONS, 'disposition')
+
+
+def normalize_location(value):
+    """
+    The stored form of a readPoint or bizLocation id, whether it arrives as an
+    SGLN URN or a Digital Link (see utils.gs1.location_key).
+    """
+    return location_key(value)
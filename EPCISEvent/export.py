@@ -0,0 +1,100 @@
+# EPCISEvent/export.py
+"""
+Streams many EPCISEvent rows as a single EPCISDocument (JSON-LD or XML).
+
+The envelope is written once and the events are appended as the queryset is
+read in chunks, so memory stays bounded whatever the size of the export.
+"""
+import zlib
+from xml.sax.saxutils import quoteattr
+
+from django.utils import timezone
+
+from EPCISEvent.models import EPCISEvent, EPCIS_JSON_CONTEXT, NS_EPCIS, NS_XSI, EPCIS_SCHEMA_LOCATION
+from EPCISEvent.xml_templates import render_events_xml
+from utils import json_codec
+
+EXPORT_CHUNK_SIZE = 2000
+EXPORT_FORMATS = ('json', 'xml')
+
+
+def events_between(start=None, end=None, queryset=None):
+    """Events with start <= event_time < end, in (event_time, id) order."""
+    if queryset is None:
+        queryset = EPCISEvent.objects.all()
+    if start is not None:
+        queryset = queryset.filter(event_time__gte=start)
+    if end is not None:
+        queryset = queryset.filter(event_time__lt=end)
+    return queryset.order_by('event_time', 'id')
+
+
+def _json_chunks(queryset, chunk_size):
+    header = json_codec.dumps({
+        "@context": EPCIS_JSON_CONTEXT,
+        "type": "EPCISDocument",
+        "schemaVersion": "2.0",
+        "creationDate": timezone.now(),
+    })
+    # Re-open the envelope object to append the body
+    yield header[:-1] + b',"epcisBody":{"eventList":'
+
+    # The event list is encoded straight to bytes chunks
+    events = (event.epcis_json_event() for event in queryset.iterator(chunk_size=chunk_size))
+    yield from json_codec.iter_array(events, chunk_size)
+    yield b'}}'
+
+
+def _xml_chunks(queryset, chunk_size):
+    yield (
+        '<?xml version="1.0" encoding="utf-8"?>'
+        f'<epcis:EPCISDocument xmlns:epcis="{NS_EPCIS}" xmlns:xsi="{NS_XSI}" schemaVersion="2.0" '
+        f'creationDate={quoteattr(timezone.now().isoformat())} '
+        f'xsi:schemaLocation={quoteattr(EPCIS_SCHEMA_LOCATION)}>'
+        '<EPCISBody><EventList>'
+    )
+
+    # Each event is rendered from its precompiled template (EPCISEvent.xml_templates)
+    parts = []
+    for event_xml in render_events_xml(queryset.iterator(chunk_size=chunk_size)):
+        parts.append(event_xml)
+        if len(parts) >= chunk_size:
+            yield ''.join(parts)
+            parts = []
+    parts.append('</EventList></EPCISBody></epcis:EPCISDocument>')
+    yield ''.join(parts)
+
+
+def stream_epcis_document(queryset, fmt='json', gzip=False, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Yields the EPCISDocument for every event of `queryset` as bytes chunks.
+
+    :param fmt: 'json' (JSON-LD) or 'xml'.
+    :param gzip: Compress the stream (gzip container) as it is produced.
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unsupported export format '{fmt}'.")
+    if fmt == 'json':
+        chunks = _json_chunks(queryset, chunk_size)
+    else:
+        chunks = (chunk.encode('utf-8') for chunk in _xml_chunks(queryset, chunk_size))
+
+    if not gzip:
+        yield from chunks
+        return
+
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31: gzip header and trailer
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def write_epcis_document(queryset, out, **options):
+    """Writes the document to a binary file-like object; returns the number of bytes written."""
+    written = 0
+    for data in stream_epcis_document(queryset, **options):
+        out.write(data)
+        written += len(data)
+    return written
@@ -0,0 +1,31 @@
+# EPCISEvent/management/commands/backfill_event_epcs.py
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from EPCISEvent.models import EPCISEvent
+
+class Command(BaseCommand):
+    help = 'Fills the EPCISEventEPC lookup table from EPCISEvent.epc_list for existing events.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000)
+        parser.add_argument('--from-id', type=int, default=0, help='Resume after this event id.')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        last_id = options['from_id']
+        processed = 0
+
+        # Keyset pagination on id: every batch is an index range scan, and the run can be resumed
+        while True:
+            events = list(
+                EPCISEvent.objects.filter(id__gt=last_id).order_by('id').only('id', 'epc_list')[:batch_size]
+            )
+            if not events:
+                break
+            with transaction.atomic():
+                EPCISEvent.sync_epcs(events)
+            last_id = events[-1].id
+            processed += len(events)
+            self.stdout.write(f"Indexed {processed:,} events (last id {last_id}).")
+
+        self.stdout.write(self.style.SUCCESS(f"Backfill finished: {processed:,} events indexed."))
@@ -0,0 +1,97 @@
+# EPCISEvent/management/commands/benchmark_epcis_xml.py
+import datetime
+import time
+import uuid
+import xml.etree.ElementTree as ET
+from django.core.management.base import BaseCommand, CommandError
+from EPCISEvent.models import EPCISEvent
+from EPCISEvent.xml_templates import render_epcis_xml, render_events_xml
+
+# (event_type, action, biz_step, parent) shapes the benchmark cycles through
+SHAPES = [
+    ('ObjectEvent', 'ADD', 'commissioning', ''),
+    ('ObjectEvent', 'OBSERVE', 'shipping', ''),
+    ('AggregationEvent', 'ADD', 'packing', 'urn:epc:id:sscc:0614141.1234567890'),
+    ('TransactionEvent', 'ADD', 'receiving', ''),
+]
+
+
+def _sample_events(count, epcs_per_event):
+    start = datetime.datetime(2026, 1, 1, tzinfo=datetime.timezone.utc)
+    events = []
+    for index in range(count):
+        event_type, action, biz_step, parent = SHAPES[index % len(SHAPES)]
+        events.append(EPCISEvent(
+            event_id=uuid.UUID(int=index), event_type=event_type, action=action, biz_step=biz_step,
+            event_time=start + datetime.timedelta(seconds=index), disposition='in_progress',
+            read_point='0614141000012', parent_epc=parent,
+            # Every 16th event needs escaping, so both render paths are compared
+            biz_location='0614141000012/254/dock&1' if index % 16 == 0 else '0614141000012/254/dock-1',
+            epc_list=','.join(f'urn:epc:id:sgtin:0614141.812345.{index}-{n}' for n in range(epcs_per_event)),
+        ))
+    return events
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmarks the precompiled EPCIS XML templates against the ElementTree/minidom reference '
+        'serializers, checking that both produce identical bytes.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--events', type=int, default=2000)
+        parser.add_argument('--epcs', type=int, default=10, help='EPCs per event.')
+        parser.add_argument('--repeat', type=int, default=5, help='Runs per measurement (the best is kept).')
+        parser.add_argument('--min-speedup', type=float, default=5.0,
+                            help='Fail if either speedup is below this factor (0 to only report).')
+
+    def _time(self, function):
+        # Best of `repeat` runs, as timeit does: the least disturbed run is the most representative
+        best = None
+        for _ in range(self.repeat):
+            started = time.perf_counter()
+            result = function()
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        return result, best
+
+    def handle(self, *args, **options):
+        events = _sample_events(options['events'], options['epcs'])
+        self.repeat = max(1, options['repeat'])
+        creation_date = '2026-01-01T00:00:00+00:00'
+
+        # Single-event documents (EPCISEvent.to_epcis_xml)
+        reference, reference_seconds = self._time(
+            lambda: [event.build_epcis_dom_document(creation_date) for event in events]
+        )
+        compiled, compiled_seconds = self._time(
+            lambda: [render_epcis_xml(event, creation_date) for event in events]
+        )
+        if reference != compiled:
+            raise CommandError("Templated to_epcis_xml output differs from the reference serializer.")
+        single = reference_seconds / compiled_seconds
+
+        # Bulk export bodies (EPCISEvent.export)
+        def reference_bulk():
+            # The export loop before templates: build under a throwaway parent, serialize, detach
+            parent = ET.Element('EventList')
+            parts = []
+            for event in events:
+                element = event.build_epcis_xml_event(parent)
+                parts.append(ET.tostring(element, encoding='unicode'))
+                parent.remove(element)
+            return ''.join(parts)
+
+        reference, reference_seconds = self._time(reference_bulk)
+        compiled, compiled_seconds = self._time(lambda: ''.join(render_events_xml(events)))
+        if reference != compiled:
+            raise CommandError("Templated export output differs from the reference serializer.")
+        bulk = reference_seconds / compiled_seconds
+
+        self.stdout.write(f"Single-event documents: {single:.1f}x faster ({len(events):,} events, output identical)")
+        self.stdout.write(f"Bulk export bodies:     {bulk:.1f}x faster ({len(events):,} events, output identical)")
+
+        minimum = options['min_speedup']
+        if minimum and min(single, bulk) < minimum:
+            raise CommandError(f"Speedup below {minimum:.1f}x.")
+        self.stdout.write(self.style.SUCCESS("Benchmark passed."))
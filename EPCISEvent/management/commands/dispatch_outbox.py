@@ -0,0 +1,36 @@
+# EPCISEvent/management/commands/dispatch_outbox.py
+import time
+
+from django.core.management.base import BaseCommand
+
+from EPCISEvent.outbox import DISPATCH_BATCH_SIZE, DISPATCH_WORKERS, MAX_ATTEMPTS, dispatch_due
+
+
+class Command(BaseCommand):
+    help = 'Sends the queued outbound EPCIS events to the trading partners (one round, or --loop).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help='Keep dispatching until interrupted.')
+        parser.add_argument('--interval', type=float, default=5.0,
+                            help='Seconds between rounds that found nothing to send (with --loop).')
+        parser.add_argument('--workers', type=int, default=DISPATCH_WORKERS,
+                            help='Partners served concurrently.')
+        parser.add_argument('--batch-size', type=int, default=DISPATCH_BATCH_SIZE,
+                            help='Events coalesced into one document.')
+        parser.add_argument('--max-attempts', type=int, default=MAX_ATTEMPTS,
+                            help='Failed sends before an entry is left DEAD.')
+
+    def handle(self, *args, **options):
+        while True:
+            result = dispatch_due(options['workers'], options['batch_size'], options['max_attempts'])
+            if result.batches:
+                self.stdout.write(self.style.SUCCESS(
+                    f"Sent {result.sent:,} event(s) in {result.batches:,} document(s); "
+                    f"{result.failed:,} to retry, {result.dead:,} dead."
+                ))
+            if not options['loop']:
+                if not result.batches:
+                    self.stdout.write(self.style.SUCCESS("Nothing to send."))
+                return
+            if not result.batches:
+                time.sleep(options['interval'])
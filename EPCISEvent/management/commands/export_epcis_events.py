@@ -0,0 +1,36 @@
+# EPCISEvent/management/commands/export_epcis_events.py
+import sys
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_datetime
+from EPCISEvent.export import EXPORT_FORMATS, events_between, write_epcis_document
+
+class Command(BaseCommand):
+    help = 'Exports EPCIS events in a time window as a single EPCISDocument (JSON-LD or XML).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', type=str, help='Inclusive ISO 8601 start of event_time.')
+        parser.add_argument('--end', type=str, help='Exclusive ISO 8601 end of event_time.')
+        parser.add_argument('--format', choices=EXPORT_FORMATS, default='json')
+        parser.add_argument('--gzip', action='store_true')
+        parser.add_argument('--output', type=str, help='Output file (default: stdout).')
+
+    def handle(self, *args, **options):
+        bounds = {}
+        for name in ('start', 'end'):
+            if options[name]:
+                bounds[name] = parse_datetime(options[name])
+                if bounds[name] is None:
+                    raise CommandError(f"--{name} must be an ISO 8601 datetime.")
+
+        queryset = events_between(bounds.get('start'), bounds.get('end'))
+        started = time.time()
+
+        if options['output']:
+            with open(options['output'], 'wb') as out:
+                written = write_epcis_document(queryset, out, fmt=options['format'], gzip=options['gzip'])
+            self.stdout.write(self.style.SUCCESS(
+                f"Wrote {written:,} bytes to {options['output']} in {time.time() - started:.2f} seconds."
+            ))
+        else:
+            write_epcis_document(queryset, sys.stdout.buffer, fmt=options['format'], gzip=options['gzip'])
@@ -0,0 +1,21 @@
+# EPCISEvent/management/commands/process_capture_jobs.py
+from django.core.management.base import BaseCommand
+from EPCISEvent.capture import process_capture_job
+from EPCISEvent.models import CaptureJob
+
+class Command(BaseCommand):
+    help = 'Processes capture jobs left PENDING (e.g. queued when the server stopped).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requeue-running', action='store_true',
+                            help='Also retry jobs stuck in RUNNING after a crash.')
+
+    def handle(self, *args, **options):
+        if options['requeue_running']:
+            CaptureJob.objects.filter(status='RUNNING').update(status='PENDING')
+
+        pending = list(CaptureJob.objects.filter(status='PENDING').order_by('id').values_list('pk', flat=True))
+        for pk in pending:
+            process_capture_job(pk)
+        failed = CaptureJob.objects.filter(pk__in=pending, status='FAILED').count()
+        self.stdout.write(self.style.SUCCESS(f"Processed {len(pending):,} job(s), {failed:,} failed."))
@@ -0,0 +1,39 @@
+# EPCISEvent/management/commands/rebuild_containment.py
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from EPCISEvent.aggregation import apply_aggregation_events
+from EPCISEvent.models import Containment, EPCISEvent
+
+class Command(BaseCommand):
+    help = 'Rebuilds the Containment hierarchy by replaying every ADD/DELETE AggregationEvent in event_time order.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        events = (
+            EPCISEvent.objects.filter(event_type='AggregationEvent', action__in=['ADD', 'DELETE'])
+            .exclude(parent_epc='')
+            .order_by('event_time', 'id')
+            .only('id', 'event_type', 'event_time', 'action', 'parent_epc', 'epc_list')
+        )
+        replayed = 0
+
+        # One transaction: readers see the old hierarchy until the new one is complete
+        with transaction.atomic():
+            Containment.objects.all().delete()
+            batch = []
+            for event in events.iterator(chunk_size=batch_size):
+                batch.append(event)
+                if len(batch) >= batch_size:
+                    apply_aggregation_events(batch)
+                    replayed += len(batch)
+                    batch = []
+                    self.stdout.write(f"Replayed {replayed:,} aggregation events.")
+            apply_aggregation_events(batch)
+            replayed += len(batch)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Containment rebuilt from {replayed:,} events: {Containment.objects.count():,} rows."
+        ))
@@ -0,0 +1,78 @@
+# EPCISEvent/management/commands/rebuild_epc_states.py
+import multiprocessing
+from django.core.management.base import BaseCommand
+from django.db import connections, transaction
+from django.db.models import Max, Min
+from EPCISEvent.models import EPCISEvent, EPCState
+from EPCISEvent.projection import latest_states, sync_parents_from_containment, upsert_states
+
+PROJECTION_FIELDS = (
+    'id', 'event_time', 'biz_step', 'disposition', 'read_point', 'biz_location', 'parent_epc', 'epc_list',
+)
+
+
+def _init_worker():
+    import django
+    django.setup()
+
+
+def _states_of_id_range(id_range):
+    """Reads the events with start <= id < stop; returns (event count, their latest_states rows)."""
+    start, stop = id_range
+    events = list(EPCISEvent.objects.filter(id__gte=start, id__lt=stop).only(*PROJECTION_FIELDS))
+    return len(events), latest_states(events)
+
+
+def _worker_states_of_id_range(id_range):
+    """Runs in a worker, on the worker's own connection."""
+    try:
+        return _states_of_id_range(id_range)
+    finally:
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    help = (
+        'Rebuilds the EPCState projection from every EPCISEvent, in one transaction. Worker processes '
+        'read and reduce event id ranges in parallel; the time-guarded upsert makes their results '
+        'order-independent. Run rebuild_containment first if the hierarchy is stale.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000, help='Event ids per pass.')
+        parser.add_argument('--workers', type=int, default=1,
+                            help='Parallel worker processes reading the events; only this process writes.')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        workers = max(1, options['workers'])
+
+        bounds = EPCISEvent.objects.aggregate(low=Min('id'), high=Max('id'))
+        ranges = []
+        if bounds['low'] is not None:
+            ranges = [(start, start + batch_size) for start in range(bounds['low'], bounds['high'] + 1, batch_size)]
+
+        projected = 0
+        pool = None
+        if workers > 1 and ranges:
+            # Children must open their own connections rather than share the parent's
+            connections.close_all()
+            pool = multiprocessing.get_context().Pool(workers, initializer=_init_worker)
+        try:
+            results = pool.imap_unordered(_worker_states_of_id_range, ranges) if pool else map(_states_of_id_range, ranges)
+            # One transaction: readers see the old projection until the new one is complete
+            with transaction.atomic():
+                EPCState.objects.all().delete()
+                for count, rows in results:
+                    upsert_states(rows)
+                    projected += count
+                    self.stdout.write(f"Projected {projected:,} events.")
+                sync_parents_from_containment()
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Projection rebuilt from {projected:,} events: {EPCState.objects.count():,} EPCs."
+        ))
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:51
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('EPCISEvent', '0002_remove_epcisevent_product_epcisevent_action_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EPCISEventEPC',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('epc', models.CharField(max_length=255)),
+                ('event', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='epc_entries', to='EPCISEvent.epcisevent')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('epc', 'event'), name='epcisevent_epc_event_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:52
+
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('EPCISEvent', '0003_epcisevent_epc_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CaptureJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('job_id', models.UUIDField(default=uuid.uuid4, editable=False, unique=True)),
+                ('status', models.CharField(choices=[('PENDING', 'Pending'), ('RUNNING', 'Running'), ('SUCCEEDED', 'Succeeded'), ('FAILED', 'Failed')], db_index=True, default='PENDING', max_length=10)),
+                ('content_type', models.CharField(max_length=100)),
+                ('payload_path', models.CharField(help_text='Spooled request body, removed once processed', max_length=500)),
+                ('events_captured', models.PositiveIntegerField(default=0)),
+                ('error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+    ]
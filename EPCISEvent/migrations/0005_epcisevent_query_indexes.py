@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('EPCISEvent', '0004_capturejob'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='epcisevent',
+            index=models.Index(fields=['event_time', 'id'], name='epcisevent_time_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='epcisevent',
+            index=models.Index(fields=['event_type', 'event_time', 'id'], name='epcisevent_type_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='epcisevent',
+            index=models.Index(fields=['biz_step', 'event_time', 'id'], name='epcisevent_step_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='epcisevent',
+            index=models.Index(fields=['biz_location', 'event_time', 'id'], name='epcisevent_loc_time_idx'),
+        ),
+    ]
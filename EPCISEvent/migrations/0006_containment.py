@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-18 21:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('EPCISEvent', '0005_epcisevent_query_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='epcisevent',
+            name='parent_epc',
+            field=models.CharField(blank=True, default='', help_text='parentID of an AggregationEvent', max_length=255),
+        ),
+        migrations.CreateModel(
+            name='Containment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ancestor', models.CharField(max_length=255)),
+                ('descendant', models.CharField(max_length=255)),
+                ('depth', models.PositiveSmallIntegerField()),
+            ],
+            options={
+                'indexes': [models.Index(fields=['descendant', 'depth'], name='containment_desc_depth_idx')],
+                'constraints': [models.UniqueConstraint(fields=('ancestor', 'descendant'), name='containment_anc_desc_uniq')],
+            },
+        ),
+    ]
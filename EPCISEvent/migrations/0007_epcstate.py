@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 21:50
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('EPCISEvent', '0006_containment'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EPCState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('epc', models.CharField(max_length=255, unique=True)),
+                ('event_time', models.DateTimeField()),
+                ('biz_step', models.CharField(max_length=100)),
+                ('disposition', models.CharField(blank=True, max_length=100)),
+                ('read_point', models.CharField(blank=True, max_length=255)),
+                ('biz_location', models.CharField(blank=True, max_length=255)),
+                ('parent_epc', models.CharField(blank=True, db_index=True, max_length=255)),
+                ('event', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='EPCISEvent.epcisevent')),
+            ],
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.2.18 on 2026-10-18 22:30
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('EPCISEvent', '0007_epcstate'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TradingPartner',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('code', models.CharField(max_length=50, unique=True)),
+                ('name', models.CharField(max_length=255)),
+                ('transport', models.CharField(choices=[('FILE', 'File drop'), ('HTTP', 'HTTP POST')], default='FILE', max_length=10)),
+                ('endpoint', models.CharField(blank=True, help_text='URL (HTTP) or directory (FILE); FILE defaults to EPCIS_OUTBOX_DIR/<code>', max_length=500)),
+                ('document_format', models.CharField(choices=[('xml', 'XML'), ('json', 'JSON-LD')], default='xml', max_length=4)),
+                ('biz_steps', models.CharField(blank=True, help_text='Comma-separated bizSteps to send; empty sends every event', max_length=500)),
+                ('is_active', models.BooleanField(default=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='OutboxEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('PENDING', 'Pending'), ('SENDING', 'Sending'), ('SENT', 'Sent'), ('DEAD', 'Dead (retries exhausted)')], default='PENDING', max_length=10)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('next_attempt_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('claimed_at', models.DateTimeField(blank=True, null=True)),
+                ('dispatch_id', models.UUIDField(blank=True, help_text='Document the entry was last sent in', null=True)),
+                ('last_error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('sent_at', models.DateTimeField(blank=True, null=True)),
+                ('event', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='EPCISEvent.epcisevent')),
+                ('partner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='outbox', to='EPCISEvent.tradingpartner')),
+            ],
+            options={
+                'verbose_name_plural': 'Outbox entries',
+                'indexes': [models.Index(fields=['partner', 'status', 'next_attempt_at', 'id'], name='outbox_due_idx')],
+                'constraints': [models.UniqueConstraint(fields=('partner', 'event'), name='outbox_partner_event_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('EPCISEvent', '0008_outbox'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='containment',
+            name='placed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -1,9 +1,16 @@
 import uuid
-import json
-from django.db import models
+from django.db import models, transaction
 from django.utils import timezone
 import xml.etree.ElementTree as ET
 from xml.dom import minidom
+from utils import json_codec
+from utils.gs1 import location_digital_link, location_urn
+
+EPCIS_JSON_CONTEXT = "https://ref.gs1.org/standards/epcis/2.0.0/epcis-context.jsonld"
+NS_EPCIS = "urn:epcglobal:epcis:xsd:2"
+NS_XSI = "http://www.w3.org/2001/XMLSchema-instance"
+NS_CBVMDA = "urn:epcglobal:cbv:mda"
+EPCIS_SCHEMA_LOCATION = f"{NS_EPCIS} http://www.gs1.org/standards/epcis/EPCIS_2_0.xsd"
 
 class EPCISEvent(models.Model):
     # EPCIS 2.0 Event Types
@@ -38,18 +45,75 @@ class EPCISEvent(models.Model):
     
     # EPCs should be stored in a way that allows list conversion
     epc_list = models.TextField(help_text="Comma-separated GS1 Digital Links or URNs")
+    # AggregationEvent only: the container (pallet, case, ...) epc_list is packed into or unpacked from
+    parent_epc = models.CharField(max_length=255, blank=True, default='', help_text="parentID of an AggregationEvent")
+    # Changes when the event is edited (admin), so cached query pages (ETag) are invalidated
+    updated_at = models.DateTimeField(auto_now=True)
 
-    def get_epcis_json(self):
-        """Generates a strictly compliant EPCIS 2.0 JSON-LD document."""
-        
-        # 1. Define the context (Required for JSON-LD)
-        context = "https://ref.gs1.org/standards/epcis/2.0.0/epcis-context.jsonld"
-        
-        # 2. Build the event structure
-        event_data = {
+    class Meta:
+        indexes = [
+            # Keyset order of the query interface (EPCISEvent.query) and exports
+            models.Index(fields=['event_time', 'id'], name='epcisevent_time_id_idx'),
+            # Equality filter + keyset order, so a filtered page is still a range scan
+            models.Index(fields=['event_type', 'event_time', 'id'], name='epcisevent_type_time_idx'),
+            models.Index(fields=['biz_step', 'event_time', 'id'], name='epcisevent_step_time_idx'),
+            models.Index(fields=['biz_location', 'event_time', 'id'], name='epcisevent_loc_time_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        adding = self._state.adding
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            EPCISEvent.sync_epcs([self])
+            if adding:
+                from EPCISEvent.aggregation import apply_aggregation_events
+                from EPCISEvent.outbox import enqueue_events
+                from EPCISEvent.projection import apply_events
+                apply_aggregation_events([self])
+                apply_events([self])
+                enqueue_events([self])
+
+    def epcs(self):
+        """The epc_list as a list of stripped, non-empty EPCs."""
+        return [epc.strip() for epc in self.epc_list.split(',') if epc.strip()]
+
+    @classmethod
+    def sync_epcs(cls, events):
+        """
+        Rewrites the EPCISEventEPC rows of saved events. save() calls it; bulk
+        paths (bulk_create, capture) must call it themselves.
+        """
+        events = [event for event in events if event.pk is not None]
+        EPCISEventEPC.objects.filter(event__in=events).delete()
+        EPCISEventEPC.objects.bulk_create(
+            [
+                EPCISEventEPC(event=event, epc=epc)
+                for event in events
+                for epc in dict.fromkeys(event.epcs())
+            ],
+            batch_size=5000,
+        )
+
+    @classmethod
+    def for_epc(cls, epc):
+        """Events that touched `epc`, oldest first (indexed lookup through EPCISEventEPC)."""
+        return cls.objects.filter(epc_entries__epc=epc).order_by('event_time', 'id')
+
+    @classmethod
+    def export_document(cls, queryset=None, start=None, end=None, **options):
+        """
+        Streams one EPCISDocument (bytes chunks) holding every selected event.
+        See EPCISEvent.export.stream_epcis_document for the options (fmt, gzip, chunk_size).
+        """
+        from EPCISEvent.export import events_between, stream_epcis_document
+        return stream_epcis_document(events_between(start, end, queryset), **options)
+
+    def epcis_json_event(self):
+        """Builds the EPCIS 2.0 JSON-LD structure of this event (without the document envelope)."""
+        data = {
             "type": self.event_type, # e.g., "ObjectEvent"
             "eventID": f"urn:uuid:{self.event_id}",
-            "eventTime": self.event_time.isoformat(),
+            "eventTime": self.event_time, # written natively by utils.json_codec
             "eventTimeZoneOffset": self.event_timezone_offset,
             "action": self.action, # Must be OBSERVE, ADD, or DELETE
             
@@ -62,38 +126,55 @@ class EPCISEvent(models.Model):
             
             # 'Where' - SGLN (Global Location Number) 
             # Using the GS1 Digital Link URI format for locations
-            "readPoint": {"id": f"https://id.gs1.org/414/{self.read_point}"},
-            "bizLocation": {"id": f"https://id.gs1.org/414/{self.biz_location}"}
+            "readPoint": {"id": location_digital_link(self.read_point)},
+            "bizLocation": {"id": location_digital_link(self.biz_location)}
         }
+        if self.parent_epc:
+            data["parentID"] = self.parent_epc
+        return data
+
+    def get_epcis_json(self, pretty=False):
+        """Generates a strictly compliant EPCIS 2.0 JSON-LD document (compact unless pretty=True)."""
+        
+        # 1. Define the context (Required for JSON-LD)
+        context = EPCIS_JSON_CONTEXT
+        
+        # 2. Build the event structure
+        event_data = self.epcis_json_event()
 
         # 3. Wrap in an EPCISDocument (The compliant envelope)
         epcis_document = {
             "@context": context,
             "type": "EPCISDocument",
             "schemaVersion": "2.0",
-            "creationDate": timezone.now().isoformat(),
+            "creationDate": timezone.now(),
             "epcisBody": {
                 "eventList": [event_data]
             }
         }
         
-        return json.dumps(epcis_document, indent=4)
+        return json_codec.dumps(epcis_document, pretty=pretty).decode('utf-8')
     def to_epcis_xml(self):
         """Generates a strictly compliant EPCIS 2.0 XML Document."""
+        # Precompiled per event shape; byte-identical to build_epcis_dom_document()
+        from EPCISEvent.xml_templates import render_epcis_xml
+        return render_epcis_xml(self, timezone.now().isoformat())
+
+    def build_epcis_dom_document(self, creation_date, mark=None):
+        """
+        Reference serializer of to_epcis_xml(), through ElementTree and minidom.
+        `mark` may rewrite the built event element (used to compile the templates).
+        """
         
         # 1. Define Namespaces
-        NS_EPCIS = "urn:epcglobal:epcis:xsd:2"
-        NS_XSI = "http://www.w3.org/2001/XMLSchema-instance"
-        NS_CBVMDA = "urn:epcglobal:cbv:mda"
-        
         ET.register_namespace('epcis', NS_EPCIS)
         ET.register_namespace('xsi', NS_XSI)
         
         # 2. Root: EPCISDocument
         root = ET.Element(f"{{{NS_EPCIS}}}EPCISDocument", {
             "schemaVersion": "2.0",
-            "creationDate": timezone.now().isoformat(),
-            f"{{{NS_XSI}}}schemaLocation": f"{NS_EPCIS} http://www.gs1.org/standards/epcis/EPCIS_2_0.xsd"
+            "creationDate": creation_date,
+            f"{{{NS_XSI}}}schemaLocation": EPCIS_SCHEMA_LOCATION
         })
 
         # 3. EPCISBody and EventList
@@ -101,13 +182,26 @@ class EPCISEvent(models.Model):
         event_list = ET.SubElement(body, "EventList")
         
         # 4. The Specific Event (ObjectEvent, AggregationEvent, etc.)
-        event = ET.SubElement(event_list, self.event_type)
+        event = self.build_epcis_xml_event(event_list)
+        if mark is not None:
+            mark(event)
+
+        # 5. Format and Return
+        xml_str = ET.tostring(root, encoding='utf-8')
+        return minidom.parseString(xml_str).toprettyxml(indent="  ")
+
+    def build_epcis_xml_event(self, parent):
+        """Appends this event's EPCIS 2.0 XML element to `parent` and returns it."""
+        event = ET.SubElement(parent, self.event_type)
         
         # Required v2 Elements
         ET.SubElement(event, "eventTime").text = self.event_time.isoformat()
         ET.SubElement(event, "eventTimeZoneOffset").text = self.event_timezone_offset
         ET.SubElement(event, "eventID").text = f"urn:uuid:{self.event_id}"
         
+        if self.parent_epc:
+            ET.SubElement(event, "parentID").text = self.parent_epc
+
         # What: epcList
         epc_list_container = ET.SubElement(event, "epcList")
         for epc in self.epc_list.split(','):
@@ -122,11 +216,154 @@ class EPCISEvent(models.Model):
         
         # Where: readPoint and bizLocation
         read_point_id = ET.SubElement(ET.SubElement(event, "readPoint"), "id")
-        read_point_id.text = f"urn:epc:id:sgln:{self.read_point}"
+        read_point_id.text = location_urn(self.read_point)
         
         biz_loc_id = ET.SubElement(ET.SubElement(event, "bizLocation"), "id")
-        biz_loc_id.text = f"urn:epc:id:sgln:{self.biz_location}"
+        biz_loc_id.text = location_urn(self.biz_location)
+        return event
 
-        # 5. Format and Return
-        xml_str = ET.tostring(root, encoding='utf-8')
-        return minidom.parseString(xml_str).toprettyxml(indent="  ")
\ No newline at end of file
+
+class EPCISEventEPC(models.Model):
+    """One row per (event, EPC): the indexed form of EPCISEvent.epc_list for traceability queries."""
+    event = models.ForeignKey(EPCISEvent, on_delete=models.CASCADE, related_name='epc_entries')
+    epc = models.CharField(max_length=255)
+
+    class Meta:
+        constraints = [
+            # epc first: serves EPCISEvent.for_epc() as an index range scan
+            models.UniqueConstraint(fields=['epc', 'event'], name='epcisevent_epc_event_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.epc} @ {self.event_id}"
+
+
+class Containment(models.Model):
+    """
+    Closure table of the packing hierarchy built by ADD/DELETE AggregationEvents.
+
+    One row per (ancestor, descendant) pair at any depth, plus a depth-0 row per
+    known EPC, so both "everything inside this pallet" and "which pallet holds
+    this unit" are single indexed queries. Maintained by EPCISEvent.aggregation.
+    """
+    ancestor = models.CharField(max_length=255)
+    descendant = models.CharField(max_length=255)
+    depth = models.PositiveSmallIntegerField()
+    # On depth-0 rows: event_time of the latest AggregationEvent that packed or unpacked the EPC
+    placed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            # ancestor first: serves contents() as an index range scan
+            models.UniqueConstraint(fields=['ancestor', 'descendant'], name='containment_anc_desc_uniq'),
+        ]
+        indexes = [
+            # Serves containers(): the ancestors of one EPC, nearest first
+            models.Index(fields=['descendant', 'depth'], name='containment_desc_depth_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.descendant} in {self.ancestor} (depth {self.depth})"
+
+
+class EPCState(models.Model):
+    """
+    Where an EPC is now: the why/where of the latest event that mentioned it and
+    its direct container. Projected by EPCISEvent.projection; never edit by hand.
+    """
+    epc = models.CharField(max_length=255, unique=True)
+    event = models.ForeignKey(EPCISEvent, null=True, on_delete=models.SET_NULL, related_name='+')
+    event_time = models.DateTimeField()
+    biz_step = models.CharField(max_length=100)
+    disposition = models.CharField(max_length=100, blank=True)
+    read_point = models.CharField(max_length=255, blank=True)
+    biz_location = models.CharField(max_length=255, blank=True)
+    parent_epc = models.CharField(max_length=255, blank=True, db_index=True)
+
+    def __str__(self):
+        return f"{self.epc}: {self.biz_step}/{self.disposition} @ {self.biz_location}"
+
+
+class CaptureJob(models.Model):
+    """An EPCISDocument received by /api/capture, processed in the background."""
+    STATUSES = [
+        ('PENDING', 'Pending'),
+        ('RUNNING', 'Running'),
+        ('SUCCEEDED', 'Succeeded'),
+        ('FAILED', 'Failed'),
+    ]
+
+    job_id = models.UUIDField(default=uuid.uuid4, editable=False, unique=True)
+    status = models.CharField(max_length=10, choices=STATUSES, default='PENDING', db_index=True)
+    content_type = models.CharField(max_length=100)
+    payload_path = models.CharField(max_length=500, help_text="Spooled request body, removed once processed")
+    events_captured = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Capture {self.job_id} ({self.status})"
+
+
+class TradingPartner(models.Model):
+    """A recipient of outbound EPCIS documents (see EPCISEvent.outbox)."""
+    TRANSPORTS = [
+        ('FILE', 'File drop'),
+        ('HTTP', 'HTTP POST'),
+    ]
+    FORMATS = [
+        ('xml', 'XML'),
+        ('json', 'JSON-LD'),
+    ]
+
+    code = models.CharField(max_length=50, unique=True)
+    name = models.CharField(max_length=255)
+    transport = models.CharField(max_length=10, choices=TRANSPORTS, default='FILE')
+    endpoint = models.CharField(max_length=500, blank=True, help_text="URL (HTTP) or directory (FILE); FILE defaults to EPCIS_OUTBOX_DIR/<code>")
+    document_format = models.CharField(max_length=4, choices=FORMATS, default='xml')
+    biz_steps = models.CharField(max_length=500, blank=True, help_text="Comma-separated bizSteps to send; empty sends every event")
+    is_active = models.BooleanField(default=True)
+
+    def wants(self, event):
+        return not self.biz_steps or event.biz_step in {step.strip() for step in self.biz_steps.split(',')}
+
+    def __str__(self):
+        return f"{self.name} ({self.code})"
+
+
+class OutboxEntry(models.Model):
+    """
+    One event waiting to be sent to one partner. Written in the transaction that
+    stores the event, so capture never waits on the partner and nothing is lost.
+    """
+    STATUSES = [
+        ('PENDING', 'Pending'),
+        ('SENDING', 'Sending'),
+        ('SENT', 'Sent'),
+        ('DEAD', 'Dead (retries exhausted)'),
+    ]
+
+    partner = models.ForeignKey(TradingPartner, on_delete=models.CASCADE, related_name='outbox')
+    event = models.ForeignKey(EPCISEvent, on_delete=models.CASCADE, related_name='+')
+    status = models.CharField(max_length=10, choices=STATUSES, default='PENDING')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    dispatch_id = models.UUIDField(null=True, blank=True, help_text="Document the entry was last sent in")
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name_plural = "Outbox entries"
+        constraints = [
+            models.UniqueConstraint(fields=['partner', 'event'], name='outbox_partner_event_uniq'),
+        ]
+        indexes = [
+            # Serves the worker's claim: due entries of one partner in id order
+            models.Index(fields=['partner', 'status', 'next_attempt_at', 'id'], name='outbox_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.event_id} -> {self.partner_id} ({self.status})"
@@ -0,0 +1,185 @@
+# EPCISEvent/outbox.py
+"""
+Outbound EPCIS dispatch through a transactional outbox.
+
+Storing an event only adds an OutboxEntry per interested TradingPartner, in
+the same transaction, so capture and commissioning never wait on a partner.
+A worker (manage.py dispatch_outbox) then claims the due entries of each
+partner in batches, coalesces a batch into one EPCISDocument and hands it to
+the partner's transport (EPCISEvent.transports).
+
+  - Failed batches are retried with exponential backoff and jitter; entries
+    that exhaust EPCIS_OUTBOX_MAX_ATTEMPTS are left DEAD for an operator.
+  - At most one batch per partner is in flight, and at most `workers`
+    partners are served at once, so a slow partner cannot hold up the others
+    or be flooded.
+  - Delivery is at-least-once: a worker that dies mid-send leaves its entries
+    SENDING, and they are claimed again after EPCIS_OUTBOX_CLAIM_TIMEOUT.
+"""
+import random
+import uuid
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from EPCISEvent.models import EPCISEvent, OutboxEntry, TradingPartner
+from EPCISEvent.transports import TransportError, get_transport
+
+DISPATCH_BATCH_SIZE = getattr(settings, 'EPCIS_OUTBOX_BATCH_SIZE', 500)
+DISPATCH_WORKERS = getattr(settings, 'EPCIS_OUTBOX_WORKERS', 4)
+MAX_ATTEMPTS = getattr(settings, 'EPCIS_OUTBOX_MAX_ATTEMPTS', 10)
+# Seconds; the delay doubles per failed attempt, up to BACKOFF_MAX
+BACKOFF_BASE = getattr(settings, 'EPCIS_OUTBOX_BACKOFF_BASE', 30)
+BACKOFF_MAX = getattr(settings, 'EPCIS_OUTBOX_BACKOFF_MAX', 3600)
+CLAIM_TIMEOUT = getattr(settings, 'EPCIS_OUTBOX_CLAIM_TIMEOUT', 600)
+
+DispatchResult = namedtuple('DispatchResult', ['batches', 'sent', 'failed', 'dead'])
+
+
+# --- Enqueueing (inside the storing transaction) ---
+
+def enqueue_events(events):
+    """
+    Queues saved events for every active partner that wants them; returns the
+    number of entries added. Call it in the transaction that stores the events.
+    """
+    partners = list(TradingPartner.objects.filter(is_active=True))
+    if not partners:
+        return 0
+    entries = [
+        OutboxEntry(partner=partner, event_id=event.pk)
+        for event in events
+        if event.pk is not None
+        for partner in partners
+        if partner.wants(event)
+    ]
+    OutboxEntry.objects.bulk_create(entries, batch_size=5000, ignore_conflicts=True)
+    return len(entries)
+
+
+# --- Claiming ---
+
+def backoff_delay(attempts):
+    """Seconds before retry number `attempts` (1-based): exponential, capped, with full jitter on the top half."""
+    delay = min(BACKOFF_MAX, BACKOFF_BASE * 2 ** (attempts - 1))
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+def release_stale_claims(timeout=CLAIM_TIMEOUT):
+    """Puts entries left SENDING by a worker that died back to PENDING; returns the count."""
+    cutoff = timezone.now() - timedelta(seconds=timeout)
+    return OutboxEntry.objects.filter(status='SENDING', claimed_at__lt=cutoff).update(status='PENDING', claimed_at=None)
+
+
+def claim_batch(partner, batch_size=DISPATCH_BATCH_SIZE):
+    """
+    Marks up to `batch_size` due entries of the partner SENDING under a new
+    dispatch id; returns (dispatch_id, entry ids), or None when there is nothing
+    to send or a batch of this partner is still in flight or being claimed.
+
+    The partner's row is locked (FOR UPDATE SKIP LOCKED) for the claim, so two
+    workers never both find no batch in flight and claim one each: the second
+    skips the partner instead of waiting. The due entries are locked the same
+    way, against release_stale_claims() and a finishing send_batch().
+    """
+    now = timezone.now()
+    skip_locked = connection.features.has_select_for_update_skip_locked
+    with transaction.atomic():
+        if not TradingPartner.objects.select_for_update(skip_locked=skip_locked).filter(pk=partner.pk).exists():
+            return None
+        if OutboxEntry.objects.filter(partner=partner, status='SENDING').exists():
+            return None
+        entry_ids = list(
+            OutboxEntry.objects.select_for_update(skip_locked=skip_locked)
+            .filter(partner=partner, status='PENDING', next_attempt_at__lte=now)
+            .order_by('id')
+            .values_list('id', flat=True)[:batch_size]
+        )
+        if not entry_ids:
+            return None
+        dispatch_id = uuid.uuid4()
+        OutboxEntry.objects.filter(id__in=entry_ids).update(status='SENDING', claimed_at=now, dispatch_id=dispatch_id)
+    return dispatch_id, entry_ids
+
+
+# --- Sending ---
+
+def build_document(partner, entry_ids):
+    """The EPCISDocument (bytes) of the events of the entries, in the partner's format."""
+    events = EPCISEvent.objects.filter(id__in=OutboxEntry.objects.filter(id__in=entry_ids).values('event_id'))
+    return b''.join(EPCISEvent.export_document(queryset=events, fmt=partner.document_format))
+
+
+def _mark_failed(entry_ids, error, max_attempts):
+    """Schedules the retry of a failed batch; returns the number of entries given up on."""
+    now = timezone.now()
+    entries = OutboxEntry.objects.filter(id__in=entry_ids, status='SENDING')
+    dead = entries.filter(attempts__gte=max_attempts - 1).update(
+        status='DEAD', attempts=F('attempts') + 1, claimed_at=None, last_error=error,
+    )
+    attempts = max(entries.values_list('attempts', flat=True), default=0) + 1
+    entries.update(
+        status='PENDING', attempts=F('attempts') + 1, claimed_at=None, last_error=error,
+        next_attempt_at=now + timedelta(seconds=backoff_delay(attempts)),
+    )
+    return dead
+
+
+def send_batch(partner, dispatch_id, entry_ids, max_attempts=MAX_ATTEMPTS):
+    """Sends one claimed batch; returns (accepted, number of entries given up on)."""
+    try:
+        get_transport(partner.transport).send(partner, build_document(partner, entry_ids), dispatch_id)
+    except TransportError as e:
+        return False, _mark_failed(entry_ids, str(e), max_attempts)
+    OutboxEntry.objects.filter(id__in=entry_ids, status='SENDING').update(
+        status='SENT', claimed_at=None, sent_at=timezone.now(), last_error='',
+    )
+    return True, 0
+
+
+def dispatch_partner(partner, batch_size=DISPATCH_BATCH_SIZE, max_attempts=MAX_ATTEMPTS, max_batches=None):
+    """
+    Sends the partner's due entries batch by batch, and stops at the first
+    failure (the partner is likely down; its entries wait for their backoff).
+    """
+    batches = sent = failed = dead = 0
+    try:
+        while max_batches is None or batches < max_batches:
+            claim = claim_batch(partner, batch_size)
+            if claim is None:
+                break
+            dispatch_id, entry_ids = claim
+            batches += 1
+            ok, gave_up = send_batch(partner, dispatch_id, entry_ids, max_attempts)
+            if not ok:
+                failed += len(entry_ids) - gave_up
+                dead += gave_up
+                break
+            sent += len(entry_ids)
+    finally:
+        connection.close()
+    return DispatchResult(batches, sent, failed, dead)
+
+
+def due_partners():
+    """Active partners with entries due now."""
+    due = Q(outbox__status='PENDING', outbox__next_attempt_at__lte=timezone.now())
+    return TradingPartner.objects.filter(due, is_active=True).distinct().order_by('id')
+
+
+def dispatch_due(workers=DISPATCH_WORKERS, batch_size=DISPATCH_BATCH_SIZE, max_attempts=MAX_ATTEMPTS, max_batches=None):
+    """One dispatch round: serves every partner with due entries, `workers` partners at a time."""
+    release_stale_claims()
+    partners = list(due_partners())
+    if not partners:
+        return DispatchResult(0, 0, 0, 0)
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='epcis-outbox') as executor:
+        results = list(executor.map(
+            lambda partner: dispatch_partner(partner, batch_size, max_attempts, max_batches), partners,
+        ))
+    return DispatchResult(*(sum(values) for values in zip(*results)))
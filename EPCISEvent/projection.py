@@ -0,0 +1,133 @@
+# EPCISEvent/projection.py
+"""
+Per-EPC current state (EPCState), projected from EPCISEvent as events are stored.
+
+The what/why/where columns are written with a time-guarded upsert: a row only
+moves forward to an event with a later (event_time, id). Applying events is
+therefore order-independent, so the projection can be rebuilt from any number
+of parallel, chunked passes. parent_epc is copied from the Containment
+hierarchy (EPCISEvent.aggregation) instead, which applies aggregations by
+event_time too: a late, older ADD never overwrites a newer parent.
+"""
+from django.db import connection
+
+from EPCISEvent.models import Containment, EPCState
+
+UPSERT_BATCH_SIZE = 2000
+# EPCs per parent sync statement, below SQLite's bound-parameter limit
+PARENT_BATCH_SIZE = 500
+
+
+def _upsert_sql():
+    table = EPCState._meta.db_table
+    return (
+        f"INSERT INTO {table} (epc, event_id, event_time, biz_step, disposition, read_point, biz_location, parent_epc) "
+        f"VALUES (%s, %s, %s, %s, %s, %s, %s, '') "
+        f"ON CONFLICT (epc) DO UPDATE SET "
+        f"event_id = excluded.event_id, "
+        f"event_time = excluded.event_time, "
+        f"biz_step = excluded.biz_step, "
+        # An event without a disposition / location leaves the previous one in place
+        f"disposition = COALESCE(NULLIF(excluded.disposition, ''), {table}.disposition), "
+        f"read_point = COALESCE(NULLIF(excluded.read_point, ''), {table}.read_point), "
+        f"biz_location = COALESCE(NULLIF(excluded.biz_location, ''), {table}.biz_location) "
+        f"WHERE excluded.event_time > {table}.event_time "
+        f"OR (excluded.event_time = {table}.event_time AND excluded.event_id > {table}.event_id)"
+    )
+
+
+def _event_epcs(event):
+    epcs = event.epcs()
+    # The parent of an AggregationEvent is itself an object of the event
+    if event.parent_epc:
+        epcs.append(event.parent_epc)
+    return dict.fromkeys(epcs)
+
+
+def latest_states(events):
+    """The EPCState rows (tuples) of the EPCs in `events`, each from the latest event mentioning it."""
+    latest = {}
+    for event in events:
+        for epc in _event_epcs(event):
+            current = latest.get(epc)
+            if current is None or (event.event_time, event.pk) > (current.event_time, current.pk):
+                latest[epc] = event
+
+    return [
+        (
+            epc, event.pk, event.event_time, event.biz_step, event.disposition,
+            event.read_point, event.biz_location,
+        )
+        for epc, event in latest.items()
+    ]
+
+
+def upsert_states(rows):
+    """Moves EPCState forward to the latest_states() rows; rows older than the stored state are ignored."""
+    # Adapt datetimes the way the backend expects (the ORM is bypassed here)
+    ops = connection.ops
+    rows = [row[:2] + (ops.adapt_datetimefield_value(row[2]),) + row[3:] for row in rows]
+
+    sql = _upsert_sql()
+    with connection.cursor() as cursor:
+        for start in range(0, len(rows), UPSERT_BATCH_SIZE):
+            cursor.executemany(sql, rows[start:start + UPSERT_BATCH_SIZE])
+    return len(rows)
+
+
+def project_states(events):
+    """Moves the EPCState of every EPC in `events` forward to the latest of them; any order works."""
+    return upsert_states(latest_states(events))
+
+
+def project_parents(events):
+    """
+    Copies the direct container of each child of ADD/DELETE AggregationEvents
+    from Containment, once apply_aggregation_events has applied them.
+    """
+    children = set()
+    for event in events:
+        if event.event_type != 'AggregationEvent' or not event.parent_epc:
+            continue
+        if event.action == 'ADD':
+            children.update(event.epcs())
+        elif event.action == 'DELETE':
+            # Without an epc_list the whole parent was emptied
+            children.update(event.epcs() or EPCState.objects.filter(parent_epc=event.parent_epc).values_list('epc', flat=True))
+    if children:
+        sync_parents_from_containment(sorted(children))
+
+
+def apply_events(events):
+    """
+    Updates the projection for newly stored events, after the aggregation
+    hierarchy. Call it inside the transaction that stores them.
+    """
+    project_states(events)
+    project_parents(events)
+
+
+def sync_parents_from_containment(epcs=None):
+    """Sets parent_epc of the EPCStates of `epcs` (default: all, rebuild's last pass) from Containment."""
+    state_table = EPCState._meta.db_table
+    containment_table = Containment._meta.db_table
+    sql = (
+        f"UPDATE {state_table} SET parent_epc = COALESCE("
+        f"(SELECT ancestor FROM {containment_table} c "
+        f"WHERE c.descendant = {state_table}.epc AND c.depth = 1), '')"
+    )
+    with connection.cursor() as cursor:
+        if epcs is None:
+            cursor.execute(sql)
+            return cursor.rowcount
+        updated = 0
+        for start in range(0, len(epcs), PARENT_BATCH_SIZE):
+            chunk = epcs[start:start + PARENT_BATCH_SIZE]
+            cursor.execute(f"{sql} WHERE epc IN ({', '.join(['%s'] * len(chunk))})", chunk)
+            updated += cursor.rowcount
+        return updated
+
+
+def current_state(epc):
+    """The EPCState of `epc`, or None if no event has mentioned it."""
+    return EPCState.objects.filter(epc=epc).first()
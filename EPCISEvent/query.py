@@ -0,0 +1,138 @@
+# EPCISEvent/query.py
+"""
+EPCIS 2.0 style event query over EPCISEvent.
+
+Query parameters are compiled once into ORM lookups (QUERY_PARAMETERS) and
+results are paged with a keyset cursor on (event_time, id), so every page is an
+index range scan whatever its depth.
+"""
+import base64
+import hashlib
+from datetime import timezone as dt_timezone
+
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from EPCISEvent.cbv import normalize_biz_step, normalize_disposition, normalize_location
+from EPCISEvent.models import EPCISEvent, EPCISEventEPC
+
+DEFAULT_PER_PAGE = 100
+MAX_PER_PAGE = 1000
+
+
+class QueryParameterError(ValueError):
+    """An unknown or malformed query parameter."""
+
+
+def _values(raw):
+    return [value.strip() for value in raw.split(',') if value.strip()]
+
+
+def _datetime(raw):
+    value = parse_datetime(raw)
+    if value is None:
+        raise QueryParameterError(f"'{raw}' is not an ISO 8601 date-time.")
+    if timezone.is_naive(value):
+        value = timezone.make_aware(value, dt_timezone.utc)
+    return value
+
+
+def _event_types(raw):
+    known = {event_type for event_type, _ in EPCISEvent.EVENT_TYPES}
+    values = _values(raw)
+    unknown = set(values) - known
+    if unknown:
+        raise QueryParameterError(f"Unknown eventType {', '.join(sorted(unknown))}.")
+    return values
+
+
+def _actions(raw):
+    known = {action for action, _ in EPCISEvent.ACTIONS}
+    values = _values(raw)
+    unknown = set(values) - known
+    if unknown:
+        raise QueryParameterError(f"Unknown action {', '.join(sorted(unknown))}.")
+    return values
+
+
+def _cbv(normalize):
+    def convert(raw):
+        try:
+            return [normalize(value) for value in _values(raw)]
+        except ValueError as e:
+            raise QueryParameterError(str(e))
+    return convert
+
+
+# parameter -> (ORM lookup, converter for the raw value)
+QUERY_PARAMETERS = {
+    'eventType': ('event_type__in', _event_types),
+    'GE_eventTime': ('event_time__gte', _datetime),
+    'LT_eventTime': ('event_time__lt', _datetime),
+    'EQ_action': ('action__in', _actions),
+    'EQ_bizStep': ('biz_step__in', _cbv(normalize_biz_step)),
+    'EQ_disposition': ('disposition__in', _cbv(normalize_disposition)),
+    'EQ_readPoint': ('read_point__in', lambda raw: [normalize_location(v) for v in _values(raw)]),
+    'EQ_bizLocation': ('biz_location__in', lambda raw: [normalize_location(v) for v in _values(raw)]),
+    # Resolved through the indexed EPCISEventEPC table, never epc_list LIKE scans
+    'MATCH_epc': ('id__in', lambda raw: EPCISEventEPC.objects.filter(epc__in=_values(raw)).values('event_id')),
+}
+PAGING_PARAMETERS = ('perPage', 'nextPageToken')
+
+
+def build_queryset(params):
+    """Compiles the query parameters (a QueryDict/dict) into a filtered, ordered queryset."""
+    lookups = {}
+    for name in params:
+        if name in PAGING_PARAMETERS:
+            continue
+        if name not in QUERY_PARAMETERS:
+            raise QueryParameterError(f"Unknown query parameter '{name}'.")
+        lookup, convert = QUERY_PARAMETERS[name]
+        lookups[lookup] = convert(params[name])
+    return EPCISEvent.objects.filter(**lookups).order_by('event_time', 'id')
+
+
+def encode_page_token(event):
+    raw = f"{event.event_time.isoformat()}|{event.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_page_token(token):
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)).decode()
+        event_time, event_id = raw.rsplit('|', 1)
+        return _datetime(event_time), int(event_id)
+    except (ValueError, UnicodeDecodeError):
+        raise QueryParameterError("Invalid nextPageToken.")
+
+
+def fetch_page(queryset, token=None, per_page=DEFAULT_PER_PAGE):
+    """
+    Returns (events, next_token) for the page after `token`.
+    next_token is None on the last page.
+    """
+    if not 1 <= per_page <= MAX_PER_PAGE:
+        raise QueryParameterError(f"perPage must be between 1 and {MAX_PER_PAGE}.")
+    if token:
+        event_time, event_id = decode_page_token(token)
+        queryset = queryset.filter(Q(event_time__gt=event_time) | Q(event_time=event_time, id__gt=event_id))
+
+    events = list(queryset[:per_page + 1])
+    if len(events) > per_page:
+        events = events[:per_page]
+        return events, encode_page_token(events[-1])
+    return events, None
+
+
+def page_etag(query_string, events):
+    """
+    ETag for a page. The ids and modification times of the events on the page
+    (with the query) identify its content, including events edited since, so an
+    unchanged poll can be answered with 304 before anything is serialized.
+    """
+    digest = hashlib.sha256(query_string.encode())
+    for event in events:
+        digest.update(f"{event.id}:{event.updated_at.isoformat()},".encode())
+    return f'"{digest.hexdigest()[:32]}"'
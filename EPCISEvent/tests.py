@@ -1,3 +1,518 @@
-from django.test import TestCase
+import base64
+import datetime
+import decimal
+import importlib
+import io
+import json
+import uuid
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Permission
+from django.core.management import call_command
+from django.db import DatabaseError
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from EPCISEvent import capture, outbox
+from EPCISEvent.aggregation import containers, contents, outermost_container, pack, unpack
+from EPCISEvent.models import (
+    CaptureJob, Containment, EPCISEvent, EPCISEventEPC, EPCState, OutboxEntry, TradingPartner,
+)
+from EPCISEvent.projection import current_state
+from EPCISEvent.query import QueryParameterError, build_queryset, fetch_page
+from EPCISEvent.transports import TransportError
+from utils import json_codec
+
+
+def _event(action, parent, children, minutes, **fields):
+    """Saves an AggregationEvent `minutes` after a fixed origin."""
+    return EPCISEvent.objects.create(
+        event_type='AggregationEvent', action=action, parent_epc=parent, epc_list=','.join(children),
+        event_time=timezone.make_aware(datetime.datetime(2026, 1, 1)) + datetime.timedelta(minutes=minutes),
+        biz_step='packing', disposition='in_progress', read_point='', biz_location='', **fields,
+    )
+
+
+def _object_event(epcs, minutes):
+    """Saves an ObjectEvent over `epcs` (an epc_list string) `minutes` after a fixed origin."""
+    return EPCISEvent.objects.create(
+        epc_list=epcs, event_time=timezone.make_aware(datetime.datetime(2026, 1, 1)) + datetime.timedelta(minutes=minutes),
+        biz_step='shipping', disposition='in_transit', read_point='', biz_location='',
+    )
+
+
+class EPCIndexTests(TestCase):
+    """EPCISEventEPC mirrors every event's epc_list, and for_epc() reads it."""
+
+    SGTIN = "urn:epc:id:sgtin:0312345.067890.{}"
+
+    def _indexed(self, event):
+        return sorted(EPCISEventEPC.objects.filter(event=event).values_list('epc', flat=True))
+
+    def test_save_indexes_each_epc_once(self):
+        event = _object_event(f" {self.SGTIN.format(1)}, {self.SGTIN.format(2)},,{self.SGTIN.format(1)}", 0)
+
+        self.assertEqual(self._indexed(event), [self.SGTIN.format(1), self.SGTIN.format(2)])
+
+        event.epc_list = self.SGTIN.format(3)
+        event.save()
+        self.assertEqual(self._indexed(event), [self.SGTIN.format(3)])
+
+    def test_for_epc_returns_the_events_oldest_first(self):
+        later = _object_event(f"{self.SGTIN.format(1)},{self.SGTIN.format(2)}", 10)
+        earlier = _object_event(self.SGTIN.format(1), 5)
+        _object_event(self.SGTIN.format(11), 0)  # Its EPC only starts with the looked-up one
+
+        self.assertEqual(list(EPCISEvent.for_epc(self.SGTIN.format(1))), [earlier, later])
+        self.assertEqual(list(EPCISEvent.for_epc(self.SGTIN.format(2))), [later])
+        self.assertFalse(EPCISEvent.for_epc(self.SGTIN.format(9)).exists())
+
+    def test_backfill_indexes_existing_events(self):
+        events = [_object_event(f"{self.SGTIN.format(i)},{self.SGTIN.format(i + 100)}", i) for i in range(5)]
+        EPCISEventEPC.objects.all().delete()  # As before the index existed
+
+        call_command('backfill_event_epcs', '--from-id', str(events[1].pk), '--batch-size', '2', stdout=io.StringIO())
+        self.assertEqual([len(self._indexed(event)) for event in events], [0, 0, 2, 2, 2])
+
+        call_command('backfill_event_epcs', stdout=io.StringIO())
+        self.assertEqual(EPCISEventEPC.objects.count(), 10)
+        self.assertEqual(list(EPCISEvent.for_epc(self.SGTIN.format(103))), [events[3]])
+
+
+class ContainmentTests(TestCase):
+    """The closure table answers contents/containers at any depth after packing and unpacking."""
+
+    def test_pack_links_every_level(self):
+        pack('case-1', ['unit-1', 'unit-2'])
+        pack('pallet', ['case-1'])
+
+        self.assertEqual(set(contents('pallet')), {'case-1', 'unit-1', 'unit-2'})
+        self.assertEqual(set(contents('pallet', direct=True)), {'case-1'})
+        self.assertEqual(list(containers('unit-1')), ['case-1', 'pallet'])
+        self.assertEqual(
+            Containment.objects.get(ancestor='pallet', descendant='unit-2').depth, 2
+        )
+
+    def test_repacking_moves_the_whole_subtree(self):
+        pack('case-1', ['unit-1'])
+        pack('pallet-1', ['case-1'])
+        pack('pallet-2', ['case-1'])
+
+        self.assertFalse(contents('pallet-1').exists())
+        self.assertEqual(outermost_container('unit-1'), 'pallet-2')
+
+    def test_unpack_without_children_empties_the_parent(self):
+        pack('case-1', ['unit-1', 'unit-2'])
+        pack('pallet', ['case-1'])
+
+        unpack('case-1')
+
+        self.assertEqual(set(contents('pallet')), {'case-1'})
+        self.assertIsNone(outermost_container('unit-1'))
+        # Depth-0 rows stay: the EPCs are still known
+        self.assertTrue(Containment.objects.filter(ancestor='unit-1', descendant='unit-1', depth=0).exists())
+
+    def test_late_older_event_does_not_undo_a_newer_one(self):
+        _event('ADD', 'case-2', ['unit-1'], minutes=10)
+        _event('ADD', 'case-1', ['unit-1', 'unit-2'], minutes=5)  # arrives late
+
+        self.assertEqual(list(containers('unit-1')), ['case-2'])
+        self.assertEqual(list(containers('unit-2')), ['case-1'])
+
+        _event('DELETE', 'case-2', [], minutes=20)
+        _event('ADD', 'case-2', ['unit-1'], minutes=15)  # arrives after the newer unpack
+        self.assertIsNone(outermost_container('unit-1'))
+
+
+    def test_rebuild_replays_without_loading_deferred_fields(self):
+        _event('ADD', 'case-2', ['unit-1'], minutes=10)
+        _event('ADD', 'case-1', ['unit-1', 'unit-2'], minutes=5)
+        _event('ADD', 'pallet', ['case-1'], minutes=15)
+        expected = set(Containment.objects.values_list('ancestor', 'descendant', 'depth'))
+
+        # A field missing from the command's only() would be fetched per event through refresh_from_db()
+        with mock.patch.object(EPCISEvent, 'refresh_from_db', side_effect=AssertionError("deferred field loaded")):
+            call_command('rebuild_containment', batch_size=2, stdout=io.StringIO())
+
+        self.assertEqual(set(Containment.objects.values_list('ancestor', 'descendant', 'depth')), expected)
+
+class EPCStateProjectionTests(TestCase):
+    """The projected parent follows the latest aggregation by event_time, and rebuilds are atomic."""
+
+    def test_late_older_add_does_not_overwrite_a_newer_parent(self):
+        _event('ADD', 'case-2', ['unit-1'], minutes=10)
+        _event('ADD', 'case-1', ['unit-1', 'unit-2'], minutes=5)  # arrives late
+
+        self.assertEqual(current_state('unit-1').parent_epc, 'case-2')
+        self.assertEqual(current_state('unit-1').biz_step, 'packing')
+        self.assertEqual(current_state('unit-2').parent_epc, 'case-1')
+
+        _event('DELETE', 'case-2', [], minutes=20)
+        self.assertEqual(current_state('unit-1').parent_epc, '')
+
+    def test_rebuild_matches_the_incremental_projection(self):
+        _event('ADD', 'case-2', ['unit-1'], minutes=10)
+        _event('ADD', 'case-1', ['unit-1', 'unit-2'], minutes=5)
+        _event('ADD', 'pallet', ['case-1', 'case-2'], minutes=30)
+        incremental = set(EPCState.objects.values_list('epc', 'event_time', 'parent_epc'))
+
+        call_command('rebuild_epc_states', batch_size=1, stdout=io.StringIO())
+
+        self.assertEqual(set(EPCState.objects.values_list('epc', 'event_time', 'parent_epc')), incremental)
+
+    def test_failed_rebuild_keeps_the_old_projection(self):
+        _event('ADD', 'case-1', ['unit-1'], minutes=5)
+        before = set(EPCState.objects.values_list('epc', 'parent_epc'))
+
+        with mock.patch('EPCISEvent.management.commands.rebuild_epc_states.sync_parents_from_containment',
+                        side_effect=DatabaseError("interrupted")):
+            with self.assertRaises(DatabaseError):
+                call_command('rebuild_epc_states', stdout=io.StringIO())
+
+        self.assertEqual(set(EPCState.objects.values_list('epc', 'parent_epc')), before)
+
+
+def _document(*events):
+    return json.dumps({
+        "@context": "https://ref.gs1.org/standards/epcis/2.0.0/epcis-context.jsonld",
+        "type": "EPCISDocument",
+        "epcisBody": {"eventList": list(events)},
+    }).encode()
+
+
+OBJECT_EVENT = {
+    "type": "ObjectEvent", "eventTime": "2026-01-01T08:00:00Z", "action": "OBSERVE",
+    "bizStep": "shipping", "epcList": ["urn:epc:id:sgtin:0312345.067890.1"],
+}
+
+
+class CaptureTests(TestCase):
+    """Capture jobs always end SUCCEEDED or FAILED, and only authorized users can submit them."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user('line-1', password='secret')
+        cls.user.user_permissions.add(Permission.objects.get(codename='add_epcisevent'))
+
+    def _post(self, body, **headers):
+        with self.captureOnCommitCallbacks(execute=False):
+            return self.client.post(reverse('epcis:capture'), body, content_type='application/ld+json', **headers)
+
+    def _basic(self, username, password):
+        return {'HTTP_AUTHORIZATION': 'Basic ' + base64.b64encode(f"{username}:{password}".encode()).decode()}
+
+    def _capture(self, body):
+        response = self._post(body, **self._basic('line-1', 'secret'))
+        self.assertEqual(response.status_code, 202)
+        job = CaptureJob.objects.get(job_id=response.json()['captureID'])
+        capture.process_capture_job(job.pk)
+        job.refresh_from_db()
+        return job
+
+    def test_document_is_captured_by_the_job(self):
+        job = self._capture(_document(OBJECT_EVENT, dict(OBJECT_EVENT, action="ADD")))
+
+        self.assertEqual((job.status, job.events_captured, job.error), ('SUCCEEDED', 2, ''))
+        self.assertEqual(EPCISEvent.objects.count(), 2)
+        self.assertIsNotNone(job.finished_at)
+        self.assertFalse(capture.os.path.exists(job.payload_path))
+
+        response = self.client.get(reverse('epcis:capture_job', kwargs={'job_id': job.job_id}), **self._basic('line-1', 'secret'))
+        self.assertEqual(response.json()['eventsCaptured'], 2)
+
+    def test_invalid_event_fails_the_whole_document(self):
+        job = self._capture(_document(OBJECT_EVENT, dict(OBJECT_EVENT, action="MOVE")))
+
+        self.assertEqual(job.status, 'FAILED')
+        self.assertIn("Invalid action 'MOVE'", job.error)
+        self.assertFalse(EPCISEvent.objects.exists())
+
+    def test_misshapen_fields_fail_the_document(self):
+        for field, value, message in [
+            ("readPoint", "urn:epc:id:sgln:0312345.00000.0", "readPoint must be an object"),
+            ("bizLocation", ["urn:epc:id:sgln:0312345.00000.0"], "bizLocation must be an object"),
+            ("epcList", "urn:epc:id:sgtin:0312345.067890.1", "epcList must be an array"),
+            ("childEPCs", [{"id": "urn:epc:id:sgtin:0312345.067890.1"}], "childEPCs must be an array"),
+        ]:
+            with self.subTest(field=field):
+                event = {key: value for key, value in OBJECT_EVENT.items() if key != "epcList"}
+                job = self._capture(_document(OBJECT_EVENT, dict(event, **{field: value})))
+
+                self.assertEqual(job.status, 'FAILED')
+                self.assertIn(message, job.error)
+                self.assertFalse(EPCISEvent.objects.exists())
+
+    def test_unexpected_error_fails_the_job_and_is_raised(self):
+        response = self._post(_document(OBJECT_EVENT), **self._basic('line-1', 'secret'))
+        job = CaptureJob.objects.get(job_id=response.json()['captureID'])
+
+        with mock.patch.object(capture, 'capture_document', side_effect=RuntimeError("bug")):
+            with self.assertRaises(RuntimeError):
+                capture.process_capture_job(job.pk)
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.error), ('FAILED', "Internal error: RuntimeError: bug"))
+
+    def test_malformed_json_fails_without_reading_the_rest(self):
+        stream = io.BytesIO(_document(OBJECT_EVENT)[:-3] + b'{"type": ObjectEvent}' + b' ' * (capture.READ_SIZE * 20))
+        events = capture.iter_json_events(stream)
+
+        next(events)
+        with self.assertRaisesMessage(capture.CaptureError, "Malformed event in eventList"):
+            next(events)
+        self.assertLess(stream.tell(), capture.READ_SIZE * 2)
+
+    def test_event_split_across_reads_is_decoded(self):
+        events = [dict(OBJECT_EVENT, epcList=[f"urn:epc:id:sgtin:0312345.067890.{i}" for i in range(3000)])] * 3
+        with mock.patch.object(capture, 'READ_SIZE', 1000):
+            parsed = list(capture.iter_json_events(io.BytesIO(_document(*events))))
+        self.assertEqual([len(fields['epcs']) for fields in parsed], [3000] * 3)
+
+    def test_capture_requires_an_authorized_user(self):
+        self.assertEqual(self._post(_document(OBJECT_EVENT)).status_code, 401)
+        self.assertEqual(self._post(_document(OBJECT_EVENT), **self._basic('line-1', 'wrong')).status_code, 401)
+
+        get_user_model().objects.create_user('viewer', password='secret')
+        self.assertEqual(self._post(_document(OBJECT_EVENT), **self._basic('viewer', 'secret')).status_code, 403)
+        self.assertFalse(CaptureJob.objects.exists())
+
+        self.client.force_login(self.user)
+        self.assertEqual(self._post(_document(OBJECT_EVENT)).status_code, 202)
+
+
+class EventQueryTests(TestCase):
+    """Query pages follow the (event_time, id) keyset and their ETag tracks edits."""
+
+    @classmethod
+    def setUpTestData(cls):
+        origin = timezone.make_aware(datetime.datetime(2026, 1, 1))
+        # Pairs of events sharing an event_time: the id breaks the tie across page boundaries
+        cls.events = [
+            EPCISEvent.objects.create(
+                event_time=origin + datetime.timedelta(minutes=i // 2), action='ADD' if i % 3 else 'OBSERVE',
+                biz_step='shipping', disposition='in_transit', read_point='', biz_location='',
+                epc_list=f"urn:epc:id:sgtin:0312345.067890.{i}",
+            )
+            for i in range(7)
+        ]
+        cls.user = get_user_model().objects.create_user('partner', password='secret')
+        cls.user.user_permissions.add(Permission.objects.get(codename='view_epcisevent'))
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def test_pages_cover_every_event_once_in_order(self):
+        queryset = build_queryset({})
+        seen, token = [], None
+        while True:
+            page, token = fetch_page(queryset, token, per_page=3)
+            seen.extend(event.pk for event in page)
+            if token is None:
+                break
+
+        self.assertEqual(len(page), 1)
+        self.assertEqual(seen, [event.pk for event in self.events])
+
+    def test_filters_apply_across_pages(self):
+        queryset = build_queryset({'EQ_action': 'ADD'})
+        first, token = fetch_page(queryset, per_page=2)
+        second, token = fetch_page(queryset, token, per_page=2)
+
+        self.assertIsNone(token)
+        self.assertEqual(
+            [event.pk for event in first + second], [event.pk for event in self.events if event.action == 'ADD'],
+        )
+
+    def test_malformed_parameters_are_rejected(self):
+        for params in ({'EQ_action': 'ADD,MOVE'}, {'GE_eventTime': 'yesterday'}, {'EQ_foo': '1'}):
+            with self.subTest(params=params), self.assertRaises(QueryParameterError):
+                build_queryset(params)
+        with self.assertRaises(QueryParameterError):
+            fetch_page(build_queryset({}), token='not-a-token')
+
+        response = self.client.get(reverse('epcis:events'), {'EQ_action': 'MOVE'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('MOVE', response.json()['title'])
+
+    def test_etag_changes_when_an_event_is_edited(self):
+        url = reverse('epcis:events')
+        etag = self.client.get(url, {'perPage': 3})['ETag']
+        self.assertEqual(self.client.get(url, {'perPage': 3}, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        event = self.events[1]
+        event.disposition = 'damaged'
+        event.save()
+
+        response = self.client.get(url, {'perPage': 3}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertIn('damaged', response.content.decode())
+
+
+    def test_query_requires_an_authorized_user(self):
+        self.client.logout()
+        url = reverse('epcis:events')
+
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 401)
+        self.assertIn('Basic', response['WWW-Authenticate'])
+
+        get_user_model().objects.create_user('viewer', password='secret')
+        credentials = base64.b64encode(b"viewer:secret").decode()
+        self.assertEqual(self.client.get(url, HTTP_AUTHORIZATION=f"Basic {credentials}").status_code, 403)
+
+        credentials = base64.b64encode(b"partner:secret").decode()
+        self.assertEqual(self.client.get(url, HTTP_AUTHORIZATION=f"Basic {credentials}").status_code, 200)
+
+class OutboxTests(TestCase):
+    """One batch per partner is in flight; failed batches wait out their backoff, then die."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.partner = TradingPartner.objects.create(code="WHS", name="Warehouse")
+        for i in range(5):
+            EPCISEvent.objects.create(
+                biz_step='shipping', disposition='in_transit', read_point='', biz_location='',
+                epc_list=f"urn:epc:id:sgtin:0312345.067890.{i}",
+            )
+
+    def setUp(self):
+        patcher = mock.patch.object(outbox, 'get_transport')
+        self.transport = patcher.start().return_value
+        self.addCleanup(patcher.stop)
+        # dispatch_partner closes its (worker thread's) connection; here that is the test's
+        patcher = mock.patch.object(outbox.connection, 'close')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_claim_marks_one_batch_in_flight(self):
+        dispatch_id, entry_ids = outbox.claim_batch(self.partner, batch_size=3)
+
+        self.assertEqual(entry_ids, sorted(OutboxEntry.objects.values_list('id', flat=True))[:3])
+        self.assertEqual(
+            set(OutboxEntry.objects.filter(id__in=entry_ids).values_list('status', 'dispatch_id')),
+            {('SENDING', dispatch_id)},
+        )
+        # The rest waits until the batch in flight is sent
+        self.assertIsNone(outbox.claim_batch(self.partner, batch_size=3))
+        outbox.send_batch(self.partner, dispatch_id, entry_ids)
+        self.assertEqual(len(outbox.claim_batch(self.partner, batch_size=3)[1]), 2)
+
+    def test_failed_batch_is_retried_after_its_backoff(self):
+        self.transport.send.side_effect = TransportError("connection refused")
+        with mock.patch.object(outbox, 'backoff_delay', return_value=60):
+            result = outbox.dispatch_partner(self.partner, batch_size=10)
+
+        self.assertEqual(result, outbox.DispatchResult(1, 0, 5, 0))
+        entries = OutboxEntry.objects.all()
+        self.assertEqual(set(entries.values_list('status', 'attempts', 'last_error')), {('PENDING', 1, "connection refused")})
+        self.assertIsNone(outbox.claim_batch(self.partner))
+
+        retry_at = entries.first().next_attempt_at
+        self.transport.send.side_effect = None
+        with mock.patch('EPCISEvent.outbox.timezone.now', return_value=retry_at):
+            result = outbox.dispatch_partner(self.partner, batch_size=10)
+
+        self.assertEqual(result, outbox.DispatchResult(1, 5, 0, 0))
+        self.assertEqual(set(entries.values_list('status', 'last_error')), {('SENT', '')})
+
+    def test_entries_die_after_max_attempts(self):
+        self.transport.send.side_effect = TransportError("404")
+        OutboxEntry.objects.update(attempts=2)
+
+        result = outbox.dispatch_partner(self.partner, batch_size=10, max_attempts=3)
+
+        self.assertEqual(result, outbox.DispatchResult(1, 0, 0, 5))
+        self.assertEqual(set(OutboxEntry.objects.values_list('status', 'attempts')), {('DEAD', 3)})
+
+    def test_backoff_doubles_up_to_the_cap(self):
+        with mock.patch('EPCISEvent.outbox.random.uniform', side_effect=lambda low, high: high):
+            delays = [outbox.backoff_delay(attempts) for attempts in range(1, 12)]
+        with mock.patch('EPCISEvent.outbox.random.uniform', side_effect=lambda low, high: low):
+            self.assertEqual(outbox.backoff_delay(1), outbox.BACKOFF_BASE / 2)
+
+        self.assertEqual(delays[:3], [outbox.BACKOFF_BASE, outbox.BACKOFF_BASE * 2, outbox.BACKOFF_BASE * 4])
+        self.assertEqual(delays[-1], outbox.BACKOFF_MAX)
+
+    def test_stale_claim_is_released(self):
+        dispatch_id, entry_ids = outbox.claim_batch(self.partner, batch_size=2)
+        later = timezone.now() + datetime.timedelta(seconds=outbox.CLAIM_TIMEOUT + 1)
+
+        with mock.patch('EPCISEvent.outbox.timezone.now', return_value=later):
+            self.assertEqual(outbox.release_stale_claims(), 2)
+            self.assertEqual(outbox.claim_batch(self.partner, batch_size=2)[1], entry_ids)
+
+
+class JSONCodecTests(TestCase):
+    """Both JSON backends round-trip EPCIS values, and documents decode back to their events."""
+
+    VALUES = {
+        "eventTime": timezone.make_aware(datetime.datetime(2026, 1, 1, 8, 30, 0, 250000)),
+        "eventID": uuid.UUID("6f1c1f0e-3c7a-4a55-9b6f-0c7b2a8c1d2e"),
+        "quantity": decimal.Decimal("12.50"),
+        "epcList": ["urn:epc:id:sgtin:0312345.067890.1", "ß-Grüße"],
+        "nested": {"empty": [], "none": None, "flag": True},
+    }
+    EXPECTED = dict(
+        VALUES, eventTime="2026-01-01T08:30:00.250000+00:00", eventID="6f1c1f0e-3c7a-4a55-9b6f-0c7b2a8c1d2e",
+        quantity="12.50",
+    )
+
+    def _backends(self):
+        """Yields each backend's name with json_codec switched to it."""
+        self.addCleanup(importlib.reload, json_codec)
+        with override_settings(JSON_BACKEND='json'):
+            importlib.reload(json_codec)
+            yield json_codec.BACKEND
+        if json_codec.orjson is not None:
+            importlib.reload(json_codec)
+            yield json_codec.BACKEND
+
+    def test_values_round_trip(self):
+        for backend in self._backends():
+            with self.subTest(backend=backend):
+                compact = json_codec.dumps(self.VALUES)
+                pretty = json_codec.dumps(self.VALUES, pretty=True)
+
+                self.assertIsInstance(compact, bytes)
+                self.assertEqual(json.loads(compact), self.EXPECTED)
+                self.assertEqual(json.loads(pretty), self.EXPECTED)
+                self.assertNotIn(b'\n', compact)
+                self.assertNotIn(b'": ', compact)
+                self.assertIn(b'\n', pretty)
+                self.assertIn("ß-Grüße".encode(), compact)
+
+    def test_unknown_types_are_rejected(self):
+        for backend in self._backends():
+            with self.subTest(backend=backend), self.assertRaises(TypeError):
+                json_codec.dumps({"value": object()})
+
+    def test_array_chunks_join_into_one_array(self):
+        for backend in self._backends():
+            with self.subTest(backend=backend):
+                chunks = list(json_codec.iter_array(({"n": i} for i in range(5)), chunk_size=2))
+                out = io.BytesIO()
+
+                self.assertEqual(len(chunks), 3)
+                self.assertEqual(json.loads(b''.join(chunks)), [{"n": i} for i in range(5)])
+                self.assertEqual(json.loads(b''.join(json_codec.iter_array([]))), [])
+                self.assertEqual(json_codec.write_array(range(3), out), len(out.getvalue()))
+                self.assertEqual(json.loads(out.getvalue()), [0, 1, 2])
+
+    def test_documents_decode_to_their_events(self):
+        events = [_object_event(f"urn:epc:id:sgtin:0312345.067890.{i}", i) for i in range(3)]
+
+        single = json.loads(events[0].get_epcis_json())
+        self.assertEqual(single["epcisBody"]["eventList"][0]["eventID"], f"urn:uuid:{events[0].event_id}")
+        self.assertEqual(
+            datetime.datetime.fromisoformat(single["epcisBody"]["eventList"][0]["eventTime"]), events[0].event_time,
+        )
+        self.assertEqual(json.loads(events[0].get_epcis_json(pretty=True))["epcisBody"], single["epcisBody"])
+
+        exported = json.loads(b''.join(EPCISEvent.export_document(fmt='json', chunk_size=2)))
+        self.assertEqual(exported["type"], "EPCISDocument")
+        self.assertEqual(
+            [event["epcList"] for event in exported["epcisBody"]["eventList"]], [event.epcs() for event in events],
+        )
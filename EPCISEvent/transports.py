@@ -0,0 +1,76 @@
+# EPCISEvent/transports.py
+"""
+Outbound transports for EPCIS documents. A transport gets the partner, the
+document bytes and a dispatch id, and raises TransportError when the partner
+did not accept the document (the outbox then retries with backoff).
+
+settings.EPCIS_OUTBOX_TRANSPORTS maps TradingPartner.transport values to
+dotted paths of Transport subclasses, to add or replace transports.
+"""
+import os
+import urllib.error
+import urllib.request
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+OUTBOX_DIR = getattr(settings, 'EPCIS_OUTBOX_DIR', settings.BASE_DIR / 'outbox')
+HTTP_TIMEOUT = getattr(settings, 'EPCIS_OUTBOX_HTTP_TIMEOUT', 30)
+TRANSPORTS = {
+    'FILE': 'EPCISEvent.transports.FileDropTransport',
+    'HTTP': 'EPCISEvent.transports.HttpTransport',
+    **getattr(settings, 'EPCIS_OUTBOX_TRANSPORTS', {}),
+}
+CONTENT_TYPES = {'xml': 'application/xml', 'json': 'application/ld+json'}
+
+
+class TransportError(Exception):
+    """The document was not delivered; the outbox will retry it."""
+
+
+class Transport:
+    def send(self, partner, document, dispatch_id):
+        raise NotImplementedError
+
+
+class FileDropTransport(Transport):
+    """Writes each document to the partner's directory; the rename makes it appear complete."""
+
+    def send(self, partner, document, dispatch_id):
+        directory = partner.endpoint or os.path.join(OUTBOX_DIR, partner.code)
+        path = os.path.join(directory, f"{dispatch_id}.{partner.document_format}")
+        try:
+            os.makedirs(directory, exist_ok=True)
+            with open(path + '.tmp', 'wb') as out:
+                out.write(document)
+            os.replace(path + '.tmp', path)
+        except OSError as e:
+            raise TransportError(str(e))
+
+
+class HttpTransport(Transport):
+    """POSTs the document to the partner's capture endpoint; any 2xx is success."""
+
+    def send(self, partner, document, dispatch_id):
+        request = urllib.request.Request(
+            partner.endpoint,
+            data=document,
+            method='POST',
+            headers={
+                'Content-Type': CONTENT_TYPES[partner.document_format],
+                # Lets the partner drop a document it already accepted before a lost response
+                'Idempotency-Key': str(dispatch_id),
+            },
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=HTTP_TIMEOUT) as response:
+                response.read()
+        except (urllib.error.URLError, OSError, ValueError) as e:
+            raise TransportError(str(e))
+
+
+def get_transport(name):
+    try:
+        return import_string(TRANSPORTS[name])()
+    except KeyError:
+        raise TransportError(f"Unknown transport '{name}'.")
@@ -0,0 +1,10 @@
+from django.urls import path
+from EPCISEvent.views import *
+
+app_name = "epcis"
+
+urlpatterns = [
+    path('capture', CaptureView.as_view(), name='capture'),
+    path('capture/<uuid:job_id>', CaptureJobView.as_view(), name='capture_job'),
+    path('events', EventQueryView.as_view(), name='events'),
+]
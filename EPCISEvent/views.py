@@ -1,3 +1,97 @@
-from django.shortcuts import render
+from django.http import HttpResponse, HttpResponseNotModified, JsonResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.decorators import method_decorator
+from django.utils.http import urlencode
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from EPCISEvent.capture import create_capture_job
+from EPCISEvent.models import CaptureJob, EPCIS_JSON_CONTEXT
+from EPCISEvent.query import DEFAULT_PER_PAGE, QueryParameterError, build_queryset, fetch_page, page_etag
+from utils import json_codec
+from utils.api_auth import ApiAuthMixin
 
 # Create your views here.
+
+@method_decorator(csrf_exempt, name='dispatch')
+class CaptureView(ApiAuthMixin, View):
+    """
+    POST an EPCISDocument (application/ld+json, application/json or XML).
+    The body is spooled and processed in the background; the response carries
+    the capture job id and where to poll for its outcome. Requires a user
+    (session or HTTP Basic) allowed to add events.
+    """
+    http_method_names = ['post']
+    permission_required = 'EPCISEvent.add_epcisevent'
+
+    def post(self, request, *args, **kwargs):
+        content_type = request.content_type or ''
+        if 'json' not in content_type and 'xml' not in content_type:
+            return JsonResponse({'error': f"Unsupported content type '{content_type}'."}, status=415)
+
+        job = create_capture_job(request, content_type)
+        location = reverse('epcis:capture_job', kwargs={'job_id': job.job_id})
+        response = JsonResponse({'captureID': str(job.job_id), 'status': job.status}, status=202)
+        response['Location'] = location
+        return response
+
+
+class CaptureJobView(ApiAuthMixin, View):
+    """GET the state of a capture job."""
+    http_method_names = ['get']
+    permission_required = 'EPCISEvent.add_epcisevent'
+
+    def get(self, request, job_id, *args, **kwargs):
+        job = get_object_or_404(CaptureJob, job_id=job_id)
+        return JsonResponse({
+            'captureID': str(job.job_id),
+            'status': job.status,
+            'eventsCaptured': job.events_captured,
+            'errors': [job.error] if job.error else [],
+            'createdAt': job.created_at.isoformat(),
+            'finishedAt': job.finished_at.isoformat() if job.finished_at else None,
+        })
+
+
+class EventQueryView(ApiAuthMixin, View):
+    """
+    GET events as an EPCISQueryDocument (EPCIS 2.0 SimpleEventQuery parameters,
+    see EPCISEvent.query.QUERY_PARAMETERS). Pages are linked with a
+    nextPageToken in the Link header; an unchanged page answers 304 to If-None-Match.
+    """
+    http_method_names = ['get']
+    permission_required = 'EPCISEvent.view_epcisevent'
+
+    def get(self, request, *args, **kwargs):
+        try:
+            per_page = int(request.GET.get('perPage', DEFAULT_PER_PAGE))
+            queryset = build_queryset(request.GET)
+            events, next_token = fetch_page(queryset, request.GET.get('nextPageToken'), per_page)
+        except (QueryParameterError, ValueError) as e:
+            return JsonResponse({'type': 'QueryParameterException', 'title': str(e)}, status=400)
+
+        etag = page_etag(request.META.get('QUERY_STRING', ''), events)
+        if etag in request.headers.get('If-None-Match', ''):
+            response = HttpResponseNotModified()
+            response['ETag'] = etag
+            return response
+
+        response = HttpResponse(json_codec.dumps({
+            "@context": EPCIS_JSON_CONTEXT,
+            "type": "EPCISQueryDocument",
+            "schemaVersion": "2.0",
+            "creationDate": timezone.now(),
+            "epcisBody": {
+                "queryResults": {
+                    "queryName": "SimpleEventQuery",
+                    "resultsBody": {"eventList": [event.epcis_json_event() for event in events]},
+                },
+            },
+        }), content_type=json_codec.CONTENT_TYPE)
+        response['ETag'] = etag
+        if next_token:
+            params = request.GET.copy()
+            params['nextPageToken'] = next_token
+            response['Link'] = f'<{request.path}?{urlencode(params, doseq=True)}>; rel="next"'
+        return response
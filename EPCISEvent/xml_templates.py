@@ -0,0 +1,183 @@
+# EPCISEvent/xml_templates.py
+"""
+Precompiled EPCIS 2.0 XML serialization for EPCISEvent.
+
+The reference serializers (EPCISEvent.build_epcis_dom_document and
+build_epcis_xml_event) build an ElementTree per event and, for the pretty
+document, re-parse it with minidom. Here each (event_type, action, bizStep,
+has parentID) shape is rendered once through those same serializers with marker
+values in place of the per-event fields, and the output is split on the markers.
+Rendering an event is then an escape and a join, and the result is
+byte-identical to the reference by construction.
+"""
+import re
+import xml.etree.ElementTree as ET
+from functools import lru_cache
+
+from utils.gs1 import location_urn
+
+# Private-use characters: survive ElementTree and minidom untouched, never occur in field values
+_MARKER = re.compile('\ue000([a-zA-Z]+)\ue001')
+_SAMPLE_EPC = 'urn:epc:id:sgtin:0000000.000000.0'
+
+
+def _marker(name):
+    return f'\ue000{name}\ue001'
+
+
+# --- Escaping: the exact rules of each reference serializer ---
+
+def _needs_escape(text):
+    # Substring tests are memchr scans, several times faster than a character-class regex
+    return '&' in text or '<' in text or '>' in text or '"' in text or '\r' in text
+
+
+def _has_whitespace(text):
+    return ' ' in text or '\t' in text or '\n' in text or '\r' in text
+
+
+def _escape_dom(text):
+    """minidom's _write_data (text and attributes of toprettyxml)."""
+    if not _needs_escape(text):
+        return text
+    # minidom re-parses the ElementTree output, so line ends are normalized as expat does
+    text = text.replace('\r\n', '\n').replace('\r', '\n')
+    return text.replace('&', '&amp;').replace('<', '&lt;').replace('"', '&quot;').replace('>', '&gt;')
+
+
+def _escape_etree(text):
+    """ElementTree's text escaping (ET.tostring)."""
+    if not _needs_escape(text):
+        return text
+    return text.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
+
+
+# Order of the values every template is rendered from; slots refer to them by index
+FIELDS = (
+    'creationDate', 'eventTime', 'eventTimeZoneOffset', 'eventID', 'parentID',
+    'disposition', 'readPoint', 'bizLocation', 'epcs',
+)
+
+
+class EventTemplate:
+    """
+    Static text with indexed str.format slots over FIELDS; `epcs` is rendered as
+    the EPC list joined with `epc_separator`.
+    """
+    __slots__ = ('pattern', 'epc_separator', 'escape')
+
+    def __init__(self, text, epc_separator, escape):
+        pieces = _MARKER.split(text)
+        statics = [part.replace('{', '{{').replace('}', '}}') for part in pieces[0::2]]
+        slots = [f'{{{FIELDS.index(name)}}}' for name in pieces[1::2]]
+        self.pattern = ''.join(static + slot for static, slot in zip(statics, slots + ['']))
+        self.epc_separator = epc_separator
+        self.escape = escape
+
+    def render(self, values, epcs):
+        """`values`: the FIELDS before 'epcs', in order; `epcs`: list of EPC strings."""
+        # One scan for the common case where nothing needs escaping
+        if _needs_escape(''.join(values)) or _needs_escape(''.join(epcs)):
+            values = [self.escape(value) for value in values]
+            epcs = [self.escape(epc) for epc in epcs]
+        return self.pattern.format(*values, self.epc_separator.join(epcs))
+
+
+def _skeleton_event(event_type, action, biz_step, has_parent):
+    from EPCISEvent.models import EPCISEvent
+    return EPCISEvent(
+        event_type=event_type, action=action, biz_step=biz_step,
+        disposition=_marker('disposition'), event_timezone_offset=_marker('eventTimeZoneOffset'),
+        parent_epc=_marker('parentID') if has_parent else '',
+        epc_list=_SAMPLE_EPC,
+    )
+
+
+def _mark_element(element):
+    """Replaces the per-event texts of a built event element with markers."""
+    for name in ('eventTime', 'eventID'):
+        element.find(name).text = _marker(name)
+    for name in ('readPoint', 'bizLocation'):
+        element.find(name).find('id').text = _marker(name)
+    element.find('epcList').find('epc').text = _marker('epcs')
+
+
+def _epc_separator(text):
+    # The whitespace between two sibling <epc> elements is the one before the first
+    before = text[:text.index(_marker('epcs'))]
+    opening = before.rindex('<epc>')
+    line_start = before.rfind('\n', 0, opening)
+    indent = before[line_start:opening] if line_start != -1 and not before[line_start:opening].strip() else ''
+    return f'</epc>{indent}<epc>'
+
+
+@lru_cache(maxsize=None)
+def event_template(event_type, action, biz_step, has_parent):
+    """Compact template of one event element, as ET.tostring(event.build_epcis_xml_event(...))."""
+    element = _skeleton_event(event_type, action, biz_step, has_parent).build_epcis_xml_event(ET.Element('EventList'))
+    _mark_element(element)
+    text = ET.tostring(element, encoding='unicode')
+    return EventTemplate(text, _epc_separator(text), _escape_etree)
+
+
+@lru_cache(maxsize=None)
+def document_template(event_type, action, biz_step, has_parent):
+    """Pretty single-event document template, as EPCISEvent.to_epcis_xml()."""
+    event = _skeleton_event(event_type, action, biz_step, has_parent)
+    text = event.build_epcis_dom_document(_marker('creationDate'), mark=_mark_element)
+    return EventTemplate(text, _epc_separator(text), _escape_dom)
+
+
+def _render_events(events, compile_template, fallback, creation_date=''):
+    """
+    Yields the rendering of each event from its compiled template. The loop is
+    inlined (templates looked up in a local dict) since it runs once per exported event.
+    """
+    templates = {}
+    for event in events:
+        raw = event.epc_list
+        epcs = raw.split(',')
+        if _has_whitespace(raw):
+            epcs = [epc.strip() for epc in epcs]
+        if '' in epcs or not event.event_timezone_offset:
+            # Empty elements serialize as <epc/> / <epc />: leave those to the reference serializer
+            yield fallback(event)
+            continue
+
+        key = (event.event_type, event.action, event.biz_step, bool(event.parent_epc))
+        template = templates.get(key)
+        if template is None:
+            template = templates[key] = compile_template(*key)
+
+        values = (
+            creation_date,
+            event.event_time.isoformat(),
+            event.event_timezone_offset,
+            f"urn:uuid:{event.event_id}",
+            event.parent_epc,
+            event.disposition,
+            location_urn(event.read_point),
+            location_urn(event.biz_location),
+        )
+        yield template.render(values, epcs)
+
+
+def _reference_event_xml(event):
+    return ET.tostring(event.build_epcis_xml_event(ET.Element('EventList')), encoding='unicode')
+
+
+def render_events_xml(events):
+    """Yields each event's XML element as a compact string (for document bodies and exports)."""
+    return _render_events(events, event_template, _reference_event_xml)
+
+
+def render_event_xml(event):
+    """The event's XML element as a compact string, as ET.tostring(event.build_epcis_xml_event(...))."""
+    return next(render_events_xml([event]))
+
+
+def render_epcis_xml(event, creation_date):
+    """The event as a pretty single-event EPCISDocument, as EPCISEvent.to_epcis_xml()."""
+    return next(_render_events(
+        [event], document_template, lambda event: event.build_epcis_dom_document(creation_date), creation_date,
+    ))
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-18 23:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Equipment', '0002_equipment_deleted_at'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='equipment',
+            name='name',
+            field=models.CharField(db_index=True, max_length=255, verbose_name='Equipment Name'),
+        ),
+        migrations.AddIndex(
+            model_name='equipment',
+            index=models.Index(condition=models.Q(('deleted_at__isnull', True)), fields=['id'], name='equipment_live_idx'),
+        ),
+    ]
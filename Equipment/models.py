@@ -5,7 +5,7 @@ from django.db import models
 # Create your models here.
 
 class Equipment(models.Model):
-    name = models.CharField(max_length=255, verbose_name="Equipment Name")
+    name = models.CharField(max_length=255, db_index=True, verbose_name="Equipment Name")
     model_number = models.CharField(max_length=100, unique=True, verbose_name="Model Number")
     serial_number = models.CharField(max_length=100, unique=True, verbose_name="Serial Number")
     manufacturer = models.CharField(max_length=255, verbose_name="Manufacturer")
@@ -21,6 +21,10 @@ class Equipment(models.Model):
     class Meta:
         verbose_name = "Equipment"
         verbose_name_plural = "Equipments"
+        indexes = [
+            # Keyset pages of the list view only walk equipment that is not soft-deleted
+            models.Index(fields=['id'], condition=models.Q(deleted_at__isnull=True), name='equipment_live_idx'),
+        ]
 
     def delete(self, **kwargs):
         self.deleted_at = datetime.datetime.now()
@@ -1,3 +1,54 @@
+from unittest import mock
 from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from Equipment.models import Equipment
+from Equipment.views import EquipmentIndex
 
 # Create your tests here.
+
+class EquipmentIndexTests(TestCase):
+    """The equipment list pages over live equipment only, and searches by name or serial prefix."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.equipment = [
+            Equipment.objects.create(
+                name=f"{'Printer' if i % 2 else 'Camera'} {i}", model_number=f"M-{i}", serial_number=f"SN-{i}",
+                manufacturer="Acme", mac_address=f"00:00:00:00:00:0{i}", ip_address=f"10.0.0.{i}",
+                plant_name="Plant", plant_gln=f"031234500000{i}", location="Hall A",
+            )
+            for i in range(6)
+        ]
+        Equipment.objects.filter(pk=cls.equipment[5].pk).update(deleted_at=timezone.now())
+
+    def setUp(self):
+        patcher = mock.patch.object(EquipmentIndex, 'per_page', 2)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _page(self, **params):
+        response = self.client.get(reverse('equipment:equipment_list'), params)
+        self.assertEqual(response.status_code, 200)
+        context = response.context
+        return [item.name for item in context['equipment_list']], context['previous_cursor'], context['next_cursor']
+
+    def test_after_and_before_skip_deleted_equipment(self):
+        pks = [item.pk for item in self.equipment]
+
+        self.assertEqual(self._page(), (["Camera 4", "Printer 3"], None, pks[3]))
+        self.assertEqual(self._page(after=pks[3]), (["Camera 2", "Printer 1"], pks[2], pks[1]))
+        self.assertEqual(self._page(after=pks[1]), (["Camera 0"], pks[0], None))
+        self.assertEqual(self._page(before=pks[0]), (["Camera 2", "Printer 1"], pks[2], pks[1]))
+        self.assertEqual(self._page(before=pks[2]), (["Camera 4", "Printer 3"], None, pks[3]))
+
+    def test_empty_page(self):
+        self.assertEqual(self._page(after=self.equipment[0].pk), ([], None, None))
+        self.assertEqual(self._page(q="Scanner"), ([], None, None))
+
+    def test_search_matches_name_or_serial_prefix(self):
+        self.assertEqual(self._page(q="Printer"), (["Printer 3", "Printer 1"], None, None))
+        self.assertEqual(self._page(q="SN-2"), (["Camera 2"], None, None))
+        # Prefix only: "rinter" is inside names but starts none
+        self.assertEqual(self._page(q="rinter"), ([], None, None))
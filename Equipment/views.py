@@ -1,16 +1,15 @@
-from typing import Any
 from django.shortcuts import render
 from django.views.generic import *
 from Equipment.models import Equipment
+from utils.pagination import KeysetListMixin
 # Create your views here.
 
-class EquipmentIndex(ListView):
-    model = Equipment
-    template_name = "index.html"
-    def get_context_data(self, **kwargs) -> dict[str, Any]:
-        context = super().get_context_data(**kwargs)
-        context["equipment_list"] = Equipment.objects.filter(deleted_at__isnull=True)
-        return context
+class EquipmentIndex(KeysetListMixin, ListView):
+    queryset = Equipment.objects.filter(deleted_at__isnull=True)
+    template_name = "equipment_list.html"
+    context_object_name = "equipment_list"
+    list_fields = ['name', 'model_number', 'serial_number', 'plant_name', 'location']
+    search_fields = ['name', 'serial_number']
     
 class EquipmentDetails(DetailView):
     model = Equipment
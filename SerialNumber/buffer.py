@@ -0,0 +1,186 @@
+# SerialNumber/buffer.py
+import atexit
+import threading
+import time
+from collections import deque
+
+from django.db import DatabaseError, connection
+
+from SerialNumber.service import reserve_serials, confirm_serials, renew_leases, release_serials
+
+
+class SerialBufferEmpty(Exception):
+    """Raised when a line asks for serials faster than the buffer can be refilled."""
+
+
+class SerialBuffer:
+    """
+    In-memory block of pre-reserved serials for one production line (Equipment)
+    and one SerialNumberPool.
+
+    Serials are leased from the database in blocks with reserve_serials() and
+    handed out from a deque without touching the database. A background thread
+    refills the block when it drops below `low_water`, confirms handed-out
+    serials in batches, and renews the lease of the ones still buffered or
+    handed out but not confirmed yet. On stop() the unused serials go back to
+    ALLOCATED; if the process dies instead, or cannot reach the database for
+    longer than the lease, void_expired_leases() VOIDs the whole block: any
+    of it may have been printed, so none is ever issued again.
+    """
+
+    _registry = {}
+    _registry_lock = threading.Lock()
+
+    def __init__(self, equipment, pool, batch_lot=None, expiry=None,
+                 capacity=5000, low_water=1000, lease_seconds=900, flush_interval=1.0):
+        if not 0 <= low_water < capacity:
+            raise ValueError("low_water must be between 0 and capacity.")
+        self.equipment = equipment
+        self.pool = pool
+        self.batch_lot = batch_lot
+        self.expiry = expiry
+        self.capacity = capacity
+        self.low_water = low_water
+        self.lease_seconds = lease_seconds
+        self.flush_interval = flush_interval
+
+        self._serials = deque()
+        self._handed_out = []
+        self._lock = threading.Lock()
+        self._refill_needed = threading.Event()
+        self._refilled = threading.Condition(self._lock)
+        self._stopping = threading.Event()
+        self._exhausted = False
+        self._thread = None
+
+    @classmethod
+    def for_line(cls, equipment, pool, batch_lot=None, expiry=None, **options):
+        """Returns the running buffer for (equipment, pool), starting one if needed."""
+        key = (equipment.pk, pool.pk)
+        with cls._registry_lock:
+            buffer = cls._registry.get(key)
+            if buffer is not None and (buffer.batch_lot, buffer.expiry) != (batch_lot, expiry):
+                # Batch changeover: serials already leased carry the old lot/expiry
+                buffer.stop()
+                buffer = None
+            if buffer is None:
+                buffer = cls(equipment, pool, batch_lot, expiry, **options)
+                buffer.start()
+                cls._registry[key] = buffer
+            return buffer
+
+    @classmethod
+    def stop_all(cls):
+        with cls._registry_lock:
+            buffers = list(cls._registry.values())
+            cls._registry.clear()
+        for buffer in buffers:
+            buffer.stop()
+
+    def start(self):
+        self._thread = threading.Thread(
+            target=self._run, name=f"SerialBuffer-{self.equipment.pk}-{self.pool.pk}", daemon=True
+        )
+        self._refill_needed.set()
+        self._thread.start()
+        return self
+
+    def take(self, n=1, timeout=5.0):
+        """
+        Hands out `n` serial strings. Only waits when the buffer is empty, which
+        means the refill thread has fallen behind the line.
+        """
+        deadline = time.monotonic() + timeout
+        taken = []
+        with self._lock:
+            while len(taken) < n:
+                if self._serials:
+                    pk, sn_str = self._serials.popleft()
+                    self._handed_out.append(pk)
+                    taken.append(sn_str)
+                    continue
+                self._refill_needed.set()
+                remaining = deadline - time.monotonic()
+                if self._exhausted or self._stopping.is_set() or remaining <= 0:
+                    # Put back what we took so nothing is lost to a partial request
+                    for sn_str in reversed(taken):
+                        self._serials.appendleft((self._handed_out.pop(), sn_str))
+                    raise SerialBufferEmpty(
+                        f"No serials available for line {self.equipment.pk} from pool {self.pool.pk}."
+                    )
+                self._refilled.wait(remaining)
+
+            if len(self._serials) < self.low_water:
+                self._refill_needed.set()
+        return taken
+
+    def __len__(self):
+        return len(self._serials)
+
+    def stop(self):
+        """Flushes confirmations, returns unused serials to ALLOCATED and stops the thread."""
+        self._stopping.set()
+        self._refill_needed.set()
+        with self._lock:
+            self._refilled.notify_all()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+
+    def _run(self):
+        last_renewal = time.monotonic()
+        try:
+            while not self._stopping.is_set():
+                self._refill_needed.wait(self.flush_interval)
+                self._refill_needed.clear()
+                try:
+                    self._flush_handed_out()
+
+                    if not self._stopping.is_set() and len(self._serials) < self.low_water:
+                        self._refill()
+
+                    # Renew well before expiry so a live buffer never loses its block
+                    if time.monotonic() - last_renewal > self.lease_seconds / 3:
+                        self._renew()
+                        last_renewal = time.monotonic()
+                except DatabaseError:
+                    # Keep serving from memory; the next cycle retries on a fresh connection
+                    connection.close()
+        finally:
+            self._flush_handed_out()
+            with self._lock:
+                unused = [pk for pk, _ in self._serials]
+                self._serials.clear()
+            if unused:
+                release_serials(unused)
+            connection.close()
+
+    def _refill(self):
+        claimed = reserve_serials(
+            self.pool.pk, self.capacity - len(self._serials), self.batch_lot, self.expiry,
+            equipment=self.equipment, lease_seconds=self.lease_seconds,
+        )
+        with self._lock:
+            self._serials.extend(claimed)
+            self._exhausted = not claimed and not self._serials
+            self._refilled.notify_all()
+
+    def _renew(self):
+        with self._lock:
+            # Unconfirmed hand-outs too: their confirmation may be retried for a while
+            leased = [pk for pk, _ in self._serials] + self._handed_out
+        renew_leases(leased, self.lease_seconds)
+
+    def _flush_handed_out(self):
+        with self._lock:
+            handed_out, self._handed_out = self._handed_out, []
+        if handed_out:
+            try:
+                confirm_serials(handed_out)
+            except DatabaseError:
+                # Not confirmed yet: keep them queued (and renewed) for the next cycle
+                with self._lock:
+                    self._handed_out[:0] = handed_out
+                raise
+
+
+atexit.register(SerialBuffer.stop_all)
@@ -0,0 +1,136 @@
+# SerialNumber/commissioning.py
+"""
+Commissioning pipeline: for a set of serials, in one pass per chunk,
+  1. flips them to PRINTED (ending any line lease),
+  2. records the commissioning ObjectEvent with their SGTIN EPCs,
+  3. writes one bulk audit record (Audit.recorder) and updates the status
+     rollup (SerialNumber.rollup),
+and then streams the outbound EPCIS document of the recorded events.
+
+Each chunk is one transaction, and its event gets an id derived from the run
+key and the chunk number. Every commissioned serial keeps the id of its event
+(SerialNumber.commissioning_event_id) and is never picked again: a retried
+run, chunked the same way or not, or an overlapping one, commissions only the
+serials no event covers yet. Its result still lists the earlier events of the
+serials it skipped, so the document covers every serial exactly once.
+"""
+import hashlib
+import uuid
+from collections import namedtuple
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from Audit.recorder import record_bulk
+from EPCISEvent.cbv import normalize_location
+from EPCISEvent.models import EPCISEvent
+from SerialNumber.models import SerialNumber
+from SerialNumber.rollup import apply_counts, transitions
+from utils.epcis_generator import FACILITY_GLN, pool_gtins
+from utils.gs1 import sgtin_uri
+
+COMMISSIONING_CHUNK_SIZE = 10000
+COMMISSIONABLE_STATUSES = ('ALLOCATED', 'PRINTED')
+FACILITY_SGLN = getattr(settings, 'EPCIS_FACILITY_SGLN', FACILITY_GLN)
+# Namespace of the deterministic commissioning event ids
+COMMISSIONING_NAMESPACE = uuid.UUID('6f1c1d52-3c1b-5b8e-9a55-2f0f6c7c0a11')
+
+CommissioningResult = namedtuple('CommissioningResult', ['run_key', 'event_ids', 'commissioned', 'skipped'])
+
+
+def commissioning_run_key(serial_ids):
+    """Stable key of a set of serial ids: the same set always yields the same run."""
+    digest = hashlib.sha256()
+    for serial_id in sorted(serial_ids):
+        digest.update(f"{serial_id},".encode())
+    return digest.hexdigest()
+
+
+def _chunk_event_id(run_key, chunk_size, index):
+    # Same run key and chunk size: the same serials, so a retry finds the committed event
+    return uuid.uuid5(COMMISSIONING_NAMESPACE, f"{run_key}:{chunk_size}:{index}")
+
+
+def _commission_chunk(event_id, chunk, event_time, biz_location):
+    """
+    Flips one chunk to PRINTED and records its event; returns (commissioned, skipped,
+    ids of the events that commissioned its other serials before).
+    """
+    with transaction.atomic():
+        # Already committed by an earlier attempt of this run
+        committed = EPCISEvent.objects.filter(event_id=event_id).exists()
+        rows = [] if committed else list(
+            SerialNumber.objects.select_for_update()
+            .filter(id__in=chunk, status__in=COMMISSIONABLE_STATUSES, commissioning_event_id__isnull=True)
+            .order_by('id')
+            .values_list('id', 'pool_id', 'full_serial_number', 'status', 'batch_lot')
+        )
+        earlier = list(
+            SerialNumber.objects.filter(id__in=chunk, commissioning_event_id__isnull=False).order_by()
+            .values_list('commissioning_event_id', flat=True).distinct()
+        )
+        if committed:
+            return 0, 0, earlier
+        if not rows:
+            return 0, len(chunk), earlier
+
+        ids = [row[0] for row in rows]
+        SerialNumber.objects.filter(id__in=ids).update(
+            status='PRINTED', leased_to=None, lease_expires_at=None, last_modified=event_time,
+            commissioning_event_id=event_id,
+        )
+        record_bulk('serials.commission', ids, details={'event_id': event_id, 'skipped': len(chunk) - len(rows)})
+        apply_counts(transitions([(pool_id, status, batch_lot) for _, pool_id, _, status, batch_lot in rows], 'PRINTED'))
+
+        gtins = pool_gtins({pool_id for _, pool_id, _, _, _ in rows})
+        EPCISEvent(
+            event_id=event_id,
+            event_type='ObjectEvent',
+            event_time=event_time,
+            action='ADD',
+            biz_step='commissioning',
+            disposition='active',
+            read_point=biz_location,
+            biz_location=biz_location,
+            epc_list=','.join(sgtin_uri(gtins[pool_id], serial) for _, pool_id, serial, _, _ in rows),
+        ).save()
+        return len(rows), len(chunk) - len(rows), earlier
+
+
+def commission_serials(serial_ids, chunk_size=COMMISSIONING_CHUNK_SIZE, run_key=None, biz_location=None):
+    """
+    Commissions the serials (ids); CONSUMED or VOID serials, and serials an
+    earlier run commissioned already, are skipped.
+
+    :param run_key: Identifies the run for retries; defaults to a digest of the ids.
+    :param biz_location: SGLN URN or Digital Link; defaults to settings.EPCIS_FACILITY_SGLN
+        (else EPCIS_FACILITY_GLN, see utils.epcis_generator).
+    :return: CommissioningResult(run_key, event_ids, commissioned, skipped). event_ids
+        also lists the earlier events of skipped serials; commissioned and skipped
+        only count the chunks done by this call.
+    """
+    serial_ids = sorted(set(serial_ids))
+    run_key = run_key or commissioning_run_key(serial_ids)
+    biz_location = normalize_location(biz_location or FACILITY_SGLN)
+    event_time = timezone.now()
+
+    event_ids = {}
+    commissioned = skipped = 0
+    for index, start in enumerate(range(0, len(serial_ids), chunk_size)):
+        event_id = _chunk_event_id(run_key, chunk_size, index)
+        done, passed, earlier = _commission_chunk(event_id, serial_ids[start:start + chunk_size], event_time, biz_location)
+        commissioned += done
+        skipped += passed
+        event_ids.update(dict.fromkeys(earlier))
+        if done:
+            event_ids[event_id] = None
+    return CommissioningResult(run_key, list(event_ids), commissioned, skipped)
+
+
+def commissioning_document(result, **options):
+    """
+    Streams the EPCISDocument (bytes chunks) of a run's commissioning events.
+    See EPCISEvent.export.stream_epcis_document for the options (fmt, gzip, chunk_size).
+    """
+    return EPCISEvent.export_document(EPCISEvent.objects.filter(event_id__in=result.event_ids), **options)
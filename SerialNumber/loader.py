@@ -0,0 +1,157 @@
+# SerialNumber/loader.py
+"""
+Database-native bulk loader for SerialNumber rows.
+
+Streams (full_serial_number, pool_id, status) tuples straight into the table
+without building model instances: COPY FROM STDIN on PostgreSQL, a prepared
+executemany on SQLite. Rows go through a staging table and are moved with
+INSERT ... ON CONFLICT DO NOTHING RETURNING, so the inserted count, id range
+and per-pool breakdown come from the rows this load inserted: exact even when
+some serials already exist or other loads insert concurrently. Each load is
+audited as one 'serials.generate' record with the id range of the new rows,
+and the new rows are added to the status rollup (SerialNumber.rollup) in the
+same transaction.
+"""
+import io
+import time
+from contextlib import contextmanager, nullcontext
+from collections import Counter, namedtuple
+from itertools import islice
+
+from django.db import NotSupportedError, connection, transaction
+from django.utils import timezone
+
+from Audit.recorder import record_bulk
+from SerialNumber.models import SerialNumber
+from SerialNumber.rollup import apply_counts
+from SerialNumberPool.models import SerialNumberPool
+
+STAGING_CHUNK_SIZE = 50_000
+
+SQLITE_PRAGMAS = [
+    ('synchronous', 'OFF'),
+    ('temp_store', 'MEMORY'),
+    ('cache_size', '-200000'),
+]
+
+class LoadResult(namedtuple('LoadResult', ['offered', 'inserted', 'seconds'])):
+    """Outcome of a load: rows offered, rows actually inserted, wall time."""
+
+    @property
+    def rows_per_second(self):
+        return self.inserted / self.seconds if self.seconds else 0.0
+
+
+def _chunks(rows, size):
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _copy_chunk(cursor, staging, chunk):
+    """Sends one chunk to the staging table with COPY (psycopg 3 or psycopg2)."""
+    sql = f"COPY {staging} (full_serial_number, pool_id, status) FROM STDIN"
+    if hasattr(cursor.cursor, 'copy'):
+        with cursor.cursor.copy(sql) as copy:
+            for row in chunk:
+                copy.write_row(row)
+    else:
+        buffer = io.StringIO(''.join(f"{sn}\t{pool_id}\t{status}\n" for sn, pool_id, status in chunk))
+        cursor.cursor.copy_expert(sql, buffer)
+
+
+@contextmanager
+def _sqlite_pragmas(cursor):
+    """
+    Applies SQLITE_PRAGMAS for the duration of a load, then restores the previous
+    values: they are per-connection, and the connection is Django's shared one.
+    Inside an enclosing transaction they cannot be changed and the load runs without them.
+    """
+    saved = []
+    try:
+        if not connection.in_atomic_block:
+            for name, value in SQLITE_PRAGMAS:
+                cursor.execute(f"PRAGMA {name}")
+                saved.append((name, cursor.fetchone()[0]))
+                cursor.execute(f"PRAGMA {name} = {value}")
+        yield
+    finally:
+        for name, value in saved:
+            cursor.execute(f"PRAGMA {name} = {value}")
+
+
+def load_serials(rows, chunk_size=STAGING_CHUNK_SIZE):
+    """
+    Loads an iterable of (full_serial_number, pool_id, status) tuples in one
+    transaction and returns a LoadResult with the exact number of new rows.
+    """
+    table = connection.ops.quote_name(SerialNumber._meta.db_table)
+    staging = 'serialnumber_load_staging'
+    vendor = connection.vendor
+    if vendor not in ('sqlite', 'postgresql') or not connection.features.can_return_rows_from_bulk_insert:
+        raise NotSupportedError(f"The native serial loader does not support '{vendor}' (needs INSERT ... RETURNING).")
+    offered = inserted = 0
+    started = time.perf_counter()
+
+    with connection.cursor() as cursor, (_sqlite_pragmas(cursor) if vendor == 'sqlite' else nullcontext()):
+        with transaction.atomic():
+            cursor.execute(
+                f"CREATE TEMP TABLE IF NOT EXISTS {staging} ("
+                "full_serial_number varchar(20) NOT NULL, pool_id char(32) NOT NULL, status varchar(10) NOT NULL)"
+            )
+            # The trailing WHERE keeps SQLite from parsing ON CONFLICT as a join constraint
+            move_sql = (
+                f"INSERT INTO {table} (full_serial_number, pool_id, status, last_modified) "
+                f"SELECT full_serial_number, pool_id, status, %s FROM {staging} WHERE 1 = 1 "
+                "ON CONFLICT (full_serial_number) DO NOTHING RETURNING id, pool_id, status"
+            )
+            if vendor == 'postgresql':
+                # uuid columns need an explicit cast from the text staging column
+                move_sql = move_sql.replace("pool_id, status, %s", "pool_id::uuid, status, %s")
+            now = connection.ops.adapt_datetimefield_value(timezone.now())
+            first_id = last_id = None
+            pool_ids = set()
+            counts = Counter()
+            for chunk in _chunks(rows, chunk_size):
+                pool_ids.update(row[1] for row in chunk)
+                cursor.execute(f"DELETE FROM {staging}")
+                if vendor == 'postgresql':
+                    _copy_chunk(cursor, staging, chunk)
+                else:
+                    cursor.executemany(
+                        f"INSERT INTO {staging} (full_serial_number, pool_id, status) VALUES (%s, %s, %s)",
+                        chunk,
+                    )
+                cursor.execute(move_sql, [now])
+                offered += len(chunk)
+                # Only the rows this statement inserted: not the conflicting ones, nor other loads'
+                for pk, pool_id, status in cursor.fetchall():
+                    inserted += 1
+                    counts[pool_id, status] += 1
+                    first_id = pk if first_id is None else min(first_id, pk)
+                    last_id = pk if last_id is None else max(last_id, pk)
+
+            cursor.execute(f"DROP TABLE {staging}")
+            if inserted:
+                # Concurrent loads may interleave ids: the range bounds this load's rows
+                record_bulk('serials.generate', count=inserted, id_range=(first_id, last_id), details={
+                    'pool_ids': sorted(pool_ids), 'offered': offered,
+                })
+                to_pool_id = SerialNumberPool._meta.pk.to_python
+                changes = Counter()
+                for (pool_id, status), n in counts.items():
+                    changes[to_pool_id(pool_id), status, None] += n
+                apply_counts(changes)
+
+    return LoadResult(offered, inserted, time.perf_counter() - started)
+
+
+def serial_rows(pool, serials, status='ALLOCATED'):
+    """Adapts an iterable of serial strings to loader rows for `pool`."""
+    # SQLite stores UUIDs as 32-char hex; PostgreSQL accepts the same text form
+    pool_id = pool.pool_id.hex
+    for sn_str in serials:
+        yield (sn_str, pool_id, status)
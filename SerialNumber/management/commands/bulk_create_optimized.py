@@ -1,106 +1,353 @@
 # YourApp/management/commands/bulk_create_optimized.py
+import multiprocessing
 import time
-from django.core.management.base import BaseCommand
+from itertools import islice
+from queue import Empty
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import NotSupportedError, connection, connections, transaction
 from django.db.utils import IntegrityError
+from django.utils import timezone
 # Adjust import paths as needed
-from SerialNumber.models import SerialNumber 
-from SerialNumberPool.service import reserve_pool_state_for_bulk, generate_alphanumeric_serial 
+from SerialNumber.models import SerialNumber
+from Audit.recorder import audit_reason, current_reason, record_bulk
+from SerialNumber.loader import load_serials, serial_rows
+from SerialNumber.rollup import apply_counts
+from SerialNumberPool.models import SerialNumberPool
+from SerialNumberPool.service import (
+    reserve_pool_state_for_bulk, reconcile_pool, generate_serials, get_pool_permutation
+)
+
+BATCH_SIZE = 5000
+MAX_TOP_UP_ROUNDS = 10 # Gives up once a round inserts nothing (keyspace full)
+DEFAULT_SERIAL_LENGTH = 12 # RANDOM pools; PERMUTED pools use their own serial_length
+
+
+def insert_permuted_serials(pool, counters, batch_size, progress=None, native=False):
+    """Inserts the serials for a range of counters of a PERMUTED pool, one batch at a time."""
+    serial_stream = get_pool_permutation(pool).serials(counters)
+    records_created = 0
+
+    if native:
+        # One streaming load in a single transaction; the loader does its own chunking
+        result = load_serials(serial_rows(pool, serial_stream))
+        if progress:
+            progress(result.inserted, result.offered)
+        return result.inserted
+
+    while True:
+        batch = list(islice(serial_stream, batch_size))
+        if not batch:
+            break
+        # No ignore_conflicts: a conflict here is a real error, not a retry condition
+        records_created += _bulk_create_audited(pool, batch, ignore_conflicts=False)
+        if progress:
+            progress(records_created, records_created)
+
+    return records_created
+
+
+def insert_random_serials(pool, quantity, serial_length, batch_size, progress=None, native=False):
+    """
+    Generates and inserts `quantity` random serials for a RANDOM pool.
+    Returns (records_created, generation_attempts).
+    """
+    MAX_ATTEMPTS = quantity * 1 # Safety break for generation loop
+
+    # Use a set to track duplicates *within the current bulk operation* only
+    # This is essential to prevent IntegrityError during bulk_create itself.
+    current_batch_serials = set()
+    items_to_create = []
+
+    records_created = 0
+    generation_attempts = 0
+
+    # Block generator: draws os.urandom in large chunks instead of one call per character
+    serial_stream = generate_serials(MAX_ATTEMPTS, serial_length)
+
+    while records_created < quantity and generation_attempts < MAX_ATTEMPTS:
+
+        # Pull the next serial from the block generator
+        sn_str = next(serial_stream)
+        generation_attempts += 1
+
+        # Skip if already generated in this *current* bulk run (in-memory check)
+        if sn_str in current_batch_serials:
+            continue
+
+        current_batch_serials.add(sn_str)
+        items_to_create.append(sn_str)
+
+        # Execute bulk insert when batch size is reached
+        if len(items_to_create) >= batch_size:
+            inserted_count = _insert_random_batch(pool, items_to_create, native)
+
+            records_created += inserted_count
+            if progress:
+                progress(records_created, generation_attempts)
+
+            # Reset batch variables
+            items_to_create = []
+            current_batch_serials.clear()
+
+    # Insert remaining items
+    if items_to_create:
+        inserted_count = _insert_random_batch(pool, items_to_create, native)
+        records_created += inserted_count
+        if progress:
+            progress(records_created, generation_attempts)
+
+    return records_created, generation_attempts
+
+
+def _insert_random_batch(pool, serials, native):
+    """Inserts one batch of random serials and returns the inserted count."""
+    if native:
+        # Staging table + ON CONFLICT DO NOTHING: the count excludes dropped duplicates
+        return load_serials(serial_rows(pool, serials)).inserted
+
+    # Use ignore_conflicts=True to let the DB silently drop duplicates
+    # (highly recommended for random generation in high-volume systems)
+    return _bulk_create_audited(pool, serials, ignore_conflicts=True)
+
+
+def _insert_returning_ids(pool, serials, ignore_conflicts):
+    """
+    Inserts one batch of ALLOCATED serials; returns the ids of the rows it inserted,
+    taken from the INSERT itself (RETURNING). Rows other workers insert meanwhile
+    and serials dropped as duplicates are never among them.
+    """
+    if not connection.features.can_return_rows_from_bulk_insert:
+        raise NotSupportedError("Audited bulk generation needs INSERT ... RETURNING (PostgreSQL, SQLite 3.35+).")
+    if not ignore_conflicts:
+        created = SerialNumber.objects.bulk_create(
+            [SerialNumber(full_serial_number=sn_str, pool=pool, status='ALLOCATED') for sn_str in serials]
+        )
+        return [obj.pk for obj in created]
+
+    # bulk_create(ignore_conflicts=True) returns no primary keys: same INSERT, by hand
+    db = connection.ops
+    table = db.quote_name(SerialNumber._meta.db_table)
+    pool_id = SerialNumberPool._meta.pk.get_db_prep_value(pool.pool_id, connection)
+    now = db.adapt_datetimefield_value(timezone.now())
+    step = db.bulk_batch_size(['full_serial_number', 'pool_id', 'status', 'last_modified'], serials)
+    ids = []
+    with connection.cursor() as cursor:
+        for start in range(0, len(serials), step):
+            batch = serials[start:start + step]
+            cursor.execute(
+                f"INSERT INTO {table} (full_serial_number, pool_id, status, last_modified) "
+                f"VALUES {', '.join(['(%s, %s, %s, %s)'] * len(batch))} "
+                "ON CONFLICT (full_serial_number) DO NOTHING RETURNING id",
+                [value for sn_str in batch for value in (sn_str, pool_id, 'ALLOCATED', now)],
+            )
+            ids.extend(pk for pk, in cursor.fetchall())
+    return ids
+
+
+def _bulk_create_audited(pool, serials, ignore_conflicts):
+    """
+    Inserts one batch, audited as one 'serials.generate' record (with the
+    inserted ids) and counted in the pool's status rollup.
+    Returns the number of rows actually inserted.
+    """
+    with transaction.atomic():
+        ids = _insert_returning_ids(pool, serials, ignore_conflicts)
+        if ids:
+            record_bulk('serials.generate', ids, details={'pool_ids': [pool.pool_id], 'offered': len(serials)})
+            apply_counts({(pool.pool_id, 'ALLOCATED', None): len(ids)})
+    return len(ids)
+
+
+def _bulk_insert_worker(worker_index, pool_id, lease, serial_length, batch_size, native, reason, queue):
+    """
+    Runs in a child process: inserts one lease (a (start, stop) slice of the
+    coordinator's reservation) on its own database connection and reports
+    progress and the final count back through `queue`.
+    """
+    import django
+    django.setup()
+
+    def progress(records_created, generation_attempts):
+        queue.put(('progress', worker_index, records_created, generation_attempts))
+
+    try:
+        pool = SerialNumberPool.manager.get(pool_id=pool_id)
+        start, stop = lease
+        with audit_reason(reason):
+            if pool.allocation_mode == 'PERMUTED':
+                created = insert_permuted_serials(pool, range(start, stop), batch_size, progress, native)
+                attempts = created
+            else:
+                created, attempts = insert_random_serials(pool, stop - start, serial_length, batch_size, progress, native)
+        queue.put(('done', worker_index, created, attempts))
+    except Exception as e:
+        queue.put(('error', worker_index, str(e), 0))
+    finally:
+        connections.close_all()
+
 
 class Command(BaseCommand):
     help = 'Optimized bulk creation of 1M alphanumeric serials using generators and bulk_create.'
 
-    # ... add_arguments method (same as before) ...
     def add_arguments(self, parser):
         parser.add_argument('--pool_id', type=str, required=True)
         parser.add_argument('--quantity', type=int, default=1_000_000)
-        parser.add_argument('--length', type=int, default=12)
+        parser.add_argument('--length', type=int, default=None,
+                            help=f'Serial length for RANDOM pools (default {DEFAULT_SERIAL_LENGTH}). PERMUTED pools always use '
+                                 'their own serial_length; giving a different --length for them is an error.')
+        parser.add_argument('--workers', type=int, default=1,
+                            help='Number of worker processes, each with its own DB connection and lease.')
+        parser.add_argument('--native', action='store_true',
+                            help='Load rows with COPY (PostgreSQL) / executemany (SQLite) instead of bulk_create.')
+        parser.add_argument('--reason', default='',
+                            help='Reason recorded in the audit trail with every generated batch.')
 
     def handle(self, *args, **options):
         # --- Configuration ---
         POOL_ID = options['pool_id']
         TOTAL_RECORDS_TARGET = options['quantity']
-        SERIAL_LENGTH = options['length']
-        BATCH_SIZE = 5000 
-        MAX_ATTEMPTS = TOTAL_RECORDS_TARGET * 1 # Safety break for generation loop
+        SERIAL_LENGTH = self._serial_length(POOL_ID, options['length'])
+        WORKERS = max(1, options['workers'])
+        NATIVE = options['native']
+        REASON = options['reason']
         # ---------------------
 
         self.stdout.write(f"Starting optimized bulk creation for pool '{POOL_ID}'.")
         start_time_total = time.time()
-        
+
         try:
             # 1. RESERVE POOL STATE
             pool = reserve_pool_state_for_bulk(POOL_ID, TOTAL_RECORDS_TARGET)
-            
-            # 2. GENERATOR AND INSERTION LOOP
-            
-            # Use a set to track duplicates *within the current bulk operation* only
-            # This is essential to prevent IntegrityError during bulk_create itself.
-            current_batch_serials = set()
-            items_to_create = []
-            
+            rows_before = pool.serial_numbers.count()
             records_created = 0
-            generation_attempts = 0
-            
-            self.stdout.write(f"Generating and inserting in batches of {TOTAL_RECORDS_TARGET:,}...")
-
-            while records_created < TOTAL_RECORDS_TARGET and generation_attempts < MAX_ATTEMPTS:
-                
-                # Generate serial on the fly using the generator function
-                sn_str = generate_alphanumeric_serial(SERIAL_LENGTH)
-                generation_attempts += 1
-                
-                # Skip if already generated in this *current* bulk run (in-memory check)
-                if sn_str in current_batch_serials:
-                    continue 
-
-                current_batch_serials.add(sn_str)
-
-                item = SerialNumber(
-                    full_serial_number=sn_str,
-                    pool=pool, 
-                    status='ALLOCATED',
-                )
-                items_to_create.append(item)
-
-                # Execute bulk insert when batch size is reached
-                if len(items_to_create) >= BATCH_SIZE:
-                    try:
-                        # Use ignore_conflicts=True to let the DB silently drop duplicates
-                        # (highly recommended for random generation in high-volume systems)
-                        inserted_count = len(SerialNumber.objects.bulk_create(
-                            items_to_create, 
-                            ignore_conflicts=True
-                        ))
-                        
-                        records_created += inserted_count
-                        self.stdout.write(f"Inserted {records_created:,} records (Attempts: {generation_attempts:,})")
-                        
-                    except IntegrityError as e:
-                        # Fallback for databases that don't support ignore_conflicts (e.g., older SQLite)
-                        self.stdout.write(self.style.ERROR(f"IntegrityError encountered: {e}. Cannot proceed without ignore_conflicts=True support."))
-                        break
-
-                    # Reset batch variables
-                    items_to_create = [] 
-                    current_batch_serials.clear()
-
-            # Insert remaining items
-            if items_to_create:
-                inserted_count = len(SerialNumber.objects.bulk_create(items_to_create, ignore_conflicts=True))
-                records_created += inserted_count
+
+            # 2. GENERATOR AND INSERTION, topping up until the table really holds the target
+            for top_up_round in range(MAX_TOP_UP_ROUNDS):
+                remaining = TOTAL_RECORDS_TARGET - records_created
+                if top_up_round:
+                    self.stdout.write(f"Topping up {remaining:,} serials dropped as duplicates...")
+                    pool = reserve_pool_state_for_bulk(POOL_ID, remaining)
+
+                try:
+                    with audit_reason(REASON):
+                        self._generate_and_insert(pool, remaining, SERIAL_LENGTH, WORKERS, NATIVE)
+                except IntegrityError as e:
+                    # ignore_conflicts only skips duplicate serials; any other constraint failure stops the run
+                    self.stdout.write(self.style.ERROR(f"IntegrityError encountered: {e}. Stopping; the pool is reconciled with the rows inserted so far."))
+                    break
+
+                # Inserted counts from bulk_create(ignore_conflicts=True) over-report; count the table instead
+                inserted = pool.serial_numbers.count() - rows_before
+                made_progress = inserted > records_created
+                records_created = inserted
+                if records_created >= TOTAL_RECORDS_TARGET or not made_progress:
+                    break
+
+            # Reservations were taken for the full quantity each round; align the pool with the table
+            pool, _ = reconcile_pool(POOL_ID)
 
             # 3. REPORTING
             total_time = time.time() - start_time_total
-            
+
             if records_created < TOTAL_RECORDS_TARGET:
                  self.stdout.write(self.style.WARNING(
                     f"WARNING: Only {records_created:,} records created out of target {TOTAL_RECORDS_TARGET:,}. "
                     "This usually means the probability of duplicates is too high (serial length too short) or a conflict occurred."
                 ))
-            
+
             self.stdout.write(self.style.SUCCESS(
-                f"\nFinished. Total unique records created: {records_created:,} in {total_time:.2f} seconds."
+                f"\nFinished. Total unique records created: {records_created:,} in {total_time:.2f} seconds "
+                f"({records_created / total_time if total_time else 0:,.0f} rows/sec)."
             ))
 
         except Exception as e:
-            self.stdout.write(self.style.ERROR(f"A critical error occurred: {e}"))
\ No newline at end of file
+            self.stdout.write(self.style.ERROR(f"A critical error occurred: {e}"))
+
+    def _serial_length(self, pool_id, length):
+        """--length, checked against a PERMUTED pool's serial_length (its keyspace is fixed at its first run)."""
+        try:
+            pool = SerialNumberPool.manager.filter(pool_id=pool_id).values('allocation_mode', 'serial_length').first()
+        except (ValueError, ValidationError) as e:
+            raise CommandError(str(e))
+        if pool and pool['allocation_mode'] == 'PERMUTED':
+            if length is not None and length != pool['serial_length']:
+                raise CommandError(
+                    f"Pool '{pool_id}' is PERMUTED with serial_length {pool['serial_length']}; "
+                    f"--length {length} cannot be applied to it."
+                )
+            return pool['serial_length']
+        return DEFAULT_SERIAL_LENGTH if length is None else length
+
+    def _generate_and_insert(self, pool, quantity, serial_length, workers, native):
+        """Runs one generation pass for `quantity` serials of an already reserved pool."""
+        if workers > 1:
+            self._run_workers(pool, quantity, serial_length, workers, native)
+        elif pool.allocation_mode == 'PERMUTED':
+            # Unique by construction: no retries and no conflict handling
+            self.stdout.write(f"Pool uses PERMUTED allocation (counters {pool.reserved_counters.start:,}-{pool.reserved_counters.stop - 1:,}).")
+            insert_permuted_serials(
+                pool, pool.reserved_counters, BATCH_SIZE,
+                lambda created, attempts: self.stdout.write(f"Inserted {created:,} records"),
+                native
+            )
+        else:
+            self.stdout.write(f"Generating and inserting in batches of {BATCH_SIZE:,}...")
+            insert_random_serials(
+                pool, quantity, serial_length, BATCH_SIZE,
+                lambda created, attempts: self.stdout.write(f"Inserted {created:,} records (Attempts: {attempts:,})"),
+                native
+            )
+
+    def _run_workers(self, pool, quantity, serial_length, workers, native):
+        """
+        Coordinator for --workers: splits the reservation into disjoint leases,
+        runs one process per lease and aggregates their progress.
+        """
+        # Leases are slices of the reserved counter range (PERMUTED) or of the quantity (RANDOM)
+        base = pool.reserved_counters.start if pool.reserved_counters is not None else 0
+        step = -(-quantity // workers)
+        leases = [
+            (base + start, base + min(start + step, quantity))
+            for start in range(0, quantity, step)
+        ]
+
+        # Children must open their own connections rather than share the parent's
+        connections.close_all()
+
+        ctx = multiprocessing.get_context()
+        queue = ctx.Queue()
+        processes = [
+            ctx.Process(
+                target=_bulk_insert_worker,
+                args=(i, str(pool.pool_id), lease, serial_length, BATCH_SIZE, native, current_reason(), queue),
+            )
+            for i, lease in enumerate(leases)
+        ]
+        self.stdout.write(f"Starting {len(processes)} workers for {quantity:,} serials...")
+        for process in processes:
+            process.start()
+
+        progress = [0] * len(processes)
+        pending = len(processes)
+        while pending:
+            try:
+                kind, index, value, attempts = queue.get(timeout=1)
+            except Empty:
+                # A worker that died without reporting must not hang the coordinator
+                if not any(process.is_alive() for process in processes):
+                    self.stdout.write(self.style.ERROR("Workers exited without reporting completion."))
+                    break
+                continue
+            if kind == 'progress':
+                progress[index] = value
+                self.stdout.write(f"Inserted {sum(progress):,} records (worker {index}: {value:,})")
+            elif kind == 'done':
+                progress[index] = value
+                pending -= 1
+            else:
+                self.stdout.write(self.style.ERROR(f"Worker {index} failed: {value}"))
+                pending -= 1
+
+        for process in processes:
+            process.join()
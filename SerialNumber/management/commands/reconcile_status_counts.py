@@ -0,0 +1,45 @@
+# SerialNumber/management/commands/reconcile_status_counts.py
+import time
+
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+
+from SerialNumber.rollup import reconcile_status_counts
+from SerialNumberPool.models import SerialNumberPool
+
+
+class Command(BaseCommand):
+    help = 'Recounts serials per pool, batch/lot and status and corrects the rollup counters (one round, or --loop).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pool_id', type=str, help='Reconcile a single pool (default: every pool).')
+        parser.add_argument('--loop', action='store_true', help='Keep reconciling until interrupted.')
+        parser.add_argument('--interval', type=float, default=3600.0,
+                            help='Seconds between rounds (with --loop).')
+
+    def handle(self, *args, **options):
+        while True:
+            self._reconcile(options['pool_id'])
+            if not options['loop']:
+                return
+            time.sleep(options['interval'])
+
+    def _reconcile(self, pool_id):
+        pool_ids = [pool_id] if pool_id else list(SerialNumberPool.manager.values_list('pool_id', flat=True))
+        drifted = 0
+        for pool_id in pool_ids:
+            try:
+                corrections = reconcile_status_counts(pool_id)
+            except (ValueError, ValidationError) as e:
+                raise CommandError(str(e))
+            if corrections:
+                drifted += 1
+                changes = ', '.join(
+                    f"{status}{f' {batch_lot}' if batch_lot else ''} {n:+,}"
+                    for (_, status, batch_lot), n in sorted(corrections.items(), key=lambda item: item[0][1:])
+                )
+                self.stdout.write(self.style.WARNING(f"Pool {pool_id}: {changes}."))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Reconciled {len(pool_ids):,} pool(s); {drifted:,} had drifted."
+        ))
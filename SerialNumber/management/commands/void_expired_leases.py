@@ -0,0 +1,10 @@
+# SerialNumber/management/commands/void_expired_leases.py
+from django.core.management.base import BaseCommand
+from SerialNumber.service import void_expired_leases
+
+class Command(BaseCommand):
+    help = 'VOIDs serials whose line-buffer lease has expired, as they may have been printed (run periodically, e.g. from cron).'
+
+    def handle(self, *args, **options):
+        voided = void_expired_leases()
+        self.stdout.write(self.style.SUCCESS(f"Voided {voided:,} serial(s) with expired leases."))
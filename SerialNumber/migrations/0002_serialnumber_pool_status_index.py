@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('SerialNumber', '0001_initial'),
+        ('SerialNumberPool', '0004_serialnumberpool_allocation_mode'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='serialnumber',
+            index=models.Index(fields=['pool', 'status', 'id'], name='sn_pool_status_id_idx'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:44
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Equipment', '0002_equipment_deleted_at'),
+        ('SerialNumber', '0002_serialnumber_pool_status_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='serialnumber',
+            name='lease_expires_at',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='serialnumber',
+            name='leased_to',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='leased_serials', to='Equipment.equipment'),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.18 on 2026-10-18 23:58
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Case, CharField, Count, Value, When
+from django.db.models.functions import Coalesce
+
+
+def backfill_status_counts(apps, schema_editor):
+    """Seeds the counters from the existing serials (one GROUP BY); later changes are incremental."""
+    SerialNumber = apps.get_model('SerialNumber', 'SerialNumber')
+    SerialStatusCount = apps.get_model('SerialNumber', 'SerialStatusCount')
+    # ALLOCATED serials are counted per pool only (see SerialNumber.rollup.bucket)
+    lot = Case(When(status='ALLOCATED', then=Value('')), default=Coalesce('batch_lot', Value('')), output_field=CharField())
+    groups = (
+        SerialNumber.objects.order_by().annotate(lot=lot)
+        .values_list('pool_id', 'lot', 'status').annotate(n=Count('id'))
+    )
+    SerialStatusCount.objects.bulk_create(
+        [SerialStatusCount(pool_id=pool_id, batch_lot=lot, status=status, count=n) for pool_id, lot, status, n in groups],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('SerialNumber', '0003_serialnumber_line_lease'),
+        ('SerialNumberPool', '0004_serialnumberpool_allocation_mode'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SerialStatusCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('batch_lot', models.CharField(blank=True, default='', max_length=20)),
+                ('status', models.CharField(choices=[('ALLOCATED', 'Allocated to Pool (Ready to use)'), ('PRINTED', 'Printed/Reserved by Production Line'), ('CONSUMED', 'Shipped/Reported Consumed'), ('VOID', 'Void/Scrapped (Permanently retired)')], max_length=10)),
+                ('shard', models.PositiveSmallIntegerField(default=0)),
+                ('count', models.BigIntegerField(default=0)),
+                ('pool', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='status_counts', to='SerialNumberPool.serialnumberpool')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('pool', 'batch_lot', 'status', 'shard'), name='sn_status_count_uniq')],
+            },
+        ),
+        migrations.RunPython(backfill_status_counts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('SerialNumber', '0004_status_counts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='serialnumber',
+            name='commissioning_event_id',
+            field=models.UUIDField(blank=True, editable=False, null=True),
+        ),
+    ]
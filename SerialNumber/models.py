@@ -31,7 +31,42 @@ class SerialNumber(models.Model):
     status = models.CharField(max_length=10, choices=SN_STATUS_CHOICES, default='ALLOCATED', db_index=True)
     
     last_modified = models.DateTimeField(auto_now=True)
+
+    # Line lease: set while a PRINTED serial sits unused in a line's SerialBuffer
+    leased_to = models.ForeignKey('Equipment.Equipment', on_delete=models.SET_NULL, null=True, blank=True, related_name='leased_serials')
+    lease_expires_at = models.DateTimeField(null=True, blank=True, db_index=True)
+
+    # Commissioning ObjectEvent that commissioned the serial (SerialNumber.commissioning); set once
+    commissioning_event_id = models.UUIDField(null=True, blank=True, editable=False)
     
     class Meta:
         verbose_name = "Individual Serial Number"
-        verbose_name_plural = "Individual Serial Numbers"
\ No newline at end of file
+        verbose_name_plural = "Individual Serial Numbers"
+        indexes = [
+            # Serves reserve_serials(): next ALLOCATED rows of a pool in id order
+            models.Index(fields=['pool', 'status', 'id'], name='sn_pool_status_id_idx'),
+        ]
+
+class SerialStatusCount(models.Model):
+    """
+    Incrementally maintained number of a pool's serials per batch/lot and status
+    (see SerialNumber.rollup): the batch rollups read these few rows instead of
+    counting SerialNumber rows. ALLOCATED serials are counted per pool only
+    (batch_lot ''), as they belong to no batch yet.
+
+    Each (pool, batch_lot, status) is spread over `shard` rows so concurrent
+    transitions in one pool rarely queue on the same counter row.
+    """
+    pool = models.ForeignKey('SerialNumberPool.SerialNumberPool', on_delete=models.CASCADE, related_name='status_counts')
+    batch_lot = models.CharField(max_length=20, blank=True, default='')
+    status = models.CharField(max_length=10, choices=SN_STATUS_CHOICES)
+    shard = models.PositiveSmallIntegerField(default=0)
+    count = models.BigIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['pool', 'batch_lot', 'status', 'shard'], name='sn_status_count_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.pool_id} {self.batch_lot or '-'} {self.status}: {self.count:,}"
@@ -0,0 +1,113 @@
+# SerialNumber/rollup.py
+"""
+Serial status rollups per pool and batch/lot.
+
+A live COUNT(*) ... GROUP BY status over a pool's SerialNumber rows grows with
+the pool (millions of rows). Instead, every bulk status transition applies its
+net change to SerialStatusCount in the transaction that makes it, at the same
+points as the bulk audit records: generation, reserve, release / lease expiry
+and commissioning. Reading a rollup sums a handful of counter rows, whatever
+the pool size.
+
+Counters only drift when serials change behind these paths (admin edits, raw
+SQL); reconcile_status_counts() recounts a pool and applies the difference
+(run periodically by the reconcile_status_counts command).
+"""
+import random
+from collections import Counter
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+
+from SerialNumber.models import SerialNumber, SerialStatusCount
+from SerialNumberPool.models import SN_STATUS_CHOICES, SerialNumberPool
+
+# Rows each counter is spread over; a transition updates one picked at random
+COUNTER_SHARDS = getattr(settings, 'SERIAL_STATUS_COUNTER_SHARDS', 8)
+STATUSES = [status for status, _ in SN_STATUS_CHOICES]
+
+
+def bucket(status, batch_lot):
+    """The batch_lot a serial is counted under: ALLOCATED serials belong to no batch yet."""
+    return '' if status == 'ALLOCATED' else batch_lot or ''
+
+
+def transitions(rows, status):
+    """
+    Counter changes of moving serials, given as (pool_id, status, batch_lot)
+    rows read before the update, to `status` (each keeping its batch_lot).
+    """
+    changes = Counter()
+    for pool_id, previous, batch_lot in rows:
+        changes[pool_id, previous, batch_lot] -= 1
+        changes[pool_id, status, batch_lot] += 1
+    return changes
+
+
+def count_rows(queryset):
+    """Counter of SerialNumber rows per (pool_id, status, batch_lot), batch_lot as counted (see bucket)."""
+    counts = Counter()
+    for pool_id, status, batch_lot, n in (
+        queryset.order_by().values_list('pool_id', 'status', 'batch_lot').annotate(n=Count('id'))
+    ):
+        counts[pool_id, status, bucket(status, batch_lot)] += n
+    return counts
+
+
+def apply_counts(changes):
+    """
+    Adds the {(pool_id, status, batch_lot): n} changes to the counters.
+    Call it in the transaction that changes the serials, so both commit together.
+    """
+    net = Counter()
+    for (pool_id, status, batch_lot), n in changes.items():
+        net[pool_id, status, bucket(status, batch_lot)] += n
+    shard = random.randrange(COUNTER_SHARDS)
+    # Fixed order: two transitions never wait on each other's counter rows crosswise
+    for (pool_id, status, batch_lot), n in sorted(net.items(), key=lambda item: (str(item[0][0]), *item[0][1:])):
+        if not n:
+            continue
+        key = {'pool_id': pool_id, 'batch_lot': batch_lot, 'status': status, 'shard': shard}
+        counters = SerialStatusCount.objects.filter(**key)
+        if not counters.update(count=F('count') + n):
+            SerialStatusCount.objects.bulk_create([SerialStatusCount(**key)], ignore_conflicts=True)
+            counters.update(count=F('count') + n)
+
+
+def status_counts(pool_id, batch_lot=None):
+    """
+    {status: count} of a pool's serials, every status present. With `batch_lot`,
+    only that batch/lot's serials, plus the pool's ALLOCATED ones still to draw from.
+    """
+    counters = SerialStatusCount.objects.filter(pool_id=pool_id)
+    if batch_lot is not None:
+        counters = counters.filter(Q(status='ALLOCATED') | Q(batch_lot=batch_lot))
+    totals = dict(counters.order_by().values('status').annotate(total=Sum('count')).values_list('status', 'total'))
+    return {status: totals.get(status, 0) for status in STATUSES}
+
+
+def batch_status_counts(batch):
+    """Rollup of a Batch: the serials of its pool drawn for its batch number (see status_counts)."""
+    return status_counts(batch.serial_pool_id, batch.batch_number)
+
+
+def reconcile_status_counts(pool_id):
+    """
+    Recounts a pool's serials and corrects its counters.
+    Returns the corrections applied ({(pool_id, status, batch_lot): n}, empty when in sync).
+    """
+    pool_id = SerialNumberPool._meta.pk.to_python(pool_id)
+    with transaction.atomic():
+        # Write-lock the pool's counters before counting: a transition still in
+        # flight then adds its change after the recount instead of being lost to it
+        SerialStatusCount.objects.filter(pool_id=pool_id).update(count=F('count'))
+        corrections = count_rows(SerialNumber.objects.filter(pool_id=pool_id))
+        for status, batch_lot, n in (
+            SerialStatusCount.objects.filter(pool_id=pool_id).order_by()
+            .values_list('status', 'batch_lot').annotate(n=Sum('count'))
+        ):
+            corrections[pool_id, status, batch_lot] -= n
+        corrections = {key: n for key, n in corrections.items() if n}
+        apply_counts(corrections)
+    return corrections
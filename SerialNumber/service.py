@@ -0,0 +1,145 @@
+# SerialNumber/service.py
+from datetime import timedelta
+from django.db import connection, transaction
+from django.utils import timezone
+
+from Audit.recorder import record_bulk
+from SerialNumber.models import SerialNumber
+from SerialNumber.rollup import apply_counts, transitions
+from SerialNumberPool.models import SerialNumberPool
+
+
+def _claim_sql(table, skip_locked):
+    """Single-statement claim: pick N ALLOCATED rows of the pool and flip them to PRINTED."""
+    lock = " FOR UPDATE SKIP LOCKED" if skip_locked else ""
+    return (
+        f"UPDATE {table} SET status = 'PRINTED', batch_lot = %s, expiration_date = %s, last_modified = %s, "
+        "leased_to_id = %s, lease_expires_at = %s "
+        f"WHERE id IN (SELECT id FROM {table} WHERE pool_id = %s AND status = 'ALLOCATED' ORDER BY id LIMIT %s{lock}) "
+        "RETURNING id, full_serial_number"
+    )
+
+
+def reserve_serials(pool_id, n, batch_lot=None, expiry=None, equipment=None, lease_seconds=None):
+    """
+    Atomically claims up to `n` ALLOCATED serials of a pool for a production line,
+    marking them PRINTED with the given batch/lot and expiry.
+
+    On PostgreSQL this is one UPDATE ... WHERE id IN (SELECT ... FOR UPDATE SKIP LOCKED)
+    RETURNING, so concurrent lines drawing from the same pool skip each other's rows
+    instead of queueing. SQLite (which serializes writers anyway) runs the same
+    statement without the lock clause; other backends fall back to the ORM.
+
+    With `lease_seconds`, the serials are only leased to `equipment` (see
+    SerialBuffer): they are VOIDed by void_expired_leases() unless confirmed
+    with confirm_serials(), released, or renewed before the lease ends.
+
+    Returns a list of (id, full_serial_number) tuples ordered by id; it is shorter
+    than `n` when the pool does not have enough ALLOCATED serials left. The claim
+    is audited as one 'serials.reserve' record (Audit.recorder) and counted in
+    the pool's status rollup (SerialNumber.rollup).
+    """
+    if n < 1:
+        raise ValueError("Number of serials to reserve must be at least 1.")
+    pool_id = SerialNumberPool._meta.pk.to_python(pool_id)
+    now = timezone.now()
+    leased_to_id = equipment.pk if equipment is not None else None
+    lease_expires_at = now + timedelta(seconds=lease_seconds) if lease_seconds else None
+
+    with transaction.atomic():
+        if connection.vendor == 'postgresql' or (
+            connection.vendor == 'sqlite' and connection.features.can_return_columns_from_insert
+        ):
+            db = connection.ops
+            params = [
+                batch_lot,
+                db.adapt_datefield_value(expiry),
+                db.adapt_datetimefield_value(now),
+                leased_to_id,
+                db.adapt_datetimefield_value(lease_expires_at),
+                SerialNumberPool._meta.pk.get_db_prep_value(pool_id, connection),
+                n,
+            ]
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    _claim_sql(db.quote_name(SerialNumber._meta.db_table), connection.vendor == 'postgresql'),
+                    params,
+                )
+                claimed = sorted(cursor.fetchall())
+        else:
+            rows = list(
+                SerialNumber.objects.select_for_update(skip_locked=connection.features.has_select_for_update_skip_locked)
+                .filter(pool_id=pool_id, status='ALLOCATED')
+                .order_by('id')
+                .values_list('id', 'full_serial_number')[:n]
+            )
+            SerialNumber.objects.filter(id__in=[pk for pk, _ in rows]).update(
+                status='PRINTED', batch_lot=batch_lot, expiration_date=expiry, last_modified=now,
+                leased_to_id=leased_to_id, lease_expires_at=lease_expires_at,
+            )
+            claimed = rows
+
+        if claimed:
+            record_bulk('serials.reserve', [pk for pk, _ in claimed], details={
+                'pool_id': pool_id, 'requested': n, 'batch_lot': batch_lot, 'expiry': expiry,
+                'equipment_id': leased_to_id, 'lease_seconds': lease_seconds,
+            })
+            apply_counts({(pool_id, 'ALLOCATED', None): -len(claimed), (pool_id, 'PRINTED', batch_lot): len(claimed)})
+
+    if not claimed and not SerialNumberPool.manager.filter(pool_id=pool_id).exists():
+        raise ValueError(f"Pool '{pool_id}' does not exist.")
+    return claimed
+
+
+def confirm_serials(serial_ids):
+    """Ends the lease of serials that were handed out to the line; they stay PRINTED."""
+    with transaction.atomic():
+        confirmed = SerialNumber.objects.filter(id__in=serial_ids, lease_expires_at__isnull=False).update(
+            lease_expires_at=None, last_modified=timezone.now()
+        )
+        if confirmed:
+            record_bulk('serials.confirm', serial_ids, count=confirmed)
+    return confirmed
+
+
+def renew_leases(serial_ids, lease_seconds):
+    """Pushes back the lease expiry of serials held, or handed out but not yet confirmed, by a line buffer."""
+    # Not audited: the status does not change, and buffers renew every few minutes
+    now = timezone.now()
+    return SerialNumber.objects.filter(id__in=serial_ids, lease_expires_at__isnull=False).update(
+        lease_expires_at=now + timedelta(seconds=lease_seconds), last_modified=now
+    )
+
+
+def _end_lease(queryset, operation, status):
+    with transaction.atomic():
+        rows = list(
+            queryset.select_for_update()
+            .filter(status='PRINTED', lease_expires_at__isnull=False)
+            .values_list('id', 'pool_id', 'batch_lot')
+        )
+        if not rows:
+            return 0
+        ids = [pk for pk, _, _ in rows]
+        fields = {'leased_to': None, 'lease_expires_at': None, 'last_modified': timezone.now()}
+        if status == 'ALLOCATED':
+            fields.update(batch_lot=None, expiration_date=None)
+        ended = SerialNumber.objects.filter(id__in=ids).update(status=status, **fields)
+        record_bulk(operation, ids)
+        apply_counts(transitions([(pool_id, 'PRINTED', batch_lot) for _, pool_id, batch_lot in rows], status))
+    return ended
+
+
+def release_serials(serial_ids):
+    """Returns leased, never handed-out serials to ALLOCATED."""
+    return _end_lease(SerialNumber.objects.filter(id__in=serial_ids), 'serials.release', 'ALLOCATED')
+
+
+def void_expired_leases(now=None):
+    """
+    Lease-expiry sweep for crashed or stalled line buffers: their serials are VOIDed.
+    A buffer that died may have handed some out (printed) without confirming
+    them, and nothing tells which: returning them to ALLOCATED would issue a
+    printed serial twice.
+    """
+    return _end_lease(SerialNumber.objects.filter(lease_expires_at__lt=now or timezone.now()), 'serials.lease_expiry', 'VOID')
@@ -1,3 +1,569 @@
-from django.test import TestCase
+import base64
+import datetime
+import io
+import json
+import multiprocessing
+import multiprocessing.dummy
+import queue
+import threading
+import types
+import xml.etree.ElementTree as ET
+from unittest import mock
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Permission
+from django.core.management import CommandError, call_command
+from django.db import DatabaseError, connection
+from django.test import TestCase, TransactionTestCase
+from django.urls import reverse
+from django.utils import timezone
+from Audit import spool as audit_spool
+from Audit.models import AuditRecord
+from Audit.recorder import ids_digest
+from Batch.models import Batch
+from EPCISEvent.models import EPCISEvent
+from Equipment.models import Equipment
+from Product.models import Product
+from SerialNumber.buffer import SerialBuffer
+from SerialNumber.commissioning import commission_serials
+from SerialNumber.loader import SQLITE_PRAGMAS, load_serials, serial_rows
+from SerialNumber.management.commands import bulk_create_optimized
+from SerialNumber.management.commands.bulk_create_optimized import _bulk_create_audited
+from SerialNumber.models import SerialNumber
+from SerialNumber.rollup import apply_counts, batch_status_counts, reconcile_status_counts, status_counts
+from SerialNumber.service import _claim_sql, release_serials, reserve_serials, void_expired_leases
+from SerialNumberPool.models import SerialNumberPool
+from SerialNumberPool.service import get_pool_permutation
+from utils.epcis_generator import EPCISEventsGenerator, generate_commissioning_document
 
 # Create your tests here.
+
+def _product():
+    return Product.objects.create(
+        name="Tablets", description="", code="TAB-1", primary_gtin="00312345678906",
+        manufactured_at=datetime.date(2026, 1, 1), shelf_life_days=730, unit="d",
+    )
+
+
+def _line():
+    return Equipment.objects.create(
+        name="Line 1", model_number="M-1", serial_number="E-1", manufacturer="Acme",
+        mac_address="00:00:00:00:00:01", ip_address="10.0.0.1", plant_name="Plant", plant_gln="0312345000001",
+        location="Hall A",
+    )
+
+
+class CommissioningDocumentQueryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        product = _product()
+        cls.small_pool = SerialNumberPool.manager.create(total_to_generate=10)
+        cls.large_pool = SerialNumberPool.manager.create(total_to_generate=100_000)
+        for number, pool in (("B-SMALL", cls.small_pool), ("B-LARGE", cls.large_pool)):
+            Batch.objects.create(
+                batch_number=number, product=product, manufactured_at=datetime.date(2026, 1, 1),
+                expiry_date=datetime.date(2028, 1, 1), quantity=pool.total_to_generate,
+                sampled_quantity=0, order_number="PO-1", serial_pool=pool,
+            )
+
+        for pool, count in ((cls.small_pool, 10), (cls.large_pool, 100_000)):
+            SerialNumber.objects.bulk_create(
+                [
+                    SerialNumber(
+                        full_serial_number=f"{pool.pool_id.hex[:8]}{i:08d}", pool=pool, status='PRINTED',
+                        batch_lot="LOT-1", expiration_date=datetime.date(2028, 1, 1),
+                    )
+                    for i in range(count)
+                ],
+                batch_size=5000,
+            )
+
+    def test_query_count_does_not_grow_with_batch_size(self):
+        generator = EPCISEventsGenerator()
+
+        with self.assertNumQueries(4):
+            small = generator.generate_epcis_commissioning(SerialNumber.objects.filter(pool=self.small_pool))
+        with self.assertNumQueries(4):
+            large = generator.generate_epcis_commissioning(SerialNumber.objects.filter(pool=self.large_pool))
+
+        self.assertEqual(small.count("<epcis:epc>"), 10)
+        self.assertEqual(large.count("<epcis:epc>"), 100_000)
+        # GTIN 00312345678906 with the default 7-digit company prefix: 0312345 / indicator 0 + 67890
+        self.assertIn(f"urn:epc:id:sgtin:0312345.067890.{self.large_pool.pool_id.hex[:8]}00000000<", large)
+
+
+class SerialStatusRollupTests(TestCase):
+    """The status counters follow every bulk transition and match a recount."""
+
+    @classmethod
+    def setUpTestData(cls):
+        product = _product()
+        cls.pool = SerialNumberPool.manager.create(total_to_generate=100)
+        cls.batch = Batch.objects.create(
+            batch_number="LOT-1", product=product, manufactured_at=datetime.date(2026, 1, 1),
+            expiry_date=datetime.date(2028, 1, 1), quantity=100, sampled_quantity=0, order_number="PO-1",
+            serial_pool=cls.pool,
+        )
+        SerialNumber.objects.bulk_create(
+            [SerialNumber(full_serial_number=f"RS{i:08d}", pool=cls.pool) for i in range(100)]
+        )
+        apply_counts({(cls.pool.pool_id, 'ALLOCATED', None): 100})
+
+    def test_counters_follow_transitions(self):
+        leased = reserve_serials(self.pool.pool_id, 30, "LOT-1", lease_seconds=60)
+        reserve_serials(self.pool.pool_id, 20, "LOT-2")
+        release_serials([pk for pk, _ in leased[:10]])
+        allocated = SerialNumber.objects.filter(pool=self.pool, status='ALLOCATED').values_list('id', flat=True)[:5]
+        commission_serials(list(allocated) + [pk for pk, _ in leased[10:15]])
+
+        # Commissioned ALLOCATED serials carry no batch/lot: they count for the pool only
+        expected = {'ALLOCATED': 55, 'PRINTED': 20, 'CONSUMED': 0, 'VOID': 0}
+        with self.assertNumQueries(1):
+            self.assertEqual(batch_status_counts(self.batch), expected)
+        self.assertEqual(status_counts(self.pool.pool_id)['PRINTED'], 45)
+        self.assertEqual(reconcile_status_counts(self.pool.pool_id), {})
+
+    def test_reconcile_corrects_drift(self):
+        reserve_serials(self.pool.pool_id, 10, "LOT-1")
+        # Behind the rollup's back
+        SerialNumber.objects.filter(pool=self.pool, status='PRINTED').update(status='CONSUMED')
+
+        corrections = reconcile_status_counts(self.pool.pool_id)
+
+        self.assertEqual(corrections, {
+            (self.pool.pool_id, 'PRINTED', "LOT-1"): -10, (self.pool.pool_id, 'CONSUMED', "LOT-1"): 10,
+        })
+        self.assertEqual(batch_status_counts(self.batch), {'ALLOCATED': 90, 'PRINTED': 0, 'CONSUMED': 10, 'VOID': 0})
+        self.assertEqual(reconcile_status_counts(self.pool.pool_id), {})
+
+
+    def test_rollup_views_require_an_authorized_user(self):
+        reserve_serials(self.pool.pool_id, 10, "LOT-1")
+        pool_url = reverse('serial:pool_status', args=[self.pool.pool_id])
+        batch_url = reverse('serial:batch_status', args=[self.batch.pk])
+
+        response = self.client.get(pool_url)
+        self.assertEqual(response.status_code, 401)
+        self.assertIn('Basic', response['WWW-Authenticate'])
+        viewer = get_user_model().objects.create_user('viewer', password='secret')
+        self.client.force_login(viewer)
+        self.assertEqual(self.client.get(batch_url).status_code, 403)
+
+        viewer.user_permissions.add(Permission.objects.get(codename='view_serialnumber'))
+        response = self.client.get(pool_url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['counts'], {'ALLOCATED': 90, 'PRINTED': 10, 'CONSUMED': 0, 'VOID': 0})
+        self.assertEqual(self.client.get(batch_url).json()['total'], 100)
+
+class SerialBufferLeaseTests(TestCase):
+    """A serial a line may have printed is never returned to ALLOCATED by the lease sweep."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.pool = SerialNumberPool.manager.create(total_to_generate=20)
+        cls.line = _line()
+        SerialNumber.objects.bulk_create(
+            [SerialNumber(full_serial_number=f"BL{i:08d}", pool=cls.pool) for i in range(20)]
+        )
+        apply_counts({(cls.pool.pool_id, 'ALLOCATED', None): 20})
+
+    def setUp(self):
+        # Driven by hand instead of by its thread
+        self.buffer = SerialBuffer(self.line, self.pool, "LOT-1", capacity=10, low_water=2, lease_seconds=60)
+        self.buffer._refill()
+
+    def test_crash_with_unconfirmed_hand_outs_voids_the_block(self):
+        handed_out = self.buffer.take(4)
+        # The process dies here: nothing confirmed, nothing released
+
+        voided = void_expired_leases(now=timezone.now() + datetime.timedelta(seconds=61))
+
+        self.assertEqual(voided, 10)
+        self.assertEqual(
+            set(SerialNumber.objects.filter(full_serial_number__in=handed_out).values_list('status', flat=True)), {'VOID'}
+        )
+        reissued = reserve_serials(self.pool.pool_id, 20, "LOT-2")
+        self.assertEqual(len(reissued), 10)
+        self.assertFalse(set(handed_out) & {sn for _, sn in reissued})
+        self.assertEqual(reconcile_status_counts(self.pool.pool_id), {})
+
+    def test_renewal_covers_hand_outs_whose_confirmation_failed(self):
+        handed_out = self.buffer.take(3)
+        with mock.patch('SerialNumber.buffer.confirm_serials', side_effect=DatabaseError("connection lost")):
+            with self.assertRaises(DatabaseError):
+                self.buffer._flush_handed_out()
+
+        later = timezone.now() + datetime.timedelta(seconds=50)
+        with mock.patch('SerialNumber.service.timezone.now', return_value=later):
+            self.buffer._renew()
+        self.assertEqual(void_expired_leases(now=later + datetime.timedelta(seconds=20)), 0)
+
+        self.buffer._flush_handed_out()
+        self.assertEqual(
+            set(SerialNumber.objects.filter(full_serial_number__in=handed_out).values_list('status', 'lease_expires_at')),
+            {('PRINTED', None)},
+        )
+
+    def test_stop_returns_only_unused_serials(self):
+        handed_out = self.buffer.take(4)
+        self.buffer._stopping.set()
+        # _run closes its (feeder thread's) connection when it ends; here that is the test's
+        with mock.patch('SerialNumber.buffer.connection.close') as close:
+            self.buffer._run()
+        close.assert_called_once_with()
+
+        self.assertEqual(SerialNumber.objects.filter(pool=self.pool, status='ALLOCATED').count(), 16)
+        self.assertEqual(SerialNumber.objects.filter(full_serial_number__in=handed_out, status='PRINTED').count(), 4)
+
+
+class BulkGenerationAuditTests(TestCase):
+    """Generation audits and counts exactly the rows its own INSERT created."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.pool = SerialNumberPool.manager.create(total_to_generate=100)
+        cls.other_pool = SerialNumberPool.manager.create(total_to_generate=100)
+        SerialNumber.objects.bulk_create(
+            [SerialNumber(full_serial_number=f"BG{i:08d}", pool=cls.other_pool) for i in range(5)]
+        )
+
+    def _generated(self):
+        audit_spool.drain_spool()
+        return AuditRecord.objects.get(operation='serials.generate')
+
+    def test_bulk_create_skips_duplicates_and_audits_the_inserted_ids(self):
+        serials = [f"BG{i:08d}" for i in range(3, 10)]  # BG00000003-4 exist in another pool
+
+        inserted = _bulk_create_audited(self.pool, serials, ignore_conflicts=True)
+
+        ids = sorted(SerialNumber.objects.filter(pool=self.pool).values_list('id', flat=True))
+        self.assertEqual(inserted, 5)
+        record = self._generated()
+        self.assertEqual((record.count, record.first_id, record.last_id), (5, ids[0], ids[-1]))
+        self.assertEqual(record.ids_digest, ids_digest(ids))
+        self.assertEqual(record.details['offered'], 7)
+        self.assertEqual(status_counts(self.pool.pool_id)['ALLOCATED'], 5)
+        self.assertEqual(reconcile_status_counts(self.other_pool.pool_id), {
+            (self.other_pool.pool_id, 'ALLOCATED', ''): 5,  # inserted behind the rollup in setUpTestData
+        })
+
+    def test_native_load_counts_only_its_own_rows_and_skips_duplicates(self):
+        rows = list(serial_rows(self.pool, [f"BG{i:08d}" for i in range(3, 10)]))
+        rows += list(serial_rows(self.other_pool, ["BX00000001"], status='VOID'))
+
+        result = load_serials(rows, chunk_size=3)
+
+        self.assertEqual((result.offered, result.inserted), (8, 6))
+        record = self._generated()
+        ids = SerialNumber.objects.filter(full_serial_number__in=[row[0] for row in rows], id__gt=5).values_list('id', flat=True)
+        self.assertEqual((record.count, record.first_id, record.last_id), (6, min(ids), max(ids)))
+        self.assertEqual(status_counts(self.pool.pool_id)['ALLOCATED'], 5)
+        self.assertEqual(status_counts(self.other_pool.pool_id)['VOID'], 1)
+
+
+class BulkCreateCommandLengthTests(TestCase):
+    """A PERMUTED pool keeps its serial_length; a conflicting --length is refused, not ignored."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.pool = SerialNumberPool.manager.create(total_to_generate=20, allocation_mode='PERMUTED', serial_length=6)
+
+    def _run(self, *args):
+        call_command('bulk_create_optimized', '--pool_id', str(self.pool.pool_id), '--quantity', '20', *args,
+                     stdout=io.StringIO())
+
+    def test_conflicting_length_is_rejected_before_reserving(self):
+        with self.assertRaisesMessage(CommandError, "serial_length 6"):
+            self._run('--length', '8')
+
+        self.pool.refresh_from_db()
+        self.assertEqual((self.pool.generated_count, self.pool.next_counter), (0, 0))
+
+    def test_pool_length_is_used(self):
+        self._run()
+        self._run('--length', '6')
+
+        serials = set(SerialNumber.objects.filter(pool=self.pool).values_list('full_serial_number', flat=True))
+        self.assertEqual(len(serials), 40)
+        self.assertEqual({len(serial) for serial in serials}, {6})
+
+
+class BulkCreateTopUpTests(TestCase):
+    """Serials dropped as duplicates are topped up until the pool holds the requested quantity."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.pool = SerialNumberPool.manager.create(total_to_generate=10)
+        cls.other_pool = SerialNumberPool.manager.create(total_to_generate=3)
+        SerialNumber.objects.bulk_create(
+            [SerialNumber(full_serial_number=f"TU{i:08d}", pool=cls.other_pool) for i in range(3)]
+        )
+
+    def test_duplicates_are_topped_up(self):
+        # First round: 3 serials already taken by another pool; the top-up round draws fresh ones
+        rounds = iter([
+            [f"TU{i:08d}" for i in range(10)],
+            [f"TU{i:08d}" for i in range(10, 13)],
+        ])
+        out = io.StringIO()
+        with mock.patch('SerialNumber.management.commands.bulk_create_optimized.generate_serials',
+                        side_effect=lambda n, length: iter(next(rounds))):
+            call_command('bulk_create_optimized', '--pool_id', str(self.pool.pool_id), '--quantity', '10', stdout=out)
+
+        self.assertIn("Topping up 3 serials", out.getvalue())
+        self.assertEqual(SerialNumber.objects.filter(pool=self.pool).count(), 10)
+        self.pool.refresh_from_db()
+        # Both rounds reserved their full quantity; reconciliation brings the counter back to the rows
+        self.assertEqual((self.pool.generated_count, self.pool.status), (10, 'EXHAUSTED'))
+        self.assertEqual(reconcile_status_counts(self.pool.pool_id), {})
+
+
+class SerialLoaderConnectionTests(TransactionTestCase):
+    """The loader's SQLite pragmas do not outlive the load on Django's shared connection."""
+
+    def setUp(self):
+        self.pool = SerialNumberPool.manager.create(total_to_generate=10)
+
+    def _pragmas(self):
+        with connection.cursor() as cursor:
+            values = {}
+            for name, _ in SQLITE_PRAGMAS:
+                cursor.execute(f"PRAGMA {name}")
+                values[name] = cursor.fetchone()[0]
+            return values
+
+    def test_pragmas_are_restored_after_the_load(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest("SQLite pragmas")
+        before = self._pragmas()
+
+        self.assertEqual(load_serials(serial_rows(self.pool, [f"LP{i:08d}" for i in range(10)])).inserted, 10)
+        self.assertEqual(self._pragmas(), before)
+
+        with mock.patch('SerialNumber.loader.record_bulk', side_effect=DatabaseError("failed")):
+            with self.assertRaises(DatabaseError):
+                load_serials(serial_rows(self.pool, ["LP00000099"]))
+        self.assertEqual(self._pragmas(), before)
+        self.assertFalse(SerialNumber.objects.filter(full_serial_number="LP00000099").exists())
+
+
+class BulkCreateWorkersTests(TransactionTestCase):
+    """--workers splits a PERMUTED reservation into disjoint leases that together fill it exactly once."""
+
+    def setUp(self):
+        self.pool = SerialNumberPool.manager.create(total_to_generate=45, allocation_mode='PERMUTED', serial_length=6)
+        patcher = mock.patch.object(bulk_create_optimized, 'BATCH_SIZE', 10)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            # Child processes cannot open the in-memory test database; run the workers
+            # as threads of this process, which share it (same coordinator, queue protocol and leases).
+            # Its shared cache fails concurrent writers at once instead of waiting: one worker inserts at a time
+            threads = types.SimpleNamespace(Process=multiprocessing.dummy.Process, Queue=queue.Queue)
+            lock = threading.Lock()
+            worker = bulk_create_optimized._bulk_insert_worker
+
+            def serialized(*args):
+                with lock:
+                    worker(*args)
+
+            for patcher in (
+                mock.patch.object(multiprocessing, 'get_context', return_value=threads),
+                mock.patch.object(bulk_create_optimized, '_bulk_insert_worker', serialized),
+            ):
+                patcher.start()
+                self.addCleanup(patcher.stop)
+        elif multiprocessing.get_start_method() != 'fork':
+            # Spawned workers would set Django up afresh, against the real database
+            self.skipTest("Worker processes only share the test database when forked")
+
+    def _run(self):
+        out = io.StringIO()
+        call_command('bulk_create_optimized', '--pool_id', str(self.pool.pool_id), '--quantity', '45',
+                     '--workers', '2', stdout=out)
+        self.pool.refresh_from_db()
+        return out.getvalue()
+
+    def test_workers_fill_the_reservation(self):
+        out = self._run()
+
+        serials = list(SerialNumber.objects.filter(pool=self.pool).values_list('full_serial_number', flat=True))
+        self.assertIn("Starting 2 workers for 45 serials", out)
+        self.assertIn("(worker 1: 10)", out)
+        self.assertEqual(len(serials), 45)
+        self.assertEqual(len(set(serials)), 45)
+        # The two leases are the counters 0-22 and 23-44 of one keyed permutation
+        permutation = get_pool_permutation(self.pool)
+        self.assertEqual(sorted(permutation.counter(serial) for serial in serials), list(range(45)))
+        self.assertEqual((self.pool.generated_count, self.pool.next_counter, self.pool.status), (45, 45, 'EXHAUSTED'))
+
+    def test_dead_worker_is_topped_up(self):
+        worker = bulk_create_optimized._bulk_insert_worker
+
+        def second_dies_silently(worker_index, *args):
+            if worker_index == 0:
+                worker(worker_index, *args)
+
+        with mock.patch.object(bulk_create_optimized, '_bulk_insert_worker', second_dies_silently):
+            out = self._run()
+
+        self.assertIn("Workers exited without reporting completion.", out)
+        self.assertIn("Topping up 22 serials", out)
+        serials = list(SerialNumber.objects.filter(pool=self.pool).values_list('full_serial_number', flat=True))
+        self.assertEqual(len(set(serials)), 45)
+        # Counters of lost leases are never reused: 45 + 22 + 11 + 5 + 2 + 1 reserved over the rounds
+        self.assertEqual((self.pool.generated_count, self.pool.next_counter), (45, 86))
+
+
+class CommissioningIdempotencyTests(TestCase):
+    """A serial is commissioned by one event only, however the runs covering it are chunked."""
+
+    @classmethod
+    def setUpTestData(cls):
+        product = _product()
+        cls.pool = SerialNumberPool.manager.create(total_to_generate=10)
+        Batch.objects.create(
+            batch_number="LOT-1", product=product, manufactured_at=datetime.date(2026, 1, 1),
+            expiry_date=datetime.date(2028, 1, 1), quantity=10, sampled_quantity=0, order_number="PO-1",
+            serial_pool=cls.pool,
+        )
+        SerialNumber.objects.bulk_create(
+            [SerialNumber(full_serial_number=f"CI{i:08d}", pool=cls.pool) for i in range(10)]
+        )
+        apply_counts({(cls.pool.pool_id, 'ALLOCATED', None): 10})
+        cls.ids = list(SerialNumber.objects.filter(pool=cls.pool).order_by('id').values_list('id', flat=True))
+
+    def _commissioned_epcs(self):
+        epcs = []
+        for epc_list in EPCISEvent.objects.filter(biz_step='commissioning').values_list('epc_list', flat=True):
+            epcs.extend(epc_list.split(','))
+        return epcs
+
+    def test_rechunked_retry_commissions_nothing_twice(self):
+        first = commission_serials(self.ids[:6], chunk_size=4)
+        retry = commission_serials(self.ids[:6], chunk_size=5)
+
+        self.assertEqual((first.commissioned, retry.commissioned, retry.skipped), (6, 0, 6))
+        self.assertEqual(retry.event_ids, first.event_ids)
+        self.assertEqual(len(self._commissioned_epcs()), 6)
+
+    def test_overlapping_run_only_commissions_the_new_serials(self):
+        first = commission_serials(self.ids[:6], chunk_size=4)
+        overlap = commission_serials(self.ids[4:], chunk_size=3)
+
+        self.assertEqual((overlap.commissioned, overlap.skipped), (4, 2))
+        epcs = self._commissioned_epcs()
+        self.assertEqual(len(epcs), 10)
+        self.assertEqual(len(set(epcs)), 10)
+        # The overlapping run's document still covers its first two serials, through the first run's event
+        self.assertIn(first.event_ids[1], overlap.event_ids)
+        self.assertEqual(reconcile_status_counts(self.pool.pool_id), {})
+
+
+    def test_document_carries_the_stored_events_with_lot_and_expiry(self):
+        reserve_serials(self.pool.pool_id, 10, "LOT-1", datetime.date(2028, 1, 1))
+        earlier = commission_serials(self.ids[:4], chunk_size=2)
+
+        document = ET.fromstring(generate_commissioning_document(self.ids))
+
+        ns = {'epcis': "urn:epcglobal:epcis:xsd:2", 'ext': "http://yourcompany.com/epcis/ext"}
+        events = document.findall('.//epcis:ObjectEvent', ns)
+        stored = {f"urn:uuid:{event_id}" for event_id in EPCISEvent.objects.values_list('event_id', flat=True)}
+        self.assertEqual(len(events), 3)
+        self.assertEqual({event.findtext('epcis:eventID', namespaces=ns) for event in events}, stored)
+        self.assertIn(f"urn:uuid:{earlier.event_ids[0]}", stored)
+        self.assertEqual(sum(len(event.findall('epcis:epcList/epcis:epc', ns)) for event in events), 10)
+        for event in events:
+            self.assertEqual(event.findtext('epcis:ilmd/ext:extension/ext:lotNumber', namespaces=ns), "LOT-1")
+            self.assertEqual(event.findtext('epcis:ilmd/ext:extension/ext:expirationDate', namespaces=ns), "2028-01-01")
+            # The facility default, never an empty location
+            self.assertEqual(event.findtext('epcis:bizLocation/epcis:id', namespaces=ns), "urn:epc:id:sgln:0000000.00000.0")
+            self.assertEqual(event.findtext('epcis:readPoint/epcis:id', namespaces=ns), "urn:epc:id:sgln:0000000.00000.0")
+
+class SerialReserveTests(TestCase):
+    """Reserving claims each ALLOCATED serial once, for authenticated lines only."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.pool = SerialNumberPool.manager.create(total_to_generate=10)
+        cls.line = _line()
+        SerialNumber.objects.bulk_create(
+            [SerialNumber(full_serial_number=f"SR{i:08d}", pool=cls.pool) for i in range(10)]
+        )
+        apply_counts({(cls.pool.pool_id, 'ALLOCATED', None): 10})
+        cls.user = get_user_model().objects.create_user('line-1', password='secret')
+        cls.user.user_permissions.add(Permission.objects.get(codename='change_serialnumber'))
+
+    def _post(self, payload, username=None, password='secret'):
+        headers = {}
+        if username:
+            credentials = base64.b64encode(f"{username}:{password}".encode()).decode()
+            headers['HTTP_AUTHORIZATION'] = f"Basic {credentials}"
+        return self.client.post(
+            reverse('serial:serial_reserve'), json.dumps(payload), content_type='application/json', **headers,
+        )
+
+    def test_claims_skip_rows_already_claimed(self):
+        first = reserve_serials(self.pool.pool_id, 4, "LOT-1", datetime.date(2028, 1, 1))
+        second = reserve_serials(self.pool.pool_id, 4, "LOT-2")
+
+        self.assertEqual([sn for _, sn in first], [f"SR{i:08d}" for i in range(4)])
+        self.assertEqual([sn for _, sn in second], [f"SR{i:08d}" for i in range(4, 8)])
+        self.assertEqual(
+            set(SerialNumber.objects.filter(id__in=[pk for pk, _ in first]).values_list('status', 'batch_lot')),
+            {('PRINTED', "LOT-1")},
+        )
+        self.assertEqual(reconcile_status_counts(self.pool.pool_id), {})
+
+    def test_postgresql_claim_skips_locked_rows(self):
+        sql = _claim_sql('"SerialNumber_serialnumber"', True)
+        # The lock belongs to the row-picking subquery, so concurrent claims pass over each other's rows
+        self.assertRegex(sql, r"WHERE id IN \(SELECT id .* LIMIT %s FOR UPDATE SKIP LOCKED\)")
+        self.assertNotIn("SKIP LOCKED", _claim_sql('"SerialNumber_serialnumber"', False))
+
+    def test_orm_fallback_claims_the_same_rows(self):
+        with mock.patch.object(connection, 'vendor', 'other'):
+            claimed = reserve_serials(self.pool.pool_id, 3, "LOT-1")
+
+        self.assertEqual([sn for _, sn in claimed], [f"SR{i:08d}" for i in range(3)])
+        self.assertEqual(SerialNumber.objects.filter(pool=self.pool, status='PRINTED').count(), 3)
+
+    def test_short_pool_returns_what_is_left(self):
+        reserve_serials(self.pool.pool_id, 7, "LOT-1")
+
+        self.assertEqual(len(reserve_serials(self.pool.pool_id, 5, "LOT-1")), 3)
+        self.assertEqual(reserve_serials(self.pool.pool_id, 5, "LOT-1"), [])
+
+    def test_expired_lease_is_voided(self):
+        leased = reserve_serials(self.pool.pool_id, 5, "LOT-1", equipment=self.line, lease_seconds=60)
+        expires_at = timezone.now() + datetime.timedelta(seconds=61)
+
+        self.assertEqual(void_expired_leases(now=expires_at - datetime.timedelta(seconds=30)), 0)
+        self.assertEqual(void_expired_leases(now=expires_at), 5)
+        self.assertEqual(
+            set(SerialNumber.objects.filter(id__in=[pk for pk, _ in leased]).values_list('status', 'batch_lot')),
+            {('VOID', "LOT-1")},
+        )
+        self.assertEqual(len(reserve_serials(self.pool.pool_id, 10, "LOT-2")), 5)
+        self.assertEqual(reconcile_status_counts(self.pool.pool_id), {})
+
+    def test_view_requires_credentials_and_permission(self):
+        payload = {'pool_id': str(self.pool.pool_id), 'quantity': 2, 'batch_lot': "LOT-1"}
+        get_user_model().objects.create_user('viewer', password='secret')
+
+        response = self._post(payload)
+        self.assertEqual(response.status_code, 401)
+        self.assertIn('Basic', response['WWW-Authenticate'])
+        self.assertEqual(self._post(payload, 'line-1', 'wrong').status_code, 401)
+        self.assertEqual(self._post(payload, 'viewer').status_code, 403)
+        self.assertFalse(SerialNumber.objects.filter(pool=self.pool).exclude(status='ALLOCATED').exists())
+
+    def test_view_reserves_and_reports_a_short_pool(self):
+        payload = {'pool_id': str(self.pool.pool_id), 'quantity': 8, 'batch_lot': "LOT-1"}
+
+        response = self._post(payload, 'line-1')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['count'], 8)
+
+        response = self._post(payload, 'line-1')
+        self.assertEqual((response.status_code, response.json()['count']), (200, 2))
+        self.assertEqual(self._post(payload, 'line-1').status_code, 409)
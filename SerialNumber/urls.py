@@ -0,0 +1,10 @@
+from django.urls import path
+from SerialNumber.views import *
+
+app_name = "serial"
+
+urlpatterns = [
+    path('reserve/', SerialReserve.as_view(), name='serial_reserve'),
+    path('pools/<uuid:pool_id>/status/', SerialStatusRollup.as_view(), name='pool_status'),
+    path('batches/<int:pk>/status/', SerialStatusRollup.as_view(), name='batch_status'),
+]
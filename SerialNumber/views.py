@@ -1,3 +1,74 @@
-from django.shortcuts import render
+import json
+from django.core.exceptions import ValidationError
+from django.http import JsonResponse
+from django.shortcuts import get_object_or_404
+from django.utils.dateparse import parse_date
+from django.utils.decorators import method_decorator
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from Audit.recorder import audit_reason
+from Batch.models import Batch
+from SerialNumber.rollup import status_counts
+from SerialNumber.service import reserve_serials
+from SerialNumberPool.models import SerialNumberPool
+from utils.api_auth import ApiAuthMixin
 
 # Create your views here.
+
+@method_decorator(csrf_exempt, name='dispatch')
+class SerialReserve(ApiAuthMixin, View):
+    """
+    POST {"pool_id": ..., "quantity": N, "batch_lot": ..., "expiration_date": "YYYY-MM-DD", "reason": ...}
+    Claims N ALLOCATED serials of the pool for a production line (status -> PRINTED).
+    The optional reason goes into the claim's audit record. Lines authenticate
+    with HTTP Basic (see utils.api_auth) and need the change_serialnumber permission.
+    """
+    http_method_names = ['post']
+    permission_required = 'SerialNumber.change_serialnumber'
+
+    def post(self, request, *args, **kwargs):
+        try:
+            payload = json.loads(request.body)
+            quantity = int(payload.get('quantity', 0))
+            expiry = payload.get('expiration_date')
+            expiry = parse_date(expiry) if expiry else None
+            with audit_reason(payload.get('reason')):
+                claimed = reserve_serials(payload['pool_id'], quantity, payload.get('batch_lot'), expiry)
+        except (KeyError, TypeError, ValueError, ValidationError) as e:
+            return JsonResponse({'error': str(e)}, status=400)
+
+        return JsonResponse({
+            'pool_id': payload['pool_id'],
+            'requested': quantity,
+            'count': len(claimed),
+            'serials': [sn_str for _, sn_str in claimed],
+        }, status=200 if claimed else 409)
+
+
+class SerialStatusRollup(ApiAuthMixin, View):
+    """
+    GET pools/<pool_id>/status/[?batch_lot=...] or batches/<pk>/status/
+    Serial counts per status from the rollup counters (SerialNumber.rollup),
+    without counting SerialNumber rows. A batch's rollup is its pool's serials
+    drawn for its batch number, plus the pool's ALLOCATED ones.
+    Needs the view_serialnumber permission (see utils.api_auth).
+    """
+    http_method_names = ['get']
+    permission_required = 'SerialNumber.view_serialnumber'
+
+    def get(self, request, *args, **kwargs):
+        if 'pk' in kwargs:
+            batch = get_object_or_404(Batch.objects.only('batch_number', 'serial_pool_id'), pk=kwargs['pk'])
+            pool_id, batch_lot = batch.serial_pool_id, batch.batch_number
+        else:
+            pool_id, batch_lot = kwargs['pool_id'], request.GET.get('batch_lot')
+            if not SerialNumberPool.manager.filter(pool_id=pool_id).exists():
+                return JsonResponse({'error': f"Pool '{pool_id}' does not exist."}, status=404)
+
+        counts = status_counts(pool_id, batch_lot)
+        return JsonResponse({
+            'pool_id': pool_id,
+            'batch_lot': batch_lot,
+            'counts': counts,
+            'total': sum(counts.values()),
+        })
@@ -0,0 +1,33 @@
+# SerialNumberPool/management/commands/reconcile_pool.py
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from SerialNumberPool.service import reconcile_pool, pools_needing_reconciliation
+
+class Command(BaseCommand):
+    help = 'Recounts SerialNumber rows per pool and corrects generated_count and status.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pool_id', type=str, help='Reconcile a single pool (default: every pool that is out of sync).')
+
+    def handle(self, *args, **options):
+        if options['pool_id']:
+            pool_ids = [options['pool_id']]
+        else:
+            # Materialize first: reconciling while iterating the aggregate would hold the cursor open
+            pool_ids = list(pools_needing_reconciliation())
+            self.stdout.write(f"{len(pool_ids):,} pool(s) out of sync.")
+
+        for pool_id in pool_ids:
+            try:
+                pool, previous = reconcile_pool(pool_id)
+            except (ValueError, ValidationError) as e:
+                raise CommandError(str(e))
+
+            if previous != pool.generated_count:
+                self.stdout.write(self.style.WARNING(
+                    f"Pool {pool.pool_id}: generated_count {previous:,} -> {pool.generated_count:,} (status {pool.status})."
+                ))
+            else:
+                self.stdout.write(f"Pool {pool.pool_id}: {pool.generated_count:,} serials, status {pool.status}.")
+
+        self.stdout.write(self.style.SUCCESS("Reconciliation finished."))
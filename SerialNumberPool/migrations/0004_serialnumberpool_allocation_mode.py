@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('SerialNumberPool', '0003_alter_serialnumberpool_managers_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='serialnumberpool',
+            name='allocation_mode',
+            field=models.CharField(choices=[('RANDOM', 'Random (duplicates dropped on insert)'), ('PERMUTED', 'Keyed permutation of a counter (collision-free)')], default='RANDOM', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='serialnumberpool',
+            name='next_counter',
+            field=models.BigIntegerField(default=0, help_text='Next unused counter value in PERMUTED mode.'),
+        ),
+        migrations.AddField(
+            model_name='serialnumberpool',
+            name='permutation_key',
+            field=models.CharField(blank=True, editable=False, help_text='Secret key (hex) for PERMUTED mode.', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='serialnumberpool',
+            name='serial_length',
+            field=models.PositiveSmallIntegerField(default=12, help_text='Length of generated S/Ns.'),
+        ),
+    ]
@@ -17,6 +17,11 @@ POOL_STATUS_CHOICES = [
     ('VOID', 'Void/Canceled')
 ]
 
+ALLOCATION_MODE_CHOICES = [
+    ('RANDOM', 'Random (duplicates dropped on insert)'),
+    ('PERMUTED', 'Keyed permutation of a counter (collision-free)'),
+]
+
 class SerialNumberPoolManager(models.Manager):
     def create_pool_for_product(self, total_count, user=None):
         """
@@ -37,6 +42,12 @@ class SerialNumberPool(models.Model):
     generated_count = models.IntegerField(default=0, help_text="Count of S/Ns created.")
     
     status = models.CharField(max_length=10, choices=POOL_STATUS_CHOICES, default='NEW', db_index=True)
+
+    # Serial allocation
+    allocation_mode = models.CharField(max_length=10, choices=ALLOCATION_MODE_CHOICES, default='RANDOM')
+    serial_length = models.PositiveSmallIntegerField(default=12, help_text="Length of generated S/Ns.")
+    permutation_key = models.CharField(max_length=64, blank=True, editable=False, help_text="Secret key (hex) for PERMUTED mode.")
+    next_counter = models.BigIntegerField(default=0, help_text="Next unused counter value in PERMUTED mode.")
     generated_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -0,0 +1,89 @@
+# SerialNumberPool/permutation.py
+from hashlib import blake2b
+
+FEISTEL_ROUNDS = 10  # Must stay even, see encrypt()
+
+
+class SerialPermutation:
+    """
+    Keyed format-preserving permutation over the alphabet**length serial space.
+
+    Follows the FF1 structure: the counter is split into two halves of u and v
+    digits and run through an alternating Feistel network whose round function
+    is keyed BLAKE2b. Every counter maps to exactly one serial of the same
+    alphabet and length, so consecutive counters give unique, non-sequential
+    serials without any duplicate checks.
+    """
+
+    def __init__(self, key, length, alphabet):
+        if length < 2:
+            raise ValueError("Permuted serials need a length of at least 2.")
+        if isinstance(key, str):
+            key = bytes.fromhex(key)
+
+        self.alphabet = alphabet
+        self.length = length
+        self.radix = len(alphabet)
+        self.u = length // 2
+        self.v = length - self.u
+        self.mod_u = self.radix ** self.u
+        self.mod_v = self.radix ** self.v
+        self.keyspace = self.mod_u * self.mod_v
+        self._index = {symbol: i for i, symbol in enumerate(alphabet)}
+        # Bytes per half fed to (and read from) the round function; never below 8, so
+        # existing pools (halves of up to 64 bits) keep the serials they were issued
+        self._width = max(8, (max(self.mod_u, self.mod_v).bit_length() + 7) // 8)
+
+        # One pre-keyed hasher per round; copy() is much cheaper than re-keying
+        self._rounds = []
+        for i in range(FEISTEL_ROUNDS):
+            h = blake2b(key=key, digest_size=min(self._width, blake2b.MAX_DIGEST_SIZE))
+            h.update(bytes([i, self.radix, length]))
+            self._rounds.append(h)
+
+    def _round(self, i, value):
+        h = self._rounds[i].copy()
+        h.update(value.to_bytes(self._width, 'big'))
+        return int.from_bytes(h.digest(), 'big')
+
+    def _digits(self, value, width):
+        alphabet, radix = self.alphabet, self.radix
+        out = []
+        for _ in range(width):
+            value, d = divmod(value, radix)
+            out.append(alphabet[d])
+        return ''.join(reversed(out))
+
+    def encrypt(self, counter):
+        """Maps a counter in [0, keyspace) to its permuted integer."""
+        if not 0 <= counter < self.keyspace:
+            raise ValueError(f"Counter {counter} is outside the keyspace.")
+        a, b = divmod(counter, self.mod_v)
+        for i in range(FEISTEL_ROUNDS):
+            modulus = self.mod_u if i % 2 == 0 else self.mod_v
+            a, b = b, (a + self._round(i, b)) % modulus
+        # An even number of rounds leaves the u-digit half back on the left
+        return a * self.mod_v + b
+
+    def decrypt(self, value):
+        """Inverse of encrypt()."""
+        a, b = divmod(value, self.mod_v)
+        for i in reversed(range(FEISTEL_ROUNDS)):
+            modulus = self.mod_u if i % 2 == 0 else self.mod_v
+            a, b = (b - self._round(i, a)) % modulus, a
+        return a * self.mod_v + b
+
+    def serial(self, counter):
+        return self._digits(self.encrypt(counter), self.length)
+
+    def counter(self, serial):
+        value = 0
+        for symbol in serial:
+            value = value * self.radix + self._index[symbol]
+        return self.decrypt(value)
+
+    def serials(self, counters):
+        """Yields the serial for every counter in the given range/iterable."""
+        serial = self.serial
+        for counter in counters:
+            yield serial(counter)
@@ -1,23 +1,139 @@
 # SerialNumberPool/services.py (Simplified for Bulk)
-import string
+import os
 import secrets
+import string
 from django.db import transaction
+from django.db.models import Count
 
 from SerialNumberPool.models import SerialNumberPool
+from SerialNumberPool.permutation import SerialPermutation
+
+ALPHANUMERIC = string.ascii_uppercase + string.digits
+
+# Number of serials produced per os.urandom() draw by generate_serials().
+SERIAL_BLOCK_SIZE = 65_536
+
+
+def _build_rejection_table(alphabet):
+    """
+    Builds the bytes.translate() table and delete set used to map random bytes
+    onto the alphabet. Bytes at or above the largest multiple of len(alphabet)
+    are rejected so every symbol stays equally likely (no modulo bias).
+    """
+    size = len(alphabet)
+    if not 1 < size <= 256:
+        raise ValueError("Alphabet must contain between 2 and 256 symbols.")
+    symbols = alphabet.encode('ascii')
+    if len(set(symbols)) != size:
+        raise ValueError("Alphabet must not contain repeated symbols.")
+
+    limit = 256 - (256 % size)
+    table = bytes(symbols[b % size] if b < limit else 0 for b in range(256))
+    rejected = bytes(range(limit, 256))
+    return table, rejected, limit
+
+
+def generate_serials(n, length, alphabet=ALPHANUMERIC):
+    """
+    Yields `n` random serials of `length` characters drawn uniformly from `alphabet`.
+
+    Randomness comes from os.urandom (the same CSPRNG behind `secrets`), read in
+    large blocks and mapped onto the alphabet with bytes.translate(), so the
+    per-serial cost is a single string slice instead of one call per character.
+    """
+    if length < 1:
+        raise ValueError("Serial length must be at least 1.")
+    table, rejected, limit = _build_rejection_table(alphabet)
+
+    remaining = n
+    while remaining > 0:
+        count = min(remaining, SERIAL_BLOCK_SIZE)
+        needed = count * length
+
+        # Over-draw by the expected rejection rate (plus a small margin) so a
+        # single read is almost always enough; top up if it was not.
+        draw = needed * 256 // limit + 64
+        chars = os.urandom(draw).translate(table, rejected)
+        while len(chars) < needed:
+            chars += os.urandom(draw).translate(table, rejected)
 
-# We keep the generator function
+        block = chars[:needed].decode('ascii')
+        for start in range(0, needed, length):
+            yield block[start:start + length]
+        remaining -= count
+
+
+# We keep the single-serial helper for callers that only need one value
 def generate_alphanumeric_serial(length):
-    ALPHANUMERIC = string.ascii_uppercase + string.digits
-    return ''.join(secrets.choice(ALPHANUMERIC) for i in range(length))
+    return next(generate_serials(1, length))
+
+def get_pool_permutation(pool):
+    """Returns the keyed permutation used by a PERMUTED pool."""
+    return SerialPermutation(pool.permutation_key, pool.serial_length, ALPHANUMERIC)
 
 def reserve_pool_state_for_bulk(pool_id, quantity):
-    """Locks the pool and updates the generated_count to reserve the quantity."""
+    """
+    Locks the pool and updates the generated_count to reserve the quantity.
+
+    For PERMUTED pools the counter is advanced as well, and the reserved counter
+    values are exposed as `pool.reserved_counters` (a range) so the caller can
+    turn them into serials with get_pool_permutation(pool).serials(...).
+    """
+    with transaction.atomic():
+        try:
+            pool = SerialNumberPool.manager.select_for_update().get(pool_id=pool_id)
+        except SerialNumberPool.DoesNotExist:
+            raise ValueError(f"Pool '{pool_id}' does not exist.")
+
+        pool.reserved_counters = None
+        if pool.allocation_mode == 'PERMUTED':
+            if not pool.permutation_key:
+                pool.permutation_key = secrets.token_hex(32)
+            keyspace = len(ALPHANUMERIC) ** pool.serial_length
+            if pool.next_counter + quantity > keyspace:
+                raise ValueError(
+                    f"Pool '{pool_id}' cannot reserve {quantity:,} serials: "
+                    f"only {keyspace - pool.next_counter:,} left in its keyspace."
+                )
+            pool.reserved_counters = range(pool.next_counter, pool.next_counter + quantity)
+            pool.next_counter += quantity
+
+        pool.generated_count += quantity
+        pool.status = 'ACTIVE'
+        pool.save()
+        return pool
+
+def reconcile_pool(pool_id):
+    """
+    Recounts the pool's SerialNumber rows (indexed on pool_id) and corrects
+    generated_count and status. Bulk runs reserve the full quantity up front and
+    ignore_conflicts hides dropped rows, so the table is the source of truth.
+    Returns (pool, previous_generated_count).
+    """
     with transaction.atomic():
         try:
-            pool = SerialNumberPool.objects.select_for_update().get(pool_id=pool_id)
-            pool.generated_count += quantity
-            pool.status = 'ACTIVE'
-            pool.save()
-            return pool
+            pool = SerialNumberPool.manager.select_for_update().get(pool_id=pool_id)
         except SerialNumberPool.DoesNotExist:
-            raise ValueError(f"Pool '{pool_id}' does not exist.")
\ No newline at end of file
+            raise ValueError(f"Pool '{pool_id}' does not exist.")
+
+        previous = pool.generated_count
+        pool.generated_count = pool.serial_numbers.count()
+        if pool.status != 'VOID':
+            if pool.generated_count >= pool.total_to_generate:
+                pool.status = 'EXHAUSTED'
+            elif pool.status == 'EXHAUSTED':
+                pool.status = 'ACTIVE'
+        pool.save(update_fields=['generated_count', 'status', 'updated_at'])
+        return pool, previous
+
+def pools_needing_reconciliation():
+    """Yields the ids of pools whose counters or status disagree with their row count (one aggregate query)."""
+    pools = (
+        SerialNumberPool.manager.exclude(status='VOID')
+        .annotate(actual=Count('serial_numbers'))
+        .values_list('pool_id', 'generated_count', 'total_to_generate', 'status', 'actual')
+    )
+    for pool_id, generated_count, total_to_generate, status, actual in pools:
+        exhausted = actual >= total_to_generate
+        if generated_count != actual or exhausted != (status == 'EXHAUSTED'):
+            yield pool_id
@@ -1,3 +1,165 @@
-from django.test import TestCase
+import io
+import string
+from unittest import mock
+
+from django.core.management import CommandError, call_command
+from django.test import SimpleTestCase, TestCase
+
+from SerialNumber.models import SerialNumber
+from SerialNumberPool.models import SerialNumberPool
+from SerialNumberPool import service
+from SerialNumberPool.permutation import SerialPermutation
+from SerialNumberPool.service import (
+    ALPHANUMERIC, generate_serials, pools_needing_reconciliation, reconcile_pool,
+)
+
+KEY = "00112233445566778899aabbccddeeff00112233445566778899aabbccddeeff"
 
 # Create your tests here.
+
+class GenerateSerialsTests(SimpleTestCase):
+    """generate_serials draws uniformly distributed serials from os.urandom in blocks."""
+
+    def test_count_length_and_alphabet(self):
+        # 64 symbols divide 256 (nothing rejected); 36 and 10 do not
+        for alphabet in (ALPHANUMERIC, string.digits, "AB", string.ascii_letters + string.digits + "-_"):
+            with self.subTest(size=len(alphabet)):
+                serials = list(generate_serials(500, 9, alphabet))
+                self.assertEqual(len(serials), 500)
+                self.assertEqual({len(serial) for serial in serials}, {9})
+                self.assertTrue(set(''.join(serials)) <= set(alphabet))
+        self.assertEqual(list(generate_serials(0, 9)), [])
+
+    def test_every_symbol_is_drawn(self):
+        # 36 symbols do not divide 256: the rejected bytes must not starve the last ones
+        self.assertEqual(set(''.join(generate_serials(2000, 4))), set(ALPHANUMERIC))
+
+    def test_output_spans_several_blocks(self):
+        with mock.patch.object(service, 'SERIAL_BLOCK_SIZE', 7), \
+                mock.patch.object(service.os, 'urandom', wraps=service.os.urandom) as urandom:
+            serials = list(generate_serials(30, 5))
+
+        self.assertEqual(len(serials), 30)
+        self.assertEqual({len(serial) for serial in serials}, {5})
+        # ceil(30 / 7) blocks, each at least one draw
+        self.assertGreaterEqual(urandom.call_count, 5)
+
+    def test_rejects_bad_alphabets_and_lengths(self):
+        for alphabet in ("", "A", "ABCA", "A" * 257):
+            with self.subTest(alphabet=alphabet[:5]), self.assertRaises(ValueError):
+                next(generate_serials(1, 5, alphabet))
+        for length in (0, -1):
+            with self.subTest(length=length), self.assertRaises(ValueError):
+                next(generate_serials(1, length))
+
+
+class SerialPermutationTests(SimpleTestCase):
+    """The keyed permutation is a bijection of the serial space onto itself."""
+
+    def test_round_trip(self):
+        permutation = SerialPermutation(KEY, 12, ALPHANUMERIC)
+        for counter in [0, 1, 2, 12345, permutation.keyspace // 2, permutation.keyspace - 1]:
+            with self.subTest(counter=counter):
+                serial = permutation.serial(counter)
+                self.assertEqual(permutation.counter(serial), counter)
+                self.assertEqual(permutation.decrypt(permutation.encrypt(counter)), counter)
+
+    def test_bijective_on_small_domains(self):
+        # Even and odd lengths: the odd one has halves of different sizes
+        for length in (2, 3, 4):
+            with self.subTest(length=length):
+                permutation = SerialPermutation(KEY, length, string.digits)
+                values = [permutation.encrypt(counter) for counter in range(permutation.keyspace)]
+                self.assertEqual(sorted(values), list(range(10 ** length)))
+                # Keyed, not the identity
+                self.assertNotEqual(values, sorted(values))
+
+    def test_serials_keep_length_and_alphabet(self):
+        permutation = SerialPermutation(KEY, 7, ALPHANUMERIC)
+        serials = list(permutation.serials(range(2000)))
+
+        self.assertEqual(len(set(serials)), 2000)
+        self.assertEqual({len(serial) for serial in serials}, {7})
+        self.assertTrue(set(''.join(serials)) <= set(ALPHANUMERIC))
+        # Leading zeros are kept as the alphabet's first symbol
+        digits = SerialPermutation(KEY, 3, string.digits)
+        self.assertEqual(digits.serial(digits.counter("007")), "007")
+
+    def test_key_selects_the_permutation(self):
+        other_key = bytes.fromhex(KEY[::-1])
+        first = list(SerialPermutation(KEY, 6, ALPHANUMERIC).serials(range(50)))
+
+        self.assertEqual(first, list(SerialPermutation(bytes.fromhex(KEY), 6, ALPHANUMERIC).serials(range(50))))
+        self.assertNotEqual(first, list(SerialPermutation(other_key, 6, ALPHANUMERIC).serials(range(50))))
+
+    def test_long_serials_round_trip(self):
+        # Halves wider than 64 bits are fed to the round function in more bytes
+        for length in (25, 40):
+            with self.subTest(length=length):
+                permutation = SerialPermutation(KEY, length, ALPHANUMERIC)
+                for counter in (0, 1, permutation.keyspace - 1):
+                    serial = permutation.serial(counter)
+                    self.assertEqual(len(serial), length)
+                    self.assertEqual(permutation.counter(serial), counter)
+
+    def test_existing_lengths_keep_their_serials(self):
+        self.assertEqual(SerialPermutation(KEY, 12, ALPHANUMERIC).serial(123456), "XAFM6CFGCA7B")
+        self.assertEqual(SerialPermutation(KEY, 24, ALPHANUMERIC).serial(0), "EXZO0RFTMA2IDQLR1Q64DJH3")
+
+    def test_rejects_counters_outside_the_keyspace(self):
+        permutation = SerialPermutation(KEY, 2, string.digits)
+        for counter in (-1, 100):
+            with self.subTest(counter=counter), self.assertRaises(ValueError):
+                permutation.encrypt(counter)
+        with self.assertRaises(ValueError):
+            SerialPermutation(KEY, 1, string.digits)
+
+
+class PoolReconciliationTests(TestCase):
+    """Reconciliation aligns a pool's counter and status with its SerialNumber rows."""
+
+    def _pool(self, total, generated, status, rows=40):
+        pool = SerialNumberPool.manager.create(total_to_generate=total, generated_count=generated, status=status)
+        SerialNumber.objects.bulk_create(
+            [SerialNumber(full_serial_number=f"{pool.pool_id.hex[:8]}{i:04d}", pool=pool) for i in range(rows)]
+        )
+        return pool
+
+    def test_over_counted_pool_is_corrected(self):
+        pool = self._pool(total=100, generated=100, status='ACTIVE')
+
+        pool, previous = reconcile_pool(pool.pool_id)
+
+        self.assertEqual((previous, pool.generated_count, pool.status), (100, 40, 'ACTIVE'))
+        self.assertEqual(list(pools_needing_reconciliation()), [])
+
+    def test_status_follows_the_row_count(self):
+        full = self._pool(total=40, generated=30, status='ACTIVE')
+        refilled = self._pool(total=100, generated=40, status='EXHAUSTED')
+
+        self.assertEqual(set(pools_needing_reconciliation()), {full.pool_id, refilled.pool_id})
+        self.assertEqual(reconcile_pool(full.pool_id)[0].status, 'EXHAUSTED')
+        self.assertEqual(reconcile_pool(refilled.pool_id)[0].status, 'ACTIVE')
+
+    def test_void_pools_are_skipped(self):
+        void = self._pool(total=40, generated=100, status='VOID')
+
+        self.assertEqual(list(pools_needing_reconciliation()), [])
+        # Reconciled by id, the count is still corrected but the pool stays VOID
+        pool, _ = reconcile_pool(void.pool_id)
+        self.assertEqual((pool.generated_count, pool.status), (40, 'VOID'))
+
+    def test_command_reconciles_the_pools_out_of_sync(self):
+        drifted = self._pool(total=100, generated=70, status='ACTIVE')
+        in_sync = self._pool(total=100, generated=40, status='ACTIVE')
+        out = io.StringIO()
+
+        call_command('reconcile_pool', stdout=out)
+
+        self.assertIn("1 pool(s) out of sync.", out.getvalue())
+        self.assertIn(f"Pool {drifted.pool_id}: generated_count 70 -> 40", out.getvalue())
+        self.assertNotIn(str(in_sync.pool_id), out.getvalue())
+        drifted.refresh_from_db()
+        self.assertEqual(drifted.generated_count, 40)
+        with self.assertRaises(CommandError):
+            call_command('reconcile_pool', '--pool_id', 'not-a-pool', stdout=io.StringIO())
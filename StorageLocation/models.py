@@ -1,8 +1,10 @@
 from django.db import models
 
 # Create your models here.
+from django.core.exceptions import ValidationError
 from django.db import models
 from django.utils.translation import gettext_lazy as _
+from utils.gs1 import DIGITAL_LINK_BASE, SGLN_URN, normalize_gln, sgln_digital_link, sgln_uri
 
 class StorageLocation(models.Model):
     LOCATION_TYPES = [
@@ -40,7 +42,26 @@ class StorageLocation(models.Model):
     def __str__(self):
         return f"{self.name} ({self.gln})"
 
+    def clean(self):
+        super().clean()
+        try:
+            self.gln = normalize_gln(self.gln)
+        except ValueError as e:
+            raise ValidationError({'gln': str(e)})
+
     @property
     def epcis_uri(self):
-        """Returns the location in EPCIS URI format."""
-        return f"urn:epc:id:sgln:{self.gln}.{self.sub_location or '0'}"
\ No newline at end of file
+        """Returns the location in EPCIS URI format (SGLN URN)."""
+        try:
+            return sgln_uri(self.gln, self.sub_location or '0')
+        except ValueError:
+            # GLN saved before clean() checked it: passed through unpartitioned, as location_urn does
+            return f"{SGLN_URN}{self.gln}.{self.sub_location or '0'}"
+
+    @property
+    def digital_link(self):
+        """Returns the location as a GS1 Digital Link."""
+        try:
+            return sgln_digital_link(self.gln, self.sub_location or '0')
+        except ValueError:
+            return f"{DIGITAL_LINK_BASE}/414/{self.gln}"
\ No newline at end of file
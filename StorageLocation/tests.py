@@ -1,3 +1,131 @@
-from django.test import TestCase
+from unittest import mock
+
+from django.core.exceptions import ValidationError
+from django.test import SimpleTestCase, TestCase
+
+from StorageLocation.models import StorageLocation
+from utils import gs1
 
 # Create your tests here.
+
+class StorageLocationGLNTests(TestCase):
+    """GLNs are checked when a location is validated; the EPCIS forms never raise."""
+
+    def test_clean_rejects_a_bad_check_digit(self):
+        location = StorageLocation(name="Dock", gln="0312345000002")
+        with self.assertRaises(ValidationError) as raised:
+            location.full_clean()
+        self.assertIn('gln', raised.exception.message_dict)
+
+        StorageLocation(name="Dock", gln="0312345000004").full_clean()
+
+    def test_valid_gln_gives_sgln_forms(self):
+        location = StorageLocation(name="Dock", gln="0312345000004", sub_location="D1")
+        self.assertEqual(location.epcis_uri, "urn:epc:id:sgln:0312345.00000.D1")
+        self.assertTrue(location.digital_link.endswith("/414/0312345000004/254/D1"))
+
+    def test_legacy_invalid_gln_does_not_raise(self):
+        location = StorageLocation.objects.create(name="Legacy", gln="0312345000002")
+        self.assertEqual(location.epcis_uri, "urn:epc:id:sgln:0312345000002.0")
+        self.assertTrue(location.digital_link.endswith("/414/0312345000002"))
+
+
+class GS1IdentifierTests(SimpleTestCase):
+    """utils.gs1 encodes and decodes GTINs and GLNs as EPC URNs and GS1 Digital Links."""
+
+    def _partitioned(self, prefixes):
+        """Patches the configured company prefixes; the cached partitions are dropped around it."""
+        caches = (gs1._known_prefixes, gs1.sgtin_prefix, gs1.sgln_uri, gs1.location_urn)
+        patcher = mock.patch.object(gs1, 'COMPANY_PREFIXES', prefixes)
+        for cache in caches:
+            cache.cache_clear()
+            self.addCleanup(cache.cache_clear)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_check_digits(self):
+        self.assertEqual(gs1.check_digit("400638133393"), "1")
+        self.assertEqual(gs1.check_digit("031234500000"), "4")
+        self.assertEqual(gs1.normalize_gln(" 0312345000004 "), "0312345000004")
+        for gln in ("0312345000002", "031234500000", "03123450000X4"):
+            with self.subTest(gln=gln), self.assertRaises(ValueError):
+                gs1.normalize_gln(gln)
+
+    def test_gtins_are_normalized_to_gtin14(self):
+        for gtin, expected in [
+            ("96385074", "00000096385074"),
+            ("036000291452", "00036000291452"),
+            ("4006381333931", "04006381333931"),
+            ("04006381333931", "04006381333931"),
+        ]:
+            with self.subTest(gtin=gtin):
+                self.assertEqual(gs1.normalize_gtin(gtin), expected)
+        for gtin in ("4006381333932", "400638133393", "40063813339A1", ""):
+            with self.subTest(gtin=gtin), self.assertRaises(ValueError):
+                gs1.normalize_gtin(gtin)
+
+    def test_sgtin_round_trips(self):
+        self._partitioned(['4006381'])
+        uri = gs1.sgtin_uri("4006381333931", "SER1")
+        link = gs1.sgtin_digital_link("4006381333931", "SER1")
+
+        self.assertEqual(uri, "urn:epc:id:sgtin:4006381.033393.SER1")
+        self.assertEqual(link, "https://id.gs1.org/01/04006381333931/21/SER1")
+        self.assertEqual(gs1.decode_sgtin(uri), ("04006381333931", "SER1"))
+        self.assertEqual(gs1.decode_sgtin(link), ("04006381333931", "SER1"))
+        self.assertEqual(
+            list(gs1.sgtin_digital_links("4006381333931", ["A", "B"])),
+            ["https://id.gs1.org/01/04006381333931/21/A", "https://id.gs1.org/01/04006381333931/21/B"],
+        )
+        self.assertEqual(list(gs1.sgtin_uris("4006381333931", ["A"])), ["urn:epc:id:sgtin:4006381.033393.A"])
+        for bad in ("urn:epc:id:sgtin:4006381.033393", "urn:epc:id:sgtin:40063X1.033393.A", "https://example.com/01/x"):
+            with self.subTest(uri=bad), self.assertRaises(ValueError):
+                gs1.decode_sgtin(bad)
+
+    def test_serials_are_percent_escaped(self):
+        self._partitioned(['4006381'])
+        serial = 'A/B%1&"<>?'
+
+        uri = gs1.sgtin_uri("4006381333931", serial)
+        link = gs1.sgtin_digital_link("4006381333931", serial)
+
+        self.assertEqual(uri, "urn:epc:id:sgtin:4006381.033393.A%2FB%251%26%22%3C%3E%3F")
+        self.assertEqual(link.rsplit('/', 1)[1], "A%2FB%251%26%22%3C%3E%3F")
+        self.assertEqual(gs1.decode_sgtin(uri)[1], serial)
+        self.assertEqual(gs1.decode_sgtin(link)[1], serial)
+        # Unreserved characters are left alone
+        self.assertEqual(gs1.sgtin_uri("4006381333931", "a-b_c.d~e"), "urn:epc:id:sgtin:4006381.033393.a-b_c.d~e")
+
+    def test_sgln_and_location_round_trips(self):
+        self._partitioned(['0312345'])
+        uri = gs1.sgln_uri("0312345000004", "D/1")
+        link = gs1.sgln_digital_link("0312345000004", "D/1")
+
+        self.assertEqual(uri, "urn:epc:id:sgln:0312345.00000.D%2F1")
+        self.assertEqual(link, "https://id.gs1.org/414/0312345000004/254/D%2F1")
+        self.assertEqual(gs1.sgln_digital_link("0312345000004"), "https://id.gs1.org/414/0312345000004")
+        self.assertEqual(gs1.decode_sgln(uri), ("0312345000004", "D/1"))
+        self.assertEqual(gs1.decode_sgln(link), ("0312345000004", "D/1"))
+        self.assertEqual(gs1.decode_sgln("https://id.gs1.org/414/0312345000004"), ("0312345000004", "0"))
+
+        key = gs1.location_key(uri)
+        self.assertEqual(key, "0312345000004/254/D%2F1")
+        self.assertEqual(gs1.location_key(link), key)
+        self.assertEqual(gs1.location_urn(key), uri)
+        self.assertEqual(gs1.location_digital_link(key), link)
+        self.assertEqual(gs1.location_key("urn:epc:id:sgln:0312345.00000.0"), "0312345000004")
+        # Values that are not SGLNs are stored and rendered as they are
+        self.assertEqual(gs1.location_key("dock-7"), "dock-7")
+        self.assertEqual(gs1.location_urn("dock-7"), "urn:epc:id:sgln:dock-7")
+
+    def test_company_prefix_partitioning(self):
+        self._partitioned(['0614141', '061414199'])
+
+        # The longest configured prefix wins; unknown ones fall back to the default length
+        self.assertEqual(gs1.sgtin_prefix("10614141000019"), "urn:epc:id:sgtin:0614141.100001.")
+        self.assertEqual(gs1.sgtin_prefix("10614141990013"), "urn:epc:id:sgtin:061414199.1001.")
+        self.assertEqual(gs1.sgln_uri("0614141000012"), "urn:epc:id:sgln:0614141.00001.0")
+        self.assertEqual(gs1.sgln_uri("0614141990016"), "urn:epc:id:sgln:061414199.001.0")
+        self.assertEqual(gs1.company_prefix_length("4006381333931"), gs1.DEFAULT_COMPANY_PREFIX_LENGTH)
+        self.assertEqual(gs1.decode_sgtin("urn:epc:id:sgtin:061414199.1001.X"), ("10614141990013", "X"))
+        self.assertEqual(gs1.decode_sgln("urn:epc:id:sgln:061414199.001.0"), ("0614141990016", "0"))
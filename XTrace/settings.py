@@ -45,6 +45,7 @@ INSTALLED_APPS = [
     'SerialNumberPool',
     'StorageLocation',
     'EPCISEvent',
+    'Audit',
     
 ]
 
@@ -133,3 +134,8 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# Test runner: audit/capture spools in a temporary directory
+# https://docs.djangoproject.com/en/5.2/ref/settings/#test-runner
+
+TEST_RUNNER = 'XTrace.test_runner.TestRunner'
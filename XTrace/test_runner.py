@@ -0,0 +1,45 @@
+# XTrace/test_runner.py
+"""
+Test runner keeping the file-backed spools of a test run out of the project.
+
+The audit spool (Audit.spool) and the capture spool (EPCISEvent.capture) live
+under BASE_DIR by default; for a test run both point into a temporary
+directory removed afterwards. The background audit flusher is off: tests
+drain the spool themselves (Audit.spool.drain_spool).
+"""
+import os
+import tempfile
+
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+
+
+class TestRunner(DiscoverRunner):
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        from Audit import spool as audit_spool
+        from EPCISEvent import capture
+
+        self._spool_dir = tempfile.TemporaryDirectory(prefix='xtrace-test-')
+        self._saved = [
+            (settings, 'AUDIT_SPOOL_PATH', getattr(settings, 'AUDIT_SPOOL_PATH', None)),
+            (audit_spool, 'SPOOL_PATH', audit_spool.SPOOL_PATH),
+            (audit_spool, 'AUTO_FLUSH', audit_spool.AUTO_FLUSH),
+            (audit_spool, '_spool', audit_spool._spool),
+            (capture, 'CAPTURE_SPOOL_DIR', capture.CAPTURE_SPOOL_DIR),
+        ]
+        settings.AUDIT_SPOOL_PATH = audit_spool.SPOOL_PATH = os.path.join(self._spool_dir.name, 'audit_spool.sqlite3')
+        audit_spool.AUTO_FLUSH = False
+        audit_spool._spool = None
+        capture.CAPTURE_SPOOL_DIR = os.path.join(self._spool_dir.name, 'capture_spool')
+
+    def teardown_test_environment(self, **kwargs):
+        from Audit import spool as audit_spool
+
+        if audit_spool._spool is not None:
+            audit_spool._spool.close()
+        for target, name, value in self._saved:
+            setattr(target, name, value)
+        self._spool_dir.cleanup()
+        super().teardown_test_environment(**kwargs)
@@ -6,4 +6,6 @@ urlpatterns = [
     path('web/batch/', include('Batch.urls', namespace='batch')),
     path('web/equipment/', include('Equipment.urls', namespace='equipment')),
     # API
+    path('api/serials/', include('SerialNumber.urls', namespace='serial')),
+    path('api/', include('EPCISEvent.urls', namespace='epcis')),
 ]
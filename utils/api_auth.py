@@ -0,0 +1,68 @@
+# utils/api_auth.py
+"""
+Authentication of the machine-facing JSON API views (capture, event query, serials).
+
+Clients are production lines and trading partners rather than browsers, so
+besides the session, a view accepts HTTP Basic credentials of a Django user.
+The POST views are csrf_exempt for those clients; a request authenticated by its
+session cookie still has its CSRF token checked, as a browser form would.
+"""
+import base64
+import binascii
+
+from django.contrib.auth import authenticate
+from django.http import JsonResponse
+from django.middleware.csrf import CsrfViewMiddleware
+
+from auditlog.context import auditlog_value
+
+REALM = 'XTrace API'
+
+
+def _basic_auth_user(request):
+    """The active user of the request's HTTP Basic credentials, or None."""
+    scheme, _, credentials = request.headers.get('Authorization', '').partition(' ')
+    if scheme.lower() != 'basic' or not credentials:
+        return None
+    try:
+        username, _, password = base64.b64decode(credentials).decode('utf-8').partition(':')
+    except (binascii.Error, UnicodeDecodeError):
+        return None
+    return authenticate(request, username=username, password=password)
+
+
+def _csrf_rejection(request):
+    """The 403 response of a session request failing the CSRF check, or None."""
+    check = CsrfViewMiddleware(lambda request: None)
+    check.process_request(request)
+    return check.process_view(request, None, (), {})
+
+
+class ApiAuthMixin:
+    """
+    View mixin: 401 without valid credentials, 403 without `permission_required`.
+
+    :attr permission_required: 'app_label.codename' the user must hold, if any.
+    """
+    permission_required = None
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.user.is_authenticated:
+            rejected = _csrf_rejection(request)
+            if rejected is not None:
+                return rejected
+        else:
+            user = _basic_auth_user(request)
+            if user is None:
+                response = JsonResponse({'error': "Authentication required."}, status=401)
+                response['WWW-Authenticate'] = f'Basic realm="{REALM}", charset="UTF-8"'
+                return response
+            request.user = user
+            # AuditlogMiddleware took the (anonymous) actor before the view ran
+            context = auditlog_value.get(None)
+            if context is not None:
+                context['actor'] = user
+
+        if self.permission_required and not request.user.has_perm(self.permission_required):
+            return JsonResponse({'error': "Permission denied."}, status=403)
+        return super().dispatch(request, *args, **kwargs)
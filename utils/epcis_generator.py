@@ -1,14 +1,16 @@
-import xml.etree.ElementTree as ET
-from xml.dom import minidom # Used for pretty-printing the final XML
+import io
+from xml.sax.saxutils import XMLGenerator, escape
 from django.conf import settings
+from django.http import StreamingHttpResponse
 from django.utils import timezone
+from Batch.models import Batch
 from SerialNumber.models import SerialNumber
+from utils.gs1 import location_urn, sgtin_uri, sgtin_uris
 
 # --- Configuration (These should be set in Django's settings.py) ---
 # Example: GS1-assigned GLN for your facility
-FACILITY_GLN = getattr(settings, 'EPCIS_FACILITY_GLN', 'urn:epc:id:gln:0000000.00000.0')
-# Example: Your GS1 Company Prefix
-COMPANY_PREFIX = getattr(settings, 'EPCIS_COMPANY_PREFIX', '001234567')
+FACILITY_GLN = getattr(settings, 'EPCIS_FACILITY_GLN', 'urn:epc:id:sgln:0000000.00000.0')
+# The GS1 Company Prefix(es) used to partition GTINs are configured in utils.gs1
 
 # --- XML Namespace Definitions ---
 # The primary namespaces required for an EPCIS 2.0 document
@@ -16,28 +18,210 @@ NS = {
     'epcis': "urn:epcglobal:epcis:xsd:2",
     'xsi': "http://www.w3.org/2001/XMLSchema-instance",
 }
+NS_EXT = "http://yourcompany.com/epcis/ext"
+
+# Number of EPCs written between two flushes of the streaming writer
+STREAM_CHUNK_SIZE = 2000
+
+def pool_gtins(pool_ids):
+    """Maps each pool id to the primary GTIN of the product its (first) Batch is for, in one query."""
+    pool_ids = set(pool_ids)
+    gtins = {}
+    batches = (
+        Batch.objects.filter(serial_pool_id__in=pool_ids)
+        .order_by('id')
+        .values_list('serial_pool_id', 'product__primary_gtin')
+    )
+    for pool_id, gtin in batches:
+        gtins.setdefault(pool_id, gtin)
+
+    missing = pool_ids - gtins.keys()
+    if missing:
+        raise ValueError(f"Pool(s) {', '.join(map(str, missing))} are not linked to a product through a Batch.")
+    return gtins
+
 
 class EPCISEventsGenerator:
     """
     Generates EPCIS 2.0 XML documents based on SerialNumber data.
     """
     
-    def __init__(self):
-        # Register namespaces to ensure they appear correctly in the output
-        for prefix, uri in NS.items():
-            ET.register_namespace(prefix, uri)
-
     def _generate_sgtin_uri(self, gtin, serial_number):
         """Converts GTIN and SN into the SGTIN EPC URI format."""
-        # Ensure GTIN is 14 digits (padded with leading zero if necessary)
-        gtin_14 = str(gtin).zfill(14)
-        
-        # Split: Company Prefix (first part) and Item Reference (second part, usually 5 digits)
-        # Note: The split point depends on your specific Company Prefix length. 
-        # Here we use a common structure for demonstration.
-        item_reference = gtin_14[8:13] # Example: 5 digits after the prefix/indicator
-        
-        return f"urn:epc:id:sgtin:{COMPANY_PREFIX}.{item_reference}.{serial_number}"
+        return sgtin_uri(gtin, serial_number)
+
+    def _pool_gtins(self, serial_number_queryset):
+        """
+        Maps every pool in the queryset to its product GTIN with two queries:
+        the distinct pool ids, then their batches joined to the product GTIN.
+        """
+        pool_ids = set(
+            serial_number_queryset.order_by().values_list('pool_id', flat=True).distinct()
+        )
+        return pool_gtins(pool_ids)
+
+    def _iter_commissioning_epcs(self, serial_number_queryset, chunk_size):
+        """
+        Yields the SGTIN URI of every serial. Runs a fixed number of queries
+        whatever the size of the queryset: the GTINs are resolved once and only
+        (pool_id, full_serial_number) pairs are streamed from the database.
+        """
+        gtins = self._pool_gtins(serial_number_queryset)
+        rows = serial_number_queryset.values_list('pool_id', 'full_serial_number')
+        if len(gtins) == 1:
+            (gtin,) = gtins.values()
+            serials = (serial for _, serial in rows.iterator(chunk_size=chunk_size))
+            yield from sgtin_uris(gtin, serials)
+        else:
+            for pool_id, serial in rows.iterator(chunk_size=chunk_size):
+                yield sgtin_uri(gtins[pool_id], serial)
+
+    def stream_epcis_commissioning(self, serial_number_queryset, chunk_size=STREAM_CHUNK_SIZE, pretty=False):
+        """
+        Streams the EPCIS commissioning document as str chunks.
+
+        The document is written incrementally with XMLGenerator and flushed every
+        `chunk_size` EPCs, so memory stays flat however many serials the queryset
+        holds. Assumes all S/Ns in the queryset are for the same batch/product.
+
+        :param serial_number_queryset: Django QuerySet of SerialNumber objects (in 'PRINTED' status).
+        :param pretty: Indent the output (two spaces per level).
+        """
+        return self.stream_commissioning_events([(serial_number_queryset, None)], chunk_size, pretty)
+
+    def stream_commissioning_events(self, events, chunk_size=STREAM_CHUNK_SIZE, pretty=False):
+        """
+        Streams one EPCIS document with a commissioning ObjectEvent per
+        (serial_number_queryset, event) pair, as str chunks (see stream_epcis_commissioning).
+
+        `event` is the stored commissioning EPCISEvent of the serials, whose
+        eventTime, eventID and locations are written; with None, the event is
+        dated now at FACILITY_GLN. Each event carries the lot and expiry of its
+        serials as ILMD. Pairs without serials are left out; nothing is yielded
+        when no pair has any.
+        """
+        buffer = io.StringIO()
+        xml = XMLGenerator(buffer, encoding='utf-8')
+        newline = "\n" if pretty else ""
+
+        def indent(level):
+            if pretty:
+                buffer.write("\n" + "  " * level)
+
+        def start(level, name, attrs=None):
+            indent(level)
+            xml.startElement(name, attrs or {})
+
+        def end(level, name):
+            indent(level)
+            xml.endElement(name)
+
+        def leaf(level, name, text):
+            indent(level)
+            buffer.write(f"<{name}>{escape(text or '')}</{name}>")
+
+        def flush():
+            data = buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            return data
+
+        started = False
+        for serial_number_queryset, event in events:
+            first_sn = serial_number_queryset.values('batch_lot', 'expiration_date').first()
+            if first_sn is None:
+                continue
+
+            # Get metadata from the first SN (assuming batch data is consistent)
+            batch_lot = first_sn['batch_lot']
+            expiration_date = first_sn['expiration_date'].strftime('%Y-%m-%d') if first_sn['expiration_date'] else ''
+
+            if not started:
+                started = True
+                # --- 1. Root Element: EPCISDocument ---
+                xml.startDocument()
+                xml.startElement("epcis:EPCISDocument", {
+                    "xmlns:epcis": NS['epcis'],
+                    "xmlns:xsi": NS['xsi'],
+                    "xmlns:ext": NS_EXT,
+                    "schemaVersion": "2.0",
+                    "creationDate": timezone.now().isoformat(),
+                })
+
+                # --- 2. EPCISBody and EventList ---
+                start(1, "epcis:EPCISBody")
+                start(2, "epcis:EventList")
+
+            # --- 3. ObjectEvent (The Event that happened) ---
+            start(3, "epcis:ObjectEvent")
+
+            # When
+            if event is None:
+                leaf(4, "epcis:eventTime", timezone.now().isoformat())
+                leaf(4, "epcis:eventTimeZoneOffset", "+00:00")
+            else:
+                leaf(4, "epcis:eventTime", event.event_time.isoformat())
+                leaf(4, "epcis:eventTimeZoneOffset", event.event_timezone_offset)
+                leaf(4, "epcis:eventID", f"urn:uuid:{event.event_id}")
+
+            # The What (epcList), flushed every chunk_size EPCs
+            start(4, "epcis:epcList")
+            epc_prefix = newline + "  " * 5 + "<epcis:epc>" if pretty else "<epcis:epc>"
+            written = 0
+            for epc_uri in self._iter_commissioning_epcs(serial_number_queryset, chunk_size):
+                buffer.write(f"{epc_prefix}{escape(epc_uri)}</epcis:epc>")
+                written += 1
+                if written % chunk_size == 0:
+                    yield flush()
+            end(4, "epcis:epcList")
+
+            # The Why (Action and Business Step)
+            leaf(4, "epcis:action", 'ADD')
+            leaf(4, "epcis:bizStep", 'urn:epcglobal:cbv:bizstep:commissioning')
+
+            # The Where (readPoint and bizLocation of the stored event, else the facility)
+            if event is None:
+                biz_location = FACILITY_GLN
+            else:
+                biz_location = location_urn(event.biz_location)
+                leaf(4, "epcis:disposition", f"urn:epcglobal:cbv:disp:{event.disposition}")
+                start(4, "epcis:readPoint")
+                leaf(5, "epcis:id", location_urn(event.read_point))
+                end(4, "epcis:readPoint")
+            start(4, "epcis:bizLocation")
+            leaf(5, "epcis:id", biz_location)
+            end(4, "epcis:bizLocation")
+
+            # Contextual Information (ilmd: Item Level Master Data)
+            start(4, "epcis:ilmd")
+            start(5, "ext:extension")
+            leaf(6, "ext:lotNumber", batch_lot)
+            leaf(6, "ext:expirationDate", expiration_date)
+            end(5, "ext:extension")
+            end(4, "epcis:ilmd")
+
+            end(3, "epcis:ObjectEvent")
+
+        if not started:
+            return
+        end(2, "epcis:EventList")
+        end(1, "epcis:EPCISBody")
+        end(0, "epcis:EPCISDocument")
+        xml.endDocument()
+        buffer.write(newline)
+        yield flush()
+
+    def write_epcis_commissioning(self, serial_number_queryset, out, **options):
+        """Writes the streamed document to a text file or an HttpResponse."""
+        for chunk in self.stream_epcis_commissioning(serial_number_queryset, **options):
+            out.write(chunk)
+
+    def streaming_commissioning_response(self, serial_number_queryset, **options):
+        """Returns a StreamingHttpResponse that generates the document while it is sent."""
+        return StreamingHttpResponse(
+            self.stream_epcis_commissioning(serial_number_queryset, **options),
+            content_type='application/xml; charset=utf-8',
+        )
 
     def generate_epcis_commissioning(self, serial_number_queryset):
         """
@@ -47,87 +231,29 @@ class EPCISEventsGenerator:
         :param serial_number_queryset: Django QuerySet of SerialNumber objects (in 'PRINTED' status).
         :return: Pretty-printed EPCIS XML string.
         """
-        if not serial_number_queryset.exists():
-            return None
+        # Built on the streaming writer; only the final string is held in memory
+        return ''.join(self.stream_epcis_commissioning(serial_number_queryset, pretty=True)) or None
 
-        # Get metadata from the first SN (assuming batch data is consistent)
-        first_sn = serial_number_queryset.first()
-        batch_lot = first_sn.batch_lot
-        expiration_date = first_sn.expiration_date.strftime('%Y-%m-%d')
-        
-        # --- 1. Root Element: EPCISDocument ---
-        # Use the full namespace URI for the root element
-        root = ET.Element(f"{{{NS['epcis']}}}EPCISDocument", 
-                          attrib={
-                              "schemaVersion": "2.0",
-                              "creationDate": timezone.now().isoformat()
-                          })
-
-        # --- 2. EPCISBody and EventList ---
-        epcis_body = ET.SubElement(root, f"{{{NS['epcis']}}}EPCISBody")
-        event_list = ET.SubElement(epcis_body, f"{{{NS['epcis']}}}EventList")
-
-        # --- 3. ObjectEvent (The Event that happened) ---
-        object_event = ET.SubElement(event_list, f"{{{NS['epcis']}}}ObjectEvent")
-        
-        # When
-        ET.SubElement(object_event, f"{{{NS['epcis']}}}eventTime").text = timezone.now().isoformat()
-        ET.SubElement(object_event, f"{{{NS['epcis']}}}eventTimeZoneOffset").text = "+00:00"
-        
-        # The What (epcList)
-        epc_list = ET.SubElement(object_event, f"{{{NS['epcis']}}}epcList")
-        for sn in serial_number_queryset:
-            epc_uri = self._generate_sgtin_uri(sn.pool.product_gtin, sn.full_serial_number)
-            ET.SubElement(epc_list, f"{{{NS['epcis']}}}epc").text = epc_uri
-
-        # The Why (Action and Business Step)
-        ET.SubElement(object_event, f"{{{NS['epcis']}}}action").text = 'ADD'
-        ET.SubElement(object_event, f"{{{NS['epcis']}}}bizStep").text = 'urn:epcglobal:cbv:bizstep:commissioning'
-
-        # The Where (bizLocation)
-        biz_location = ET.SubElement(object_event, f"{{{NS['epcis']}}}bizLocation")
-        ET.SubElement(biz_location, f"{{{NS['epcis']}}}id").text = FACILITY_GLN
-
-        # Contextual Information (ilmd: Item Level Master Data)
-        ilmd = ET.SubElement(object_event, f"{{{NS['epcis']}}}ilmd")
-        
-        # You must use a specific XML namespace for the product data extensions (e.g., lot and expiration)
-        # Here we use 'ext' as a placeholder for a custom extension namespace
-        ET.register_namespace('ext', "http://yourcompany.com/epcis/ext")
-        extension = ET.SubElement(ilmd, f"{{http://yourcompany.com/epcis/ext}}extension")
-        
-        # Use simple tags for lot and expiration
-        ET.SubElement(extension, f"{{http://yourcompany.com/epcis/ext}}lotNumber").text = batch_lot
-        ET.SubElement(extension, f"{{http://yourcompany.com/epcis/ext}}expirationDate").text = expiration_date
-
-        # --- 4. Final Formatting ---
-        # Use minidom to pretty-print the XML for readability
-        rough_string = ET.tostring(root, 'utf-8')
-        reparsed = minidom.parseString(rough_string)
-        return reparsed.toprettyxml(indent="  ")
-
-# --- Example Usage (How you would call this after successful consumption) ---
-# Assuming you have a list of SerialNumber IDs that were successfully printed:
+# --- Commissioning after successful printing ---
 def generate_commissioning_document(reserved_sn_ids):
-    """Fetches the records and generates the EPCIS document."""
-    # Find the records that were just marked 'PRINTED'
-    queryset = SerialNumber.objects.filter(pk__in=reserved_sn_ids)
-    
-    # Initialize the generator
-    generator = EPCISEventsGenerator()
-    
-    # Generate the XML
-    epcis_xml = generator.generate_epcis_commissioning(queryset)
-    
-    if epcis_xml:
-        # 1. Print it out for inspection
-        print("\n--- GENERATED EPCIS COMMISSIONING DOCUMENT ---")
-        print(epcis_xml)
-        
-        # 2. Save it to disk or push it to an EPCIS repository
-        # with open(f"epcis_commissioning_{timezone.now().strftime('%Y%m%d%H%M%S')}.xml", "w") as f:
-        #     f.write(epcis_xml)
-    return epcis_xml
+    """
+    Commissions the printed serials and returns the outbound EPCIS XML document.
+
+    Runs SerialNumber.commissioning.commission_serials: the serials are flipped
+    to PRINTED and the commissioning EPCISEvent is stored, in chunked transactions
+    that are safe to retry with the same ids. The document has one ObjectEvent
+    per stored event (same eventID and eventTime), with the lot and expiry of its
+    serials as ILMD.
+    """
+    from EPCISEvent.models import EPCISEvent
+    from SerialNumber.commissioning import commission_serials
 
-# Note: In a real Django application, you would integrate this into your views.py
-# or a signal that fires after the SerialNumber status is successfully updated to 'PRINTED'.
\ No newline at end of file
+    result = commission_serials(reserved_sn_ids)
+    if not result.event_ids:
+        return None
+    stored = EPCISEvent.objects.filter(event_id__in=result.event_ids).order_by('event_time', 'id')
+    events = (
+        (SerialNumber.objects.filter(commissioning_event_id=event.event_id).order_by('id'), event)
+        for event in stored
+    )
+    return ''.join(EPCISEventsGenerator().stream_commissioning_events(events, pretty=True)) or None
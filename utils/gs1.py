@@ -0,0 +1,214 @@
+# utils/gs1.py
+"""
+GS1 identifiers: GTIN/GLN check digits and the SGTIN/SGLN EPC URN and GS1
+Digital Link forms, in both directions.
+
+Converting a GTIN or GLN to an EPC URN needs the length of its GS1 Company
+Prefix, which the number itself does not carry. The known prefixes come from
+settings (GS1_COMPANY_PREFIXES); anything else falls back to
+GS1_DEFAULT_COMPANY_PREFIX_LENGTH. The partition is resolved once per GTIN/GLN
+(lru_cache), so batch encoding is a string concatenation per serial.
+"""
+import re
+from functools import lru_cache
+from urllib.parse import quote, unquote
+
+from django.conf import settings
+
+COMPANY_PREFIXES = getattr(
+    settings, 'GS1_COMPANY_PREFIXES', [getattr(settings, 'EPCIS_COMPANY_PREFIX', '001234567')]
+)
+DEFAULT_COMPANY_PREFIX_LENGTH = getattr(settings, 'GS1_DEFAULT_COMPANY_PREFIX_LENGTH', 7)
+DIGITAL_LINK_BASE = getattr(settings, 'GS1_DIGITAL_LINK_BASE', 'https://id.gs1.org')
+
+SGTIN_URN = 'urn:epc:id:sgtin:'
+SGLN_URN = 'urn:epc:id:sgln:'
+
+# Characters of a serial / extension that EPC URNs must percent-encode (TDS 2.x)
+_URN_ESCAPES = {'"': '%22', '%': '%25', '&': '%26', '/': '%2F', '<': '%3C', '>': '%3E', '?': '%3F'}
+_URN_UNSAFE = re.compile(r'["%&/<>?]')
+_URN_TABLE = str.maketrans(_URN_ESCAPES)
+_DIGITAL_LINK_SAFE = re.compile(r'[A-Za-z0-9_.~-]*\Z')
+
+
+# --- Check digits ---
+
+def check_digit(digits):
+    """GS1 modulo-10 check digit of a digit string (without its check digit)."""
+    total = 0
+    for position, digit in enumerate(reversed(digits)):
+        total += int(digit) * (3 if position % 2 == 0 else 1)
+    return str(-total % 10)
+
+
+def normalize_gtin(gtin):
+    """Returns the GTIN-14 form of a GTIN-8/12/13/14; raises ValueError if it is malformed."""
+    gtin = str(gtin).strip()
+    if not gtin.isdigit() or len(gtin) not in (8, 12, 13, 14):
+        raise ValueError(f"'{gtin}' is not a GTIN.")
+    gtin = gtin.zfill(14)
+    if check_digit(gtin[:13]) != gtin[13]:
+        raise ValueError(f"GTIN '{gtin}' has an invalid check digit.")
+    return gtin
+
+
+def normalize_gln(gln):
+    """Returns the 13-digit GLN; raises ValueError if it is malformed."""
+    gln = str(gln).strip()
+    if not gln.isdigit() or len(gln) != 13:
+        raise ValueError(f"'{gln}' is not a GLN.")
+    if check_digit(gln[:12]) != gln[12]:
+        raise ValueError(f"GLN '{gln}' has an invalid check digit.")
+    return gln
+
+
+@lru_cache(maxsize=None)
+def _known_prefixes():
+    return sorted(set(COMPANY_PREFIXES), key=len, reverse=True)
+
+
+def company_prefix_length(digits):
+    """Length of the company prefix `digits` (GLN, or GTIN-14 without its indicator) starts with."""
+    for prefix in _known_prefixes():
+        if digits.startswith(prefix):
+            return len(prefix)
+    return DEFAULT_COMPANY_PREFIX_LENGTH
+
+
+# --- Serial escaping ---
+
+def _urn_escape(value):
+    return value.translate(_URN_TABLE) if _URN_UNSAFE.search(value) else value
+
+
+def _digital_link_escape(value):
+    return value if _DIGITAL_LINK_SAFE.match(value) else quote(value, safe='')
+
+
+# --- SGTIN ---
+
+@lru_cache(maxsize=4096)
+def sgtin_prefix(gtin):
+    """'urn:epc:id:sgtin:<company prefix>.<indicator + item reference>.' for a GTIN."""
+    gtin = normalize_gtin(gtin)
+    length = company_prefix_length(gtin[1:13])
+    return f"{SGTIN_URN}{gtin[1:1 + length]}.{gtin[0]}{gtin[1 + length:13]}."
+
+
+@lru_cache(maxsize=4096)
+def sgtin_digital_link_prefix(gtin):
+    """'<base>/01/<GTIN-14>/21/' for a GTIN."""
+    return f"{DIGITAL_LINK_BASE}/01/{normalize_gtin(gtin)}/21/"
+
+
+def sgtin_uri(gtin, serial):
+    return sgtin_prefix(gtin) + _urn_escape(serial)
+
+
+def sgtin_digital_link(gtin, serial):
+    return sgtin_digital_link_prefix(gtin) + _digital_link_escape(serial)
+
+
+def sgtin_uris(gtin, serials):
+    """Yields the SGTIN URN of every serial of one GTIN; the GTIN is partitioned once."""
+    prefix = sgtin_prefix(gtin)
+    for serial in serials:
+        yield prefix + _urn_escape(serial)
+
+
+def sgtin_digital_links(gtin, serials):
+    """Yields the GS1 Digital Link of every serial of one GTIN."""
+    prefix = sgtin_digital_link_prefix(gtin)
+    for serial in serials:
+        yield prefix + _digital_link_escape(serial)
+
+
+def decode_sgtin(uri):
+    """Returns (GTIN-14, serial) for an SGTIN URN or GS1 Digital Link; raises ValueError otherwise."""
+    if uri.startswith(SGTIN_URN):
+        try:
+            company_prefix, item_reference, serial = uri[len(SGTIN_URN):].split('.', 2)
+        except ValueError:
+            raise ValueError(f"'{uri}' is not an SGTIN URN.")
+        body = item_reference[:1] + company_prefix + item_reference[1:]
+        if len(body) != 13 or not body.isdigit():
+            raise ValueError(f"'{uri}' is not an SGTIN URN.")
+        return body + check_digit(body), unquote(serial)
+
+    parts = uri.split('/')
+    if '01' in parts:
+        index = parts.index('01')
+        if len(parts) > index + 3 and parts[index + 2] == '21':
+            return normalize_gtin(parts[index + 1]), unquote(parts[index + 3])
+    raise ValueError(f"'{uri}' is not an SGTIN.")
+
+
+# --- SGLN ---
+
+@lru_cache(maxsize=4096)
+def sgln_uri(gln, extension='0'):
+    """'urn:epc:id:sgln:<company prefix>.<location reference>.<extension>' for a GLN."""
+    gln = normalize_gln(gln)
+    length = company_prefix_length(gln)
+    return f"{SGLN_URN}{gln[:length]}.{gln[length:12]}.{_urn_escape(extension or '0')}"
+
+
+def sgln_digital_link(gln, extension='0'):
+    """'<base>/414/<GLN>[/254/<extension>]'; extension '0' means none."""
+    link = f"{DIGITAL_LINK_BASE}/414/{normalize_gln(gln)}"
+    if extension and extension != '0':
+        link += f"/254/{_digital_link_escape(extension)}"
+    return link
+
+
+def decode_sgln(uri):
+    """Returns (GLN, extension) for an SGLN URN or GS1 Digital Link; raises ValueError otherwise."""
+    if uri.startswith(SGLN_URN):
+        try:
+            company_prefix, location_reference, extension = uri[len(SGLN_URN):].split('.', 2)
+        except ValueError:
+            raise ValueError(f"'{uri}' is not an SGLN URN.")
+        body = company_prefix + location_reference
+        if len(body) != 12 or not body.isdigit():
+            raise ValueError(f"'{uri}' is not an SGLN URN.")
+        return body + check_digit(body), unquote(extension)
+
+    parts = uri.split('/')
+    if '414' in parts:
+        index = parts.index('414')
+        if len(parts) > index + 1:
+            extension = unquote(parts[index + 3]) if len(parts) > index + 3 and parts[index + 2] == '254' else '0'
+            return normalize_gln(parts[index + 1]), extension
+    raise ValueError(f"'{uri}' is not an SGLN.")
+
+
+# --- EPCISEvent locations ---
+# EPCISEvent stores readPoint / bizLocation as the Digital Link path after /414/:
+# '<GLN>' or '<GLN>/254/<extension>'.
+
+def location_key(uri):
+    """The stored form of a readPoint / bizLocation; values that are not SGLNs are kept as they are."""
+    try:
+        gln, extension = decode_sgln(uri)
+    except ValueError:
+        return uri
+    return gln if extension == '0' else f"{gln}/254/{_digital_link_escape(extension)}"
+
+
+def _split_location_key(key):
+    gln, _, extension = key.partition('/254/')
+    return gln, unquote(extension) or '0'
+
+
+@lru_cache(maxsize=4096)
+def location_urn(key):
+    """SGLN URN of a stored location (legacy non-GLN values are prefixed as they are)."""
+    try:
+        return sgln_uri(*_split_location_key(key))
+    except ValueError:
+        return f"{SGLN_URN}{key}"
+
+
+def location_digital_link(key):
+    """GS1 Digital Link of a stored location."""
+    return f"{DIGITAL_LINK_BASE}/414/{key}"
@@ -0,0 +1,74 @@
+# utils/pagination.py
+"""
+Keyset pagination for the web list views.
+
+Django's Paginator counts the whole queryset and pages with OFFSET, so a page
+costs more the deeper it is and the bigger the table. KeysetListMixin pages on
+the primary key instead (newest first): a page is `WHERE pk < cursor ORDER BY
+pk DESC LIMIT n`, an index range scan of n rows at any depth, and no COUNT is
+ever run. The previous page is the same scan upwards from the first row shown.
+
+Search (?q=) is a prefix match OR-ed over `search_fields`, so it stays
+index-backed (LIKE 'q%'); those fields must be indexed.
+"""
+from django.db.models import Q
+from django.http import Http404
+
+DEFAULT_PER_PAGE = 50
+
+
+class KeysetListMixin:
+    """
+    ListView mixin; the context gets the page as `object_list` (and the
+    context_object_name) plus `next_cursor`, `previous_cursor` and `search`.
+
+    :attr list_fields: Columns loaded for the page (an only() projection, '__' spans allowed).
+    :attr search_fields: Indexed fields ?q= is prefix-matched against.
+    """
+    per_page = DEFAULT_PER_PAGE
+    list_fields = ()
+    search_fields = ()
+
+    def _cursor(self, name):
+        raw = self.request.GET.get(name)
+        if not raw:
+            return None
+        try:
+            return int(raw)
+        except ValueError:
+            raise Http404(f"Invalid page cursor '{raw}'.")
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.list_fields:
+            queryset = queryset.only(*self.list_fields)
+        self.search = self.request.GET.get('q', '').strip()
+        if self.search and self.search_fields:
+            match = Q()
+            for field in self.search_fields:
+                match |= Q(**{f'{field}__startswith': self.search})
+            queryset = queryset.filter(match)
+
+        after, before = self._cursor('after'), self._cursor('before')
+        if before is not None:
+            # Rows newer than the first one shown, nearest first, then back in display order
+            rows = list(queryset.filter(pk__gt=before).order_by('pk')[:self.per_page + 1])
+            self.has_previous = len(rows) > self.per_page
+            self.has_next = True
+            rows = rows[:self.per_page][::-1]
+        else:
+            if after is not None:
+                queryset = queryset.filter(pk__lt=after)
+            rows = list(queryset.order_by('-pk')[:self.per_page + 1])
+            self.has_previous = after is not None
+            self.has_next = len(rows) > self.per_page
+            rows = rows[:self.per_page]
+        return rows
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        rows = context['object_list']
+        context['next_cursor'] = rows[-1].pk if rows and self.has_next else None
+        context['previous_cursor'] = rows[0].pk if rows and self.has_previous else None
+        context['search'] = self.search
+        return context